@@ -0,0 +1,72 @@
+"""
+Latency of forest.CompiledForest against the sklearn RandomForestClassifier it is compiled from (parity is
+checked by tests/test_forest.py). Trains the risk model on mock data, then:
+    latency     median predict_proba time per batch size, sklearn (DataFrame input, as served) vs compiled
+    artifact    size of the compiled arrays and the time to load each artifact with mmap_mode="r"
+The crossover in the latency table is what COMPILED_INFERENCE_MAX_ROWS should be set to. Run from backend/:
+    python -m benchmarks.bench_forest [--rows 20000] [--sizes 1 10 100 1000 10000 100000] [--repeat 20]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import joblib
+import pandas as pd
+
+from data_utils import generate_mock_frame
+from density import DensityRaster
+from forest import CompiledForest
+from ml_engine import MLEngine, RISK_FEATURES
+from tests.test_forest import features
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000, help="mock incidents to train on")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_forest-")
+    engine = MLEngine(registry_path=os.path.join(tmp, "registry"))
+    df = engine.prepare_time_features(generate_mock_frame(args.rows, seed=0))
+    density = DensityRaster.from_frame(df)
+    start = time.perf_counter()
+    model, accuracy = engine.fit_risk_model(df, density)
+    print(f"trained on {args.rows} rows in {time.perf_counter() - start:.1f}s (f1 {accuracy:.3f})")
+    start = time.perf_counter()
+    forest = CompiledForest.from_sklearn(model)
+    print(f"compiled {len(forest.roots)} trees, {len(forest.feature)} nodes in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    print("latency (median ms per predict_proba call)")
+    print(f"{'rows':>8} | {'sklearn':>9} {'compiled':>9} {'speedup':>8}")
+    for n in args.sizes:
+        X = features(density, n, seed=n)
+        frame = pd.DataFrame(X, columns=RISK_FEATURES)
+        repeat = max(1, args.repeat if n <= 10000 else args.repeat // 10)
+        t_sk = timed(lambda: model.predict_proba(frame), repeat)
+        t_cf = timed(lambda: forest.predict_proba(X), repeat)
+        print(f"{n:>8} | {t_sk * 1000:9.2f} {t_cf * 1000:9.2f} {t_sk / t_cf:7.1f}x")
+
+    print("artifact")
+    for name, value in (("sklearn", (model, density)), ("compiled", (forest, density))):
+        path = os.path.join(tmp, f"{name}.joblib")
+        joblib.dump(value, path)
+        load = timed(lambda: joblib.load(path, mmap_mode="r"), 5)
+        print(f"  {name:<9} {os.path.getsize(path) / 1e6:7.2f} MB on disk, load {load * 1000:6.1f}ms")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Density hotspots (hotspots.NeighbourIndex) against the KMeans path and against exact point-level DBSCAN.
+For each size, on mock incidents:
+    kmeans      cluster_hotspots, what /api/hotspots computes by default
+    index       NeighbourIndex.build: binning, BallTree and neighbourhoods, once per dataset version
+    cluster     one hotspots() run over every incident (what a filtered request pays)
+    windows     hotspots() per 7-day window, stepped daily over the year
+    agreement   adjusted Rand index against sklearn DBSCAN on the raw points (skipped above --exact-max)
+Run from backend/:
+    python -m benchmarks.bench_hotspots [--sizes 10000 100000 1000000 3000000] [--radius 250] [--exact-max 100000]
+"""
+import argparse
+import time
+import numpy as np
+
+from data_utils import SEVERITY_MAP, generate_mock_frame
+from hotspots import NeighbourIndex, cell_size
+from ml_engine import cluster_hotspots
+from routing_engine import EARTH_RADIUS_KM
+
+
+def bin_incidents(df, cell):
+    lat, lon = df["latitude"].to_numpy(np.float64), df["longitude"].to_numpy(np.float64)
+    return {
+        "row": np.floor(lat / cell).astype(np.int64),
+        "col": np.floor(lon / cell).astype(np.int64),
+        "day": df["crime_date"].to_numpy().astype("datetime64[D]").astype(np.int64),
+        "count": np.ones(len(lat)),
+        "lat_sum": lat,
+        "lon_sum": lon,
+        "severity": df["crime_type"].astype(object).map(SEVERITY_MAP).fillna(1).to_numpy(np.float64),
+    }
+
+
+def point_labels(index, cells, min_incidents):
+    """Cell-level DBSCAN labels spread back onto the incidents, for comparison with point-level DBSCAN."""
+    from hotspots import _dbscan
+    ids = index.locate(cells)
+    weight = np.bincount(ids, minlength=len(index.keys)).astype(np.float64)
+    return _dbscan(index.adjacency, weight, min_incidents)[ids]
+
+
+def run(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000, 3000000])
+    parser.add_argument("--radius", type=float, default=250.0)
+    parser.add_argument("--min-incidents", type=int, default=20, help="scaled with size, per 100k incidents")
+    parser.add_argument("--exact-max", type=int, default=100000, help="skip point-level DBSCAN above this many incidents")
+    args = parser.parse_args()
+
+    print(f"{'n':>8} | {'kmeans s':>8} | {'cells':>7} {'index s':>7} {'cluster s':>9} {'windows s':>9} {'hotspots':>8} | {'ARI':>5}")
+    for n in args.sizes:
+        df = generate_mock_frame(n, seed=0)
+        # The same relative density threshold at every size
+        min_incidents = max(2, int(args.min_incidents * n / 100000))
+        lat, lon = df["latitude"].to_numpy(np.float64), df["longitude"].to_numpy(np.float64)
+        _, t_kmeans = run(cluster_hotspots, lat, lon, 10)
+        cells = bin_incidents(df, cell_size(args.radius))
+        index, t_index = run(NeighbourIndex.build, args.radius, cells)
+        hotspots, t_cluster = run(index.hotspots, cells, 10, min_incidents)
+        windows, t_windows = run(index.windows, cells, 10, 7, 1, max(2, min_incidents // 52))
+        ari = ""
+        if n <= args.exact_max:
+            from sklearn.cluster import DBSCAN
+            from sklearn.metrics import adjusted_rand_score
+            exact = DBSCAN(eps=args.radius / 1000 / EARTH_RADIUS_KM, min_samples=min_incidents, metric="haversine",
+                           algorithm="ball_tree").fit_predict(np.radians(np.column_stack([lat, lon])))
+            ari = f"{adjusted_rand_score(exact, point_labels(index, cells, min_incidents)):5.3f}"
+        print(f"{n:>8} | {t_kmeans:8.2f} | {len(index.keys):>7} {t_index:7.2f} {t_cluster:9.3f} {t_windows:9.2f} "
+              f"{len(hotspots):>8} | {ari:>5}   ({len(windows)} windows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Timing of the vectorized process_csv / time_weights against the row-wise implementations they
+replaced; tests/test_process_csv.py holds those references and checks parity. Run from backend/:
+    python -m benchmarks.bench_process_csv [n_rows]
+"""
+import sys
+import time
+
+from data_utils import process_csv
+from ml_engine import time_weights
+from tests.test_process_csv import legacy_process_csv, legacy_time_weight, make_raw
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main(n):
+    raw = make_raw(n)
+    new, t_new = timed(process_csv, raw.copy())
+    _, t_old = timed(legacy_process_csv, raw.copy())
+    print(f"process_csv     n={n:>9,}  legacy {t_old:8.3f}s  vectorized {t_new:8.3f}s  speedup {t_old / t_new:6.1f}x")
+
+    hour = new["hour"]
+    _, t_new = timed(time_weights, hour.to_numpy())
+    _, t_old = timed(legacy_time_weight, hour)
+    print(f"time_weights    n={n:>9,}  legacy {t_old:8.3f}s  vectorized {t_new:8.3f}s  speedup {t_old / t_new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
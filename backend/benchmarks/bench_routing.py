@@ -0,0 +1,81 @@
+"""
+Quality/latency comparison of RoutingEngine.optimize_patrol against the previous networkx
+implementation (Christofides TSP on a Euclidean degree matrix, tour sliced per officer).
+Both are scored with the same haversine distances. Run from backend/:
+    python -m benchmarks.bench_routing [--sizes 10 50 200 500 1000 2000] [--officers 1 4] [--legacy-max 500]
+"""
+import argparse
+import time
+import networkx as nx
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from routing_engine import RoutingEngine, haversine_matrix
+
+
+def legacy_optimize_patrol(hotspots, n_officers=1):
+    coords = np.array([[h['lat'], h['lon']] for h in hotspots])
+    G = nx.from_numpy_array(cdist(coords, coords, metric='euclidean'))
+    path_nodes = nx.approximation.traveling_salesman_problem(G, cycle=True)[:-1]
+    chunk_size = len(path_nodes) // n_officers
+    routes = []
+    for i in range(n_officers):
+        start = i * chunk_size
+        end = (i + 1) * chunk_size if i < n_officers - 1 else len(path_nodes)
+        routes.append({"sequence": [hotspots[node] for node in path_nodes[start:end]]})
+    return routes
+
+
+def score(routes):
+    """(total km, longest officer route km) using haversine distances."""
+    lengths = []
+    for route in routes:
+        seq = route["sequence"]
+        if len(seq) < 2:
+            lengths.append(0.0)
+            continue
+        lat = np.array([h["lat"] for h in seq])
+        lon = np.array([h["lon"] for h in seq])
+        d = haversine_matrix(lat, lon)
+        lengths.append(float(d[np.arange(len(seq) - 1), np.arange(1, len(seq))].sum()))
+    return sum(lengths), max(lengths)
+
+
+def make_hotspots(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = 17.3850 + rng.uniform(-0.15, 0.15, n)
+    lon = 78.4867 + rng.uniform(-0.15, 0.15, n)
+    return [{"lat": float(a), "lon": float(b), "id": i} for i, (a, b) in enumerate(zip(lat, lon))]
+
+
+def run(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200, 500, 1000, 2000])
+    parser.add_argument("--officers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--legacy-max", type=int, default=500, help="skip the legacy solver above this many hotspots")
+    parser.add_argument("--budget", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{'n':>6} {'off':>4} | {'legacy s':>9} {'total km':>9} {'max km':>8} | {'new s':>7} {'total km':>9} {'max km':>8}")
+    for n in args.sizes:
+        hotspots = make_hotspots(n)
+        for k in args.officers:
+            new, t_new = run(RoutingEngine.optimize_patrol, hotspots, n_officers=k, time_budget=args.budget)
+            new_total, new_max = score(new)
+            if n <= args.legacy_max:
+                old, t_old = run(legacy_optimize_patrol, hotspots, n_officers=k)
+                old_total, old_max = score(old)
+                legacy = f"{t_old:9.3f} {old_total:9.1f} {old_max:8.1f}"
+            else:
+                legacy = f"{'skipped':>9} {'':>9} {'':>8}"
+            print(f"{n:>6} {k:>4} | {legacy} | {t_new:7.3f} {new_total:9.1f} {new_max:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
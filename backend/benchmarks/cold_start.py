@@ -0,0 +1,98 @@
+"""
+Time-to-first-request for the API process. Boots `uvicorn main:app` in a scratch working directory
+(so models/ and the snapshot start empty) and times, from process spawn:
+    ready          first successful response (uvicorn only accepts connections after startup)
+    first predict  first /api/predict answer (includes loading a restored model)
+The first boot of each round is cold (seed + train); the next boots restore the snapshot it wrote.
+Run from backend/:
+    python -m benchmarks.cold_start [--rounds 3] [--warm-boots 2] [--out PATH]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICT = "/api/predict?lat=17.4&lon=78.45&hour=22&weekday=4"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, start, timeout):
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as r:
+                if r.status == 200: return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.02)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def scrape(url, name):
+    with urllib.request.urlopen(url) as r:
+        lines = r.read().decode().splitlines()
+    return {line.split()[0]: float(line.split()[1]) for line in lines if line.startswith(name)}
+
+
+def boot(workdir, timeout):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, "SHARED_DIR": ""}
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready = wait_for(f"{base}/api/trends", start, timeout)
+        first_predict = wait_for(f"{base}{PREDICT}", start, timeout)
+        phases = scrape(f"{base}/metrics", "pchas_boot_")
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"ready_s": ready, "first_predict_s": first_predict, "boot_metrics": phases}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--warm-boots", type=int, default=2, help="snapshot restores after each cold boot")
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--out", help="write the raw results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.rounds):
+        workdir = tempfile.mkdtemp(prefix="pchas-boot-")
+        try:
+            for i in range(1 + args.warm_boots):
+                kind = "cold" if i == 0 else "snapshot"
+                result = {"kind": kind, **boot(workdir, args.timeout)}
+                results.append(result)
+                print(f"{kind:<9} ready {result['ready_s']:6.2f}s   first predict {result['first_predict_s']:6.2f}s", flush=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    for kind in ("cold", "snapshot"):
+        runs = [r for r in results if r["kind"] == kind]
+        if not runs: continue
+        print(f"{kind:<9} median ready {statistics.median(r['ready_s'] for r in runs):6.2f}s   "
+              f"first predict {statistics.median(r['first_predict_s'] for r in runs):6.2f}s   ({len(runs)} boots)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
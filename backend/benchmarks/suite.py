@@ -0,0 +1,223 @@
+"""
+End-to-end performance suite on synthetic Hyderabad data. For each dataset size it times data
+generation, CSV ingest (process_csv + add_crimes and the streaming upload path), MLEngine training
+and prediction, RoutingEngine.optimize_patrol and every API endpoint through a local TestClient.
+Each run is written as one JSON document (environment + per-step timings) so results can be
+compared between versions. Run from backend/:
+    python -m benchmarks.suite [--sizes 10k 100k 1m 10m] [--repeat 5] [--out PATH] [--compare BASELINE.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import sklearn
+
+from data_utils import generate_mock_frame, process_csv
+from density import DensityRaster
+from ingest import IngestStats, iter_clean_chunks
+from ml_engine import grid_axes
+from routing_engine import RoutingEngine
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text):
+    text = text.lower().replace("_", "")
+    return int(float(text[:-1]) * SUFFIXES[text[-1]]) if text[-1] in SUFFIXES else int(text)
+
+
+def git_revision():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class Recorder:
+    """Runs and times benchmark steps; every step becomes one flat, machine-readable record."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def time(self, size, group, name, fn, repeat=1, rows=None):
+        samples, out = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = fn()
+            samples.append(time.perf_counter() - start)
+        median = statistics.median(samples)
+        record = {
+            "size": size, "group": group, "name": name, "repeat": repeat,
+            "median_s": median, "min_s": min(samples), "max_s": max(samples),
+            "rows_per_s": rows / median if rows and median > 0 else None,
+        }
+        self.results.append(record)
+        rate = f"{record['rows_per_s']:>12,.0f} rows/s" if record["rows_per_s"] else ""
+        print(f"{size:>10,} {group:<8} {name:<40} {median * 1000:>10.2f} ms  {rate}", flush=True)
+        return out
+
+
+def bench_ingest(rec, n, store, seed):
+    df = rec.time(n, "data", "generate_mock_frame", lambda: generate_mock_frame(n, seed=seed), rows=n)
+    csv = rec.time(n, "data", "to_csv", lambda: df.to_csv(index=False).encode("utf-8"), rows=n)
+    raw = rec.time(n, "ingest", "read_csv", lambda: pd.read_csv(io.BytesIO(csv)), rows=n)
+    clean = rec.time(n, "ingest", "process_csv", lambda: process_csv(raw), rows=n)
+    rec.time(n, "ingest", "add_crimes", lambda: store.add_crimes(clean, clear=True), rows=n)
+    rec.time(n, "ingest", "stream_csv (upload path)", lambda: store.ingest(iter_clean_chunks(io.BytesIO(csv), IngestStats()), clear=True), rows=n)
+    return csv
+
+
+def bench_ml(rec, n, store, ml_engine, repeat):
+    frame = rec.time(n, "ml", "get_frame", store.get_frame, rows=n)
+    rec.time(n, "ml", "fit_hotspots (kmeans, 10)", lambda: ml_engine.fit_hotspots(frame, 10), rows=n)
+    density = rec.time(n, "ml", "density_raster", lambda: DensityRaster.from_frame(ml_engine.prepare_time_features(frame)), rows=n)
+    model, _ = rec.time(n, "ml", "fit_risk_model", lambda: ml_engine.fit_risk_model(frame, density), rows=n)
+    ml_engine.swap_risk_model(model, density)
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(17.25, 17.55, 10_000), rng.uniform(78.3, 78.65, 10_000)
+    rec.time(n, "ml", "predict_risk (single)", lambda: ml_engine.predict_risk(17.4, 78.45, 22, 4), repeat=repeat)
+    rec.time(n, "ml", "predict_risk_batch (10k points)", lambda: ml_engine.predict_risk_batch(lat, lon, 22, 4), repeat=repeat, rows=10_000)
+    # What /api/predict/grid scores: the cell centres of the bbox, in one batch
+    grid_lat, grid_lon = np.meshgrid(*grid_axes(17.25, 78.3, 17.55, 78.65, 0.005), indexing='ij')
+    rec.time(n, "ml", "predict_risk_batch (grid, 0.005 deg)", lambda: ml_engine.predict_risk_batch(grid_lat, grid_lon, 22, 4), repeat=repeat, rows=grid_lat.size)
+    return frame
+
+
+def bench_routing(rec, n, frame, budget):
+    rng = np.random.default_rng(1)
+    for stops in (10, 50, 200):
+        idx = rng.choice(len(frame), min(stops, len(frame)), replace=False)
+        hotspots = [{"lat": float(a), "lon": float(b), "id": int(i)}
+                    for i, a, b in zip(idx, frame["latitude"].to_numpy()[idx], frame["longitude"].to_numpy()[idx])]
+        for officers in (1, 4):
+            rec.time(n, "routing", f"optimize_patrol ({stops} stops, {officers} officers)",
+                     lambda: RoutingEngine.optimize_patrol(hotspots, n_officers=officers, time_budget=budget))
+
+
+def api_calls(n_points=1_000):
+    rng = np.random.default_rng(2)
+    batch = {"lat": rng.uniform(17.25, 17.55, n_points).tolist(), "lon": rng.uniform(78.3, 78.65, n_points).tolist(), "hour": 22, "weekday": 4}
+    return [
+        ("GET /api/heatmap", "get", "/api/heatmap", {}),
+        ("GET /api/heatmap (zoom 14 viewport)", "get", "/api/heatmap", {"params": {"min_lat": 17.38, "min_lon": 78.40, "max_lat": 17.45, "max_lon": 78.50, "zoom": 14}}),
+        ("GET /api/heatmap (msgpack)", "get", "/api/heatmap", {"params": {"format": "msgpack"}}),
+        ("GET /api/hotspots", "get", "/api/hotspots", {}),
+        ("GET /api/trends", "get", "/api/trends", {}),
+        ("GET /api/trends?range=30d", "get", "/api/trends", {"params": {"range": "30d"}}),
+        ("GET /api/patrol-route (4 officers)", "get", "/api/patrol-route", {"params": {"n_hotspots": 8, "n_officers": 4}}),
+        ("GET /api/patrol-route/export", "get", "/api/patrol-route/export", {"params": {"n_hotspots": 8, "n_officers": 4}}),
+        ("GET /api/patrol-route/export/batch", "get", "/api/patrol-route/export/batch", {"params": {"n_hotspots": 8, "n_officers": 4}}),
+        ("GET /api/predict", "get", "/api/predict", {"params": {"lat": 17.4, "lon": 78.45, "hour": 22, "weekday": 4}}),
+        (f"POST /api/predict/batch ({n_points} points)", "post", "/api/predict/batch", {"json": batch}),
+        ("GET /api/predict/grid", "get", "/api/predict/grid", {"params": {"min_lat": 17.3, "min_lon": 78.35, "max_lat": 17.5, "max_lon": 78.6, "hour": 22, "weekday": 4}}),
+        ("GET /api/incidents/nearby", "get", "/api/incidents/nearby", {"params": {"lat": 17.4375, "lon": 78.4482, "radius_m": 1000}}),
+    ]
+
+
+def bench_api(rec, n, client, main, csv, repeat, max_stream_rows):
+    def call(method, path, kwargs):
+        def run():
+            r = getattr(client, method)(path, **kwargs)
+            if r.status_code != 200: raise RuntimeError(f"{path} returned {r.status_code}: {r.text[:200]}")
+            return r
+        return run
+
+    for label, method, path, kwargs in api_calls():
+        # First call after ingest misses the versioned response cache; the repeats are served from it
+        rec.time(n, "api", f"{label} [cold]", call(method, path, kwargs))
+        rec.time(n, "api", f"{label} [warm]", call(method, path, kwargs), repeat=repeat)
+
+    if n <= max_stream_rows:
+        rec.time(n, "api", "GET /api/incidents/export (ndjson)", call("get", "/api/incidents/export", {}), rows=n)
+        files = {"file": ("bench.csv", csv, "text/csv")}
+        response = rec.time(n, "api", "POST /api/upload", call("post", "/api/upload", {"files": files}), rows=n)
+        # Let the retraining the upload queued finish so it does not overlap the next size
+        job_id = response.json()["job_id"]
+        while main.training_queue.get(job_id).status not in ("succeeded", "failed"): time.sleep(0.05)
+
+
+def compare(results, baseline_path, threshold):
+    """Print per-step ratios against a previous run; returns the steps slower than `threshold`x."""
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["group"], r["name"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nComparison with {baseline_path} (regression threshold {threshold:.2f}x)")
+    for r in results:
+        old = baseline.get((r["size"], r["group"], r["name"]))
+        if old is None or not old["median_s"]: continue
+        ratio = r["median_s"] / old["median_s"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        if flag: regressions.append({**r, "baseline_median_s": old["median_s"], "ratio": ratio})
+        print(f"{r['size']:>10,} {r['group']:<8} {r['name']:<40} {old['median_s'] * 1000:>10.2f} -> {r['median_s'] * 1000:>10.2f} ms  {ratio:5.2f}x {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k", "1m"], help="dataset sizes, e.g. 10k 100k 1m 10m")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats for cheap steps (median is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--routing-budget", type=float, default=1.0)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["ml", "routing", "api"])
+    parser.add_argument("--max-stream-rows", type=int, default=1_000_000, help="skip export/upload endpoints above this size")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<timestamp>-<git sha>.json)")
+    parser.add_argument("--compare", help="previous result file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    # Imported here so the app (and its DataStore / cache) is only built when the suite runs
+    import main as app_main
+    from fastapi.testclient import TestClient
+    client = TestClient(app_main.app)
+    store, ml_engine = app_main.store, app_main.ml_engine
+
+    sha, dirty = git_revision()
+    started = datetime.now(timezone.utc)
+    rec = Recorder(args.repeat)
+    for n in map(parse_size, args.sizes):
+        csv = bench_ingest(rec, n, store, args.seed)
+        frame = bench_ml(rec, n, store, ml_engine, args.repeat) if "ml" not in args.skip else store.get_frame()
+        if "routing" not in args.skip: bench_routing(rec, n, frame, args.routing_budget)
+        if "api" not in args.skip:
+            app_main.train_models()
+            bench_api(rec, n, client, app_main, csv, args.repeat, args.max_stream_rows)
+        del csv, frame
+
+    run = {
+        "started_at": started.isoformat(),
+        "git": {"sha": sha, "dirty": dirty},
+        "environment": {
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "sklearn": sklearn.__version__, "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "store": "postgres" if store.use_db else "memory",
+        },
+        "args": vars(args),
+        "results": rec.results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{started:%Y%m%dT%H%M%S}-{sha or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nWrote {len(rec.results)} results to {out}")
+
+    if args.compare:
+        regressions = compare(rec.results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} step(s) slower than {args.threshold:.2f}x baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
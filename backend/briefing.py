@@ -0,0 +1,65 @@
+import io
+import zipfile
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+NEXT_LINE = {"new_x": XPos.LMARGIN, "new_y": YPos.NEXT}
+
+
+def _new_document(title):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("helvetica", 'B', 16)
+    pdf.cell(200, 10, text=title, align='C', **NEXT_LINE)
+    pdf.ln(10)
+    return pdf
+
+
+def _route_section(pdf, route):
+    pdf.set_font("helvetica", 'B', 12)
+    pdf.cell(200, 10, text=f"OFFICER {route['officer_id']} - ROUTE ASSIGNMENT", **NEXT_LINE)
+    pdf.set_font("helvetica", '', 10)
+    pdf.cell(200, 10, text=f"Total Distance: {route['total_distance_km']:.2f} km | Est. Time: {route['est_time_mins']} mins", **NEXT_LINE)
+    pdf.ln(5)
+
+    pdf.set_font("helvetica", 'B', 10)
+    pdf.cell(30, 10, "Sequence", 1)
+    pdf.cell(80, 10, "Latitude", 1)
+    pdf.cell(80, 10, "Longitude", 1)
+    pdf.ln()
+
+    pdf.set_font("helvetica", '', 10)
+    for idx, h in enumerate(route['sequence']):
+        pdf.cell(30, 10, str(idx + 1), 1)
+        pdf.cell(80, 10, str(h['lat']), 1)
+        pdf.cell(80, 10, str(h['lon']), 1)
+        pdf.ln()
+    pdf.ln(10)
+
+
+def render_briefing(routes):
+    """All officers' routes in one briefing sheet, as PDF bytes (rendered in memory, no temp files)."""
+    pdf = _new_document("PCHAS Patrol Briefing Sheet")
+    for route in routes:
+        _route_section(pdf, route)
+    return bytes(pdf.output())
+
+
+def render_officer_briefing(route):
+    pdf = _new_document(f"PCHAS Patrol Briefing - Officer {route['officer_id']}")
+    _route_section(pdf, route)
+    return bytes(pdf.output())
+
+
+def briefing_zip(routes, pdfs=None):
+    """
+    ZIP with one PDF per officer. `pdfs` are the per-officer documents in route order when the caller
+    rendered them already (e.g. in parallel worker processes); otherwise they are rendered here.
+    """
+    if pdfs is None: pdfs = map(render_officer_briefing, routes)
+    buf = io.BytesIO()
+    # PDF content streams are already deflated, so storing avoids compressing twice
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as archive:
+        for route, pdf in zip(routes, pdfs):
+            archive.writestr(f"officer_{route['officer_id']}_briefing.pdf", pdf)
+    return buf.getvalue()
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+import numpy as np
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic): return obj.item()
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    if isinstance(obj, (date, datetime)): return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def encode_json(value):
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.skipped = 0  # values not stored: over the memory cache's size cap, or the backend failed
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "sets": self.sets, "skipped": self.skipped,
+            "evictions": self.evictions, "expirations": self.expirations, "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class MemoryCache:
+    """In-process byte cache with per-entry TTL and LRU eviction once max_bytes is exceeded."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.data = OrderedDict()  # key -> (expires_at, value)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self.data.get(key)
+            if item is None: return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._drop(key)
+                self.stats.expirations += 1
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def setex(self, key, ttl, value):
+        """Store value for ttl seconds (None = no expiry); False when it is larger than the whole cache."""
+        if isinstance(value, str): value = value.encode("utf-8")
+        if len(value) > self.max_bytes: return False
+        with self._lock:
+            if key in self.data: self._drop(key)
+            self.data[key] = (time.monotonic() + ttl if ttl else None, value)
+            self.bytes += len(value)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.data)))
+                self.stats.evictions += 1
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self.data: self._drop(key)
+
+    def _drop(self, key):
+        _, value = self.data.pop(key)
+        self.bytes -= len(value)
+
+    def info(self):
+        return {"backend": "memory", "entries": len(self.data), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class RedisCache:
+    """Same interface over Redis; TTLs are native and eviction follows the server's maxmemory policy."""
+
+    def __init__(self, client):
+        self.client = client
+        self.stats = CacheStats()
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def setex(self, key, ttl, value):
+        self.client.setex(key, ttl, value)
+        return True
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def info(self):
+        return {"backend": "redis", "entries": self.client.dbsize()}
+
+
+class ResponseCache:
+    """
+    Versioned, single-flight cache of encoded responses.
+    Keys are "<namespace>:<version>:<params>", so bumping the dataset (or model) version makes
+    old entries unreachable and they age out via TTL/LRU. Concurrent misses on one key wait for
+    the first caller's computation instead of repeating it.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = backend.stats
+        self._async_inflight = {}  # key -> asyncio.Event (one event loop per process)
+        # Redis calls block, so async callers run them in a worker thread; the memory backend is just a dict
+        self._blocking = not isinstance(backend, MemoryCache)
+
+    @staticmethod
+    def key(namespace, version, params, variant=None):
+        key = f"{namespace}:{version}:{json.dumps(params, sort_keys=True, default=str)}"
+        return f"{key}:{variant}" if variant else key
+
+    async def aget_or_compute(self, namespace, version, params, ttl, compute, encode=encode_json, variant=None):
+        """
+        Encoded bytes for the key, awaiting compute() (a coroutine function returning a JSON-able value)
+        at most once per miss, so waiting on a heavy computation (e.g. in the task executor) holds no
+        thread. `encode` turns that value into the stored bytes, in a worker thread; `variant` names the
+        encoding (format, compression) so each representation is cached, and served on a hit, as-is.
+        """
+        key = self.key(namespace, version, params, variant)
+        value = await self._aget(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+        flight = self._async_inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._async_inflight[key] = asyncio.Event()
+        else:
+            self.stats.coalesced += 1
+            await flight.wait()
+            value = await self._aget(key)
+            if value is not None:
+                self.stats.hits += 1
+                return value
+        self.stats.misses += 1
+        try:
+            value = await asyncio.to_thread(encode, await compute())
+            if self._blocking: stored = await asyncio.to_thread(self._set, key, ttl, value)
+            else: stored = self._set(key, ttl, value)
+            if stored: self.stats.sets += 1
+            else: self.stats.skipped += 1
+            return value
+        finally:
+            if leader:
+                self._async_inflight.pop(key, None)
+                flight.set()
+
+    async def _aget(self, key):
+        return await asyncio.to_thread(self._get, key) if self._blocking else self._get(key)
+
+    def _get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Cache get failed ({e})")
+            return None
+        if isinstance(value, str): value = value.encode("utf-8")
+        return value
+
+    def _set(self, key, ttl, value):
+        """Whether the backend stored the value."""
+        try: return self.backend.setex(key, ttl, value)
+        except Exception as e:
+            print(f"Cache set failed ({e})")
+            return False
+
+    def info(self):
+        return {**self.backend.info(), **self.stats.to_dict()}
+
+
+def build_cache(settings):
+    """Redis when reachable, otherwise the in-process fallback."""
+    if not (settings.USE_REDIS or settings.REDIS_HOST):
+        return ResponseCache(MemoryCache(settings.CACHE_MAX_BYTES))
+    try:
+        import redis
+        client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, socket_connect_timeout=1)
+        # Try a simple command to check if redis is truly alive
+        client.ping()
+        print("Redis connected successfully")
+        return ResponseCache(RedisCache(client))
+    except Exception:
+        print("Redis unavailable, using In-Memory Cache fallback")
+        return ResponseCache(MemoryCache(settings.CACHE_MAX_BYTES))
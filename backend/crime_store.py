@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+CRIME_COLUMNS = ["area_name", "place_type", "latitude", "longitude", "crime_type", "crime_date", "crime_time", "victim_age", "victim_gender", "risk_zone"]
+CATEGORICAL_COLUMNS = ["area_name", "place_type", "crime_type", "victim_gender", "risk_zone"]
+NUMERIC_COLUMNS = {"crime_id": np.int64, "latitude": np.float64, "longitude": np.float64, "victim_age": np.float32, "crime_ts": np.int64,
+                   "natural_key": np.uint64}
+
+
+def to_epoch_seconds(dates, times):
+    """Combine crime_date and crime_time columns into int64 seconds since the epoch."""
+    days = pd.to_datetime(pd.Series(dates).to_numpy()).to_numpy().astype("datetime64[D]").astype(np.int64)
+    times = pd.Series(times).to_numpy()
+    if np.issubdtype(times.dtype, np.timedelta64):
+        secs = times.astype("timedelta64[s]").astype(np.int64)
+    else:
+        # datetime.time objects and "HH:MM:SS" strings both round-trip through str()
+        secs = pd.to_timedelta(pd.Series(times).astype(str)).to_numpy().astype("timedelta64[s]").astype(np.int64)
+    return days * 86400 + secs
+
+
+def natural_keys(latitude, longitude, crime_ts, crime_type):
+    """
+    64-bit hash of an incident's natural key: location (to 1e-6 degrees, ~0.1 m), timestamp to the
+    second and crime type. Two rows with the same key are the same incident reported twice.
+    """
+    key = pd.DataFrame({
+        "lat": np.round(np.nan_to_num(np.asarray(latitude, dtype=np.float64)) * 1e6).astype(np.int64),
+        "lon": np.round(np.nan_to_num(np.asarray(longitude, dtype=np.float64)) * 1e6).astype(np.int64),
+        "ts": np.asarray(crime_ts, dtype=np.int64),
+        "type": pd.Series(np.asarray(crime_type, dtype=object)).fillna(""),
+    })
+    return pd.util.hash_pandas_object(key, index=False).to_numpy(dtype=np.uint64)
+
+
+class CategoryColumn:
+    """Dictionary encoding for one string column: values are stored as int32 codes, -1 for missing."""
+
+    def __init__(self, categories=()):
+        self.categories = list(categories)
+        self.lookup = {value: i for i, value in enumerate(self.categories)}
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(pd.Series(values).to_numpy(), use_na_sentinel=True)
+        remap = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            if value not in self.lookup:
+                self.lookup[value] = len(self.categories)
+                self.categories.append(value)
+            remap[i] = self.lookup[value]
+        out = np.full(len(codes), -1, dtype=np.int32)
+        mask = codes >= 0
+        out[mask] = remap[codes[mask]]
+        return out
+
+
+class ColumnarCrimeStore:
+    """
+    In-memory crime table kept as typed NumPy columns.
+    Rows are appended into pre-allocated buffers (amortised doubling), so views handed out
+    by frame()/arrays() stay valid while new rows are written past their end.
+    append(dedup=True) skips incidents already stored, looked up in a sorted copy of the
+    natural_key column that is built on first use and merged with each deduplicated batch.
+    """
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.Lock()
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self._n = 0
+        self._digest = b""
+        self.version = "empty"
+        self._cols = {name: np.empty(capacity, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        for name in CATEGORICAL_COLUMNS:
+            self._cols[name] = np.empty(capacity, dtype=np.int32)
+        self._categories = {name: CategoryColumn() for name in CATEGORICAL_COLUMNS}
+        self._key_index = None
+
+    def _reserve(self, size):
+        capacity = len(self._cols["crime_id"])
+        if size <= capacity: return
+        while capacity < size: capacity *= 2
+        for name, col in self._cols.items():
+            grown = np.empty(capacity, dtype=col.dtype)
+            grown[:self._n] = col[:self._n]
+            self._cols[name] = grown
+
+    def __len__(self):
+        return self._n
+
+    def clear(self):
+        with self._lock:
+            self._reset(1024)
+
+    def append(self, df, clear=False, dedup=False):
+        """
+        Add the rows of a cleaned frame. With dedup, rows whose natural key is already stored (or
+        repeated earlier in df) are dropped. Returns the rows actually added.
+        """
+        ts = to_epoch_seconds(df["crime_date"], df["crime_time"]) if len(df) else np.empty(0, dtype=np.int64)
+        keys = natural_keys(df["latitude"], df["longitude"], ts, df["crime_type"])
+        with self._lock:
+            if clear: self._reset(max(len(df), 1024))
+            if dedup:
+                index = self._sorted_keys()
+                keep = ~pd.Series(keys).duplicated().to_numpy()
+                if len(index): keep &= index[np.minimum(np.searchsorted(index, keys), len(index) - 1)] != keys
+                if not keep.all(): df, ts, keys = df[keep], ts[keep], keys[keep]
+                # Merging two sorted runs: timsort ("stable") does this in linear time
+                self._key_index = np.sort(np.concatenate([index, keys]), kind="stable")
+            else:
+                self._key_index = None
+            m = len(df)
+            if not m and not clear: return df
+            start = self._n
+            self._reserve(start + m)
+            rows = slice(start, start + m)
+            cols = self._cols
+            cols["crime_id"][rows] = np.arange(start, start + m)
+            cols["latitude"][rows] = df["latitude"].to_numpy(dtype=np.float64)
+            cols["longitude"][rows] = df["longitude"].to_numpy(dtype=np.float64)
+            cols["victim_age"][rows] = pd.to_numeric(df["victim_age"], errors="coerce").to_numpy(dtype=np.float32) if "victim_age" in df else np.nan
+            cols["crime_ts"][rows] = ts
+            cols["natural_key"][rows] = keys
+            for name in CATEGORICAL_COLUMNS:
+                cols[name][rows] = self._categories[name].encode(df[name]) if name in df else -1
+            self._n = start + m
+            self._bump_version(rows)
+        return df
+
+    def _sorted_keys(self):
+        if self._key_index is None: self._key_index = np.sort(self._cols["natural_key"][:self._n])
+        return self._key_index
+
+    def save(self, path):
+        """
+        Write the current rows to `path` as one .npy file per column plus meta.json, for other
+        processes to map with open().
+        """
+        views, categories = self._snapshot()
+        with self._lock: digest, version = self._digest, self.version
+        os.makedirs(path, exist_ok=True)
+        for name, view in views.items():
+            np.save(os.path.join(path, f"{name}.npy"), view)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"version": version, "digest": digest.hex(), "rows": len(views["crime_id"]), "categories": categories}, f)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Map a saved store read-only (np.load with mmap_mode="r"), so every process shares the page cache.
+        Appending to the result first copies the columns into private buffers (_reserve grows them).
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        store = cls()
+        if meta["rows"] == 0: return store
+        store._n = meta["rows"]
+        store._digest = bytes.fromhex(meta["digest"])
+        store.version = meta["version"]
+        files = {name: os.path.join(path, f"{name}.npy") for name in store._cols}
+        store._cols = {name: np.load(file, mmap_mode="r") for name, file in files.items() if os.path.exists(file)}
+        store._categories = {name: CategoryColumn(meta["categories"][name]) for name in CATEGORICAL_COLUMNS}
+        if "natural_key" not in store._cols:
+            # Saved before deduplication existed; derive the keys from the stored columns
+            cols, types = store._cols, np.array(store._categories["crime_type"].categories + [None], dtype=object)
+            store._cols["natural_key"] = natural_keys(cols["latitude"], cols["longitude"], cols["crime_ts"], types[cols["crime_type"]])
+        return store
+
+    def _bump_version(self, rows):
+        # Content fingerprint chained over every appended batch; cheap because only new rows are hashed
+        h = hashlib.blake2b(self._digest, digest_size=8)
+        for name in sorted(self._cols):
+            h.update(self._cols[name][rows].tobytes())
+        for name in CATEGORICAL_COLUMNS:
+            h.update(repr(self._categories[name].categories).encode())
+        self._digest = h.digest()
+        self.version = h.hexdigest()
+
+    def _snapshot(self):
+        with self._lock:
+            n = self._n
+            views = {}
+            for name, col in self._cols.items():
+                view = col[:n]
+                view.flags.writeable = False
+                views[name] = view
+            categories = {name: list(c.categories) for name, c in self._categories.items()}
+        return views, categories
+
+    def arrays(self):
+        """Read-only column views; categorical columns are returned as int32 codes."""
+        return self._snapshot()
+
+    def frame(self):
+        """Zero-copy DataFrame over the current rows. crime_ts is a datetime64[s] column."""
+        return self.build_frame(*self._snapshot())
+
+    @staticmethod
+    def build_frame(views, categories, rows=None):
+        """DataFrame over column views from arrays(); with rows (ids), only those rows are gathered."""
+        if rows is not None:
+            views = {name: views[name][rows] for name in ["crime_id", "latitude", "longitude", "victim_age", "crime_ts"] + CATEGORICAL_COLUMNS}
+        data = {
+            "crime_id": views["crime_id"],
+            "latitude": views["latitude"],
+            "longitude": views["longitude"],
+            "victim_age": views["victim_age"],
+            "crime_ts": views["crime_ts"].view("datetime64[s]"),
+        }
+        for name in CATEGORICAL_COLUMNS:
+            data[name] = pd.Categorical.from_codes(views[name], categories=pd.Index(categories[name], dtype=object))
+        return pd.DataFrame(data, copy=False)
+
+    def records(self):
+        """Row dicts in the same shape as the ORM path (datetime.date / datetime.time values)."""
+        df = self.frame()
+        ts = df.pop("crime_ts")
+        df["crime_date"] = ts.dt.date
+        df["crime_time"] = ts.dt.time
+        for name in CATEGORICAL_COLUMNS:
+            df[name] = df[name].astype(object).where(df[name].notna(), None)
+        age = df["victim_age"].round().astype("Int64").astype(object)
+        df["victim_age"] = age.where(age.notna(), None)
+        return df.to_dict(orient="records")
@@ -1,9 +1,7 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import random
 from sqlalchemy.orm import Session
-from models import Crime
+from metrics import timed
 
 try:
     from geoalchemy2 import WKTElement
@@ -24,47 +22,112 @@ PLACE_TYPES = [
 
 AREA_NAMES = ["Banjara Hills", "Secunderabad", "Gachibowli", "Madhapur", "Ameerpet", "Jubilee Hills"]
 
-def generate_mock_data(n=1000):
-    data = []
-    now = datetime.now()
-    
-    # Coordinates centered around Hyderabad, India
-    center_lat, center_lon = 17.3850, 78.4867
-    
-    for _ in range(n):
-        lat = center_lat + random.uniform(-0.15, 0.15)
-        lon = center_lon + random.uniform(-0.15, 0.15)
-        # Use last 12 months so dashboard always shows live data
-        crime_date = now - timedelta(days=random.randint(0, 365))
-        crime_time = datetime.strptime(f"{random.randint(0, 23)}:{random.randint(0, 59)}", "%H:%M").time()
-        
-        crime_type = random.choice(CRIME_TYPES)
-        # Severity weights
-        severity = 1 if crime_type in ["Vandalism", "Theft"] else 2 if crime_type in ["Burglary", "Assault"] else 3
-        
-        data.append({
-            "area_name": random.choice(AREA_NAMES),
-            "place_type": random.choice(PLACE_TYPES),
-            "latitude": lat,
-            "longitude": lon,
-            "crime_type": crime_type,
-            "crime_date": crime_date.date(),
-            "crime_time": crime_time,
-            "victim_age": random.randint(18, 80),
-            "victim_gender": random.choice(["Male", "Female", "Other"]),
-            "risk_zone": "Unknown"
-        })
-    return data
-
-def seed_database(db: Session, n=10000):
-    mock_data = generate_mock_data(n)
-    for item in mock_data:
-        crime = Crime(**{k: v for k, v in item.items()})
-        if _GEOM_AVAILABLE and WKTElement:
-            crime.geom = WKTElement(f'POINT({item["longitude"]} {item["latitude"]})', srid=4326)
-        db.add(crime)
-    db.commit()
+CITY_CENTRE = (17.3850, 78.4867)
+# Approximate centres of the seeded areas; most synthetic incidents cluster around these
+AREA_CENTRES = {
+    "Banjara Hills": (17.4156, 78.4347), "Secunderabad": (17.4399, 78.4983), "Gachibowli": (17.4401, 78.3489),
+    "Madhapur": (17.4483, 78.3915), "Ameerpet": (17.4375, 78.4482), "Jubilee Hills": (17.4326, 78.4071),
+}
+# Relative incident frequency by crime type and by hour of day (quiet before dawn, evening peak)
+CRIME_TYPE_WEIGHTS = [30, 8, 14, 12, 10, 9, 1, 2, 14]
+HOURLY_WEIGHTS = [4, 3, 2, 2, 1, 1, 2, 3, 4, 5, 5, 6, 6, 6, 6, 6, 7, 8, 9, 10, 10, 9, 8, 6]
+# One datetime.time per minute of the day, so time columns are built by indexing instead of strptime
+_MINUTE_TIMES = pd.to_datetime(np.arange(1440), unit="m").time
+
+def _choice(rng, options, n, weights=None):
+    p = None if weights is None else np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    return pd.Categorical.from_codes(rng.choice(len(options), n, p=p), categories=options)
+
+def generate_mock_frame(n=1000, seed=None, now=None):
+    """
+    Vectorized synthetic incidents around Hyderabad over the 12 months before `now`.
+    80% are scattered around the area centres, the rest uniformly over the city; crime types and
+    hours follow CRIME_TYPE_WEIGHTS / HOURLY_WEIGHTS. String columns are categoricals, crime_date is
+    datetime64 and crime_time holds datetime.time values. `seed` may be an int or a numpy Generator.
+    """
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(pd.Timestamp.now() if now is None else pd.Timestamp(now), 'D')
+    area_names = _choice(rng, AREA_NAMES, n)
+    centres = np.array([AREA_CENTRES[a] for a in AREA_NAMES])[area_names.codes]
+    local = rng.random(n) < 0.8
+    lat = np.where(local, centres[:, 0] + rng.normal(0, 0.012, n), CITY_CENTRE[0] + rng.uniform(-0.15, 0.15, n))
+    lon = np.where(local, centres[:, 1] + rng.normal(0, 0.012, n), CITY_CENTRE[1] + rng.uniform(-0.15, 0.15, n))
+    minute = rng.choice(24, n, p=np.divide(HOURLY_WEIGHTS, sum(HOURLY_WEIGHTS))) * 60 + rng.integers(0, 60, n)
+
+    return pd.DataFrame({
+        "area_name": area_names,
+        "place_type": _choice(rng, PLACE_TYPES, n),
+        "latitude": lat,
+        "longitude": lon,
+        "crime_type": _choice(rng, CRIME_TYPES, n, CRIME_TYPE_WEIGHTS),
+        "crime_date": (today - rng.integers(0, 366, n)).astype("datetime64[ns]"),
+        "crime_time": _MINUTE_TIMES[minute],
+        "victim_age": rng.integers(18, 81, n),
+        "victim_gender": _choice(rng, ["Male", "Female", "Other"], n),
+        "risk_zone": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=["Unknown"]),
+    })
+
+def generate_mock_data(n=1000, seed=None):
+    """Synthetic incidents as a list of record dicts (crime_date as datetime.date); see generate_mock_frame."""
+    df = generate_mock_frame(n, seed).astype({c: object for c in ["area_name", "place_type", "crime_type", "victim_gender", "risk_zone"]})
+    df["crime_date"] = df["crime_date"].dt.date
+    return df.to_dict("records")
+
+def seed_database(db: Session, n=10000, chunk_rows=100_000):
+    """Bulk-load n synthetic incidents through the COPY ingest path, chunk_rows at a time."""
+    from ingest import bulk_load
+    rng = np.random.default_rng()
+    chunks = (generate_mock_frame(min(chunk_rows, n - start), rng) for start in range(0, n, chunk_rows))
+    bulk_load(db.get_bind(), chunks, clear=False, with_geom=_GEOM_AVAILABLE)
+
+# Severity scores
+SEVERITY_MAP = {
+    "Homicide": 10, "Robbery": 8, "Assault": 7, "Kidnapping": 9,
+    "Burglary": 5, "Vehicle Theft": 5, "Drug Offense": 4,
+    "Theft": 3, "Vandalism": 2
+}
 
+TIME_FORMATS = ["%H:%M:%S", "%H:%M"]
+
+def parse_times(times: pd.Series):
+    """
+    Vectorized crime_time parsing. Strings are tried against the common formats in bulk, and
+    only rows that match none of them fall back to per-element inference (format='mixed').
+    Non-string values (e.g. datetime.time) are passed through. Returns (times, hours) arrays.
+    """
+    values = times.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        is_str = np.ones(len(values), dtype=bool)
+    else:
+        is_str = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    pending = is_str.copy()
+    for fmt in TIME_FORMATS + ["mixed"]:
+        if not pending.any(): break
+        attempt = pd.to_datetime(pd.Series(values[pending]), format=fmt, errors="coerce").to_numpy()
+        parsed[pending] = attempt
+        pending[pending] = np.isnat(attempt)
+
+    parsed = pd.Series(parsed)
+    out = values.copy()
+    out[is_str] = parsed[is_str].dt.time.to_numpy()
+    out[is_str & parsed.isna().to_numpy()] = None
+    hours = parsed.dt.hour.to_numpy(dtype=np.float64, na_value=np.nan)
+    if not is_str.all():
+        hours[~is_str] = [getattr(t, "hour", np.nan) for t in values[~is_str]]
+    return out, hours
+
+def get_shifts(hours):
+    hours = np.asarray(hours)
+    return np.select([(hours >= 6) & (hours < 14), (hours >= 14) & (hours < 22)], ["Morning", "Evening"], "Night").astype(object)
+
+def severity_scores(crime_types: pd.Series):
+    # Look up each distinct category once, then broadcast through the codes (trailing slot is code -1 / missing)
+    cat = pd.Categorical(crime_types)
+    lut = np.array([SEVERITY_MAP.get(c, 1) for c in cat.categories] + [1], dtype=np.int64)
+    return lut[cat.codes]
+
+@timed("ingest.process_csv")
 def process_csv(df: pd.DataFrame):
     # Validation and cleaning
     required_cols = ["latitude", "longitude", "crime_date", "crime_time", "crime_type"]
@@ -76,36 +139,16 @@ def process_csv(df: pd.DataFrame):
     
     # Feature Engineering
     df['crime_date'] = pd.to_datetime(df['crime_date'], errors='coerce')
-    # Try to parse time, handle if it's already a time object or string
-    def safe_time_parse(t):
-        if pd.isna(t): return None
-        if isinstance(t, str):
-            try: return pd.to_datetime(t).time()
-            except: 
-                try: return pd.to_datetime(t, format='%H:%M:%S').time()
-                except: return None
-        return t
-
-    df['crime_time'] = df['crime_time'].apply(safe_time_parse)
+    # Time may arrive as strings in several formats or as time objects already
+    times, hours = parse_times(df['crime_time'])
+    df['crime_time'] = times
+    valid = (df['crime_date'].notna() & df['crime_time'].notna()).to_numpy()
     df = df.dropna(subset=['crime_date', 'crime_time'])
     
-    df['hour'] = df['crime_time'].apply(lambda x: x.hour)
+    df['hour'] = hours[valid].astype(np.int64)
     df['weekday'] = df['crime_date'].dt.weekday
     df['month'] = df['crime_date'].dt.month
-    
-    def get_shift(hour):
-        if 6 <= hour < 14: return "Morning"
-        elif 14 <= hour < 22: return "Evening"
-        else: return "Night"
-        
-    df['shift'] = df['hour'].apply(get_shift)
-    
-    # Severity scores
-    severity_map = {
-        "Homicide": 10, "Robbery": 8, "Assault": 7, "Kidnapping": 9,
-        "Burglary": 5, "Vehicle Theft": 5, "Drug Offense": 4,
-        "Theft": 3, "Vandalism": 2
-    }
-    df['severity_score'] = df['crime_type'].map(lambda x: severity_map.get(x, 1))
+    df['shift'] = get_shifts(df['hour'].to_numpy())
+    df['severity_score'] = severity_scores(df['crime_type'])
     
     return df
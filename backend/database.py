@@ -9,6 +9,28 @@ class Settings(BaseSettings):
     REDIS_HOST: str = ""
     REDIS_PORT: int = 6379
     USE_REDIS: bool = False
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Honour `X-Profile: 1` with a Server-Timing stage breakdown; it exposes internals, so opt in (dev, benchmarks)
+    ALLOW_PROFILING: bool = False
+    # Directory shared by `uvicorn --workers N` processes (e.g. /dev/shm/pchas); empty = standalone worker
+    SHARED_DIR: str = ""
+    # Snapshot of the dataset + risk model restored at boot when its fingerprint matches; empty = always retrain
+    SNAPSHOT_DIR: str = "models/snapshot"
+    # CPU-bound tasks (clustering, routing, batch prediction, PDFs): worker processes (-1 = auto, 0 = threads),
+    # tasks queued or running before requests get 503, and seconds a request waits for its task (504 after)
+    EXECUTOR_PROCESSES: int = -1
+    EXECUTOR_MAX_PENDING: int = 32
+    EXECUTOR_TIMEOUT: float = 60.0
+    # Retraining after appends updates the current models from the new rows until the rows appended
+    # since the last full fit exceed this fraction of the rows it was trained on; then it refits from scratch
+    INCREMENTAL_REFIT_FRACTION: float = 0.2
+    # Risk predictions for up to this many points use the compiled forest (forest.py), which avoids sklearn's
+    # per-call overhead; bigger batches use sklearn, whose traversal is faster there. 0 = always sklearn
+    COMPILED_INFERENCE_MAX_ROWS: int = 256
+    # Density hotspots (algorithm=density, hotspots.py): DBSCAN radius in metres and the incidents within
+    # it that make a dense point
+    HOTSPOT_RADIUS_M: float = 400.0
+    HOTSPOT_MIN_INCIDENTS: int = 10
     SECRET_KEY: str = "changeme"
 
 settings = Settings()
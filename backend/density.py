@@ -0,0 +1,80 @@
+import numpy as np
+
+CELL_DEG = 0.0025     # ~275 m
+WINDOW_CELLS = 8      # density is the share of incidents within +-8 cells (~4.5 km box), roughly one neighbourhood
+MAX_CELLS = 1024      # per axis; the cell size grows instead if the data spans a wider extent
+N_BUCKETS = 3
+
+
+def hour_buckets(hour):
+    """Night (22-6) 0, evening (14-22) 1, morning 2: the same boundaries as ml_engine.time_weights."""
+    hour = np.asarray(hour)
+    return np.select([(hour >= 22) | (hour < 6), (hour >= 14) & (hour < 22)], [0, 1], 2)
+
+
+def _box_sum(a, r):
+    """Sum over a (2r+1)x(2r+1) window around every cell of the last two axes, via summed-area tables."""
+    k = 2 * r + 1
+    padded = np.pad(a, [(0, 0)] * (a.ndim - 2) + [(r + 1, r), (r + 1, r)])
+    s = padded.cumsum(-2).cumsum(-1)
+    return s[..., k:, k:] - s[..., :-k, k:] - s[..., k:, :-k] + s[..., :-k, :-k]
+
+
+class DensityRaster:
+    """
+    Precomputed spatial density: for each grid cell (and hour bucket), the share of incidents that fall
+    within the surrounding window. Built once per dataset version; lookup() is a vectorized O(1)
+    index into a float32 array and is used for both training features and inference.
+    """
+
+    def __init__(self, lat0, lon0, cell, values):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.cell = cell
+        self.values = values  # (buckets, rows, cols) float32
+
+    @classmethod
+    def fit(cls, lat, lon, hour=None, cell=CELL_DEG, window=WINDOW_CELLS):
+        """Raster from incident coordinates; pass hour to split by hour bucket, or None for one layer."""
+        lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        ok = np.isfinite(lat) & np.isfinite(lon)
+        buckets = np.zeros(len(lat), dtype=np.int64) if hour is None else hour_buckets(np.asarray(hour)).astype(np.int64)
+        lat, lon, buckets = lat[ok], lon[ok], buckets[ok]
+        n_buckets = 1 if hour is None else N_BUCKETS
+        if len(lat) == 0:
+            return cls(0.0, 0.0, cell, np.zeros((n_buckets, 1, 1), dtype=np.float32))
+
+        span = max(lat.max() - lat.min(), lon.max() - lon.min())
+        cell = max(cell, span / (MAX_CELLS - 2 * window))
+        lat0 = lat.min() - window * cell
+        lon0 = lon.min() - window * cell
+        rows = int((lat.max() - lat0) / cell) + window + 1
+        cols = int((lon.max() - lon0) / cell) + window + 1
+        r = ((lat - lat0) / cell).astype(np.int64)
+        c = ((lon - lon0) / cell).astype(np.int64)
+        counts = np.bincount((buckets * rows + r) * cols + c, minlength=n_buckets * rows * cols).reshape(n_buckets, rows, cols)
+        totals = np.maximum(counts.sum(axis=(1, 2)), 1)[:, None, None]
+        values = (_box_sum(counts, window) / totals).astype(np.float32)
+        return cls(float(lat0), float(lon0), float(cell), values)
+
+    @classmethod
+    def from_frame(cls, df, by_hour=True):
+        hour = df['hour'].to_numpy() if by_hour else None
+        return cls.fit(df['latitude'].to_numpy(), df['longitude'].to_numpy(), hour)
+
+    def lookup(self, lat, lon, hour=None):
+        """Density at each point (broadcasting); 0 outside the raster."""
+        lat, lon, hour = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+                                             np.asarray(0 if hour is None else hour))
+        n_buckets, rows, cols = self.values.shape
+        r = np.floor((lat - self.lat0) / self.cell)
+        c = np.floor((lon - self.lon0) / self.cell)
+        inside = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+        r = np.where(inside, r, 0).astype(np.int64)
+        c = np.where(inside, c, 0).astype(np.int64)
+        b = hour_buckets(hour) if n_buckets > 1 else np.zeros_like(r)
+        return np.where(inside, self.values[b, r, c], np.float32(0)).astype(np.float64)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
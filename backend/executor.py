@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import Counter, stage
+
+TASKS = Counter("pchas_executor_tasks_total", "CPU-bound tasks by outcome", ["task", "outcome"])
+
+
+class Overloaded(Exception):
+    """Too many tasks pending; callers should answer 503 and let the client retry."""
+
+
+class TaskTimeout(Exception):
+    """The caller stopped waiting; the task itself keeps running (processes cannot be interrupted)."""
+
+
+def auto_processes():
+    # Leave a core for the event loop and request threads; the pool is opt-out on single-core hosts
+    return max(0, min(4, (os.cpu_count() or 1) - 1))
+
+
+class TaskExecutor:
+    """
+    Runs CPU-bound tasks (clustering, routing, batch prediction, PDF rendering) off the request
+    threads, in a process pool so they run in parallel instead of taking turns on the GIL.
+      - Back-pressure: at most max_pending distinct tasks queued or running; beyond that submit()
+        raises Overloaded instead of letting the queue (and latency) grow without bound.
+      - Coalescing: tasks submitted with the same key while one is in flight share its future,
+        so ten identical patrol-route requests solve the route once.
+      - Timeouts: callers stop waiting after `timeout` seconds (TaskTimeout). The computation is
+        left to finish, so a retry with the same key joins it rather than starting over.
+    With processes=0 tasks run on a small thread pool instead (single-core hosts, debugging).
+    Task functions and their arguments must be picklable, i.e. module-level functions; tasks that
+    need this process's state (bound methods, open connections) are submitted with local=True and
+    run on the thread pool under the same limits.
+    Callers' waits are timed as "executor.<task>" stages, so they show up in Server-Timing.
+    """
+
+    def __init__(self, processes=-1, max_pending=32, timeout=60.0):
+        self.processes = auto_processes() if processes < 0 else processes
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._threads = None
+        self._inflight = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_pool(self, local=False):
+        if local or not self.processes:
+            if self._threads is None: self._threads = ThreadPoolExecutor(max_workers=4, thread_name_prefix="task")
+            return self._threads
+        if self._pool is None:
+            # forkserver/spawn: forking a process that already runs threads can deadlock the child
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=context)
+        return self._pool
+
+    def submit(self, key, fn, *args, local=False):
+        """Future for fn(*args), shared with an in-flight task of the same key (None = never shared)."""
+        name = getattr(fn, "__name__", "task")
+        with self._lock:
+            future = self._inflight.get(key) if key is not None else None
+            if future is not None:
+                TASKS.inc(task=name, outcome="coalesced")
+                return future
+            if self._pending >= self.max_pending:
+                TASKS.inc(task=name, outcome="rejected")
+                raise Overloaded(f"{self._pending} tasks pending")
+            try:
+                future = self._get_pool(local).submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool rather than failing every task from now on
+                print("TaskExecutor: process pool broken, restarting it")
+                self._pool = None
+                future = self._get_pool(local).submit(fn, *args)
+            self._pending += 1
+            if key is not None: self._inflight[key] = future
+
+        def done(f):
+            with self._lock:
+                self._pending -= 1
+                if key is not None and self._inflight.get(key) is f: del self._inflight[key]
+            TASKS.inc(task=name, outcome="error" if f.cancelled() or f.exception() else "ok")
+        future.add_done_callback(done)
+        return future
+
+    def run_sync(self, key, fn, *args, local=False, timeout=None):
+        """Blocking form for code already on a worker thread (e.g. inside a ModelRegistry train callback)."""
+        name = getattr(fn, "__name__", "task")
+        future = self.submit(key, fn, *args, local=local)
+        with stage(f"executor.{name}"):
+            try:
+                return future.result(timeout or self.timeout)
+            except FutureTimeout:
+                TASKS.inc(task=name, outcome="timeout")
+                raise TaskTimeout(f"{name} did not finish within {timeout or self.timeout}s")
+
+    async def run(self, key, fn, *args, local=False, timeout=None):
+        """Await fn(*args) without holding a thread. Cancelling the awaiting request does not cancel the task."""
+        name = getattr(fn, "__name__", "task")
+        future = asyncio.wrap_future(self.submit(key, fn, *args, local=local))
+        with stage(f"executor.{name}"):
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+            except asyncio.TimeoutError:
+                TASKS.inc(task=name, outcome="timeout")
+                raise TaskTimeout(f"{name} did not finish within {timeout or self.timeout}s")
+
+    def warm_up(self, fn):
+        """Start the worker processes now (and let fn import heavy modules in them) instead of on the first request."""
+        if not self.processes: return
+        for future in [self._get_pool().submit(fn) for _ in range(self.processes)]:
+            future.result()
+
+    def shutdown(self):
+        for pool in (self._pool, self._threads):
+            if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._threads = None
+
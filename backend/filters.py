@@ -0,0 +1,172 @@
+"""
+The filter spec shared by the analytic endpoints (heatmap, hotspots, patrol route, trends) and the
+secondary indexes the in-memory store answers it from.
+"""
+import threading
+import numpy as np
+
+from data_utils import SEVERITY_MAP
+from density import hour_buckets
+
+SHIFTS = ("night", "evening", "morning")  # density.hour_buckets order: 22-6, 14-22, 6-14
+SHIFT_HOURS = {"night": (22, 6), "evening": (14, 22), "morning": (6, 14)}
+CATEGORY_FILTERS = ("crime_type", "area_name", "place_type")
+
+
+def _split(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+class CrimeFilter:
+    """
+    Which incidents an analytic query covers. Criteria are optional and combine with AND:
+        start, end                          incident dates, inclusive (datetime.date)
+        crime_type, area_name, place_type   any of a set of values
+        shift                               night (22-6), evening (14-22) or morning (6-14)
+        min_severity                        SEVERITY_MAP score of the crime type (unknown types score 1)
+    Severity is folded into the crime_type set, so both stores only ever filter on category values.
+    An empty filter is falsy and matches everything.
+    """
+
+    def __init__(self, start=None, end=None, crime_type=None, area_name=None, place_type=None, shift=None, min_severity=None):
+        if start is not None and end is not None and end < start: raise ValueError("end is before start")
+        if shift is not None and shift not in SHIFTS: raise ValueError(f"shift must be one of: {', '.join(SHIFTS)}")
+        self.start, self.end, self.shift, self.min_severity = start, end, shift, min_severity
+        self.values = {name: frozenset(v) for name, v in zip(CATEGORY_FILTERS, (crime_type, area_name, place_type)) if v}
+        if min_severity is not None and min_severity > 1:
+            severe = frozenset(t for t, s in SEVERITY_MAP.items() if s >= min_severity)
+            self.values["crime_type"] = self.values.get("crime_type", severe) & severe
+
+    @classmethod
+    def parse(cls, start=None, end=None, crime_type=None, area_name=None, place_type=None, shift=None, min_severity=None):
+        """From query-string values, where the category criteria are comma-separated lists."""
+        return cls(start, end, _split(crime_type), _split(area_name), _split(place_type), shift, min_severity)
+
+    def __bool__(self):
+        return bool(self.start or self.end or self.shift or self.values)
+
+    def key(self):
+        """The set criteria as plain data, for cache keys and task coalescing."""
+        key = {name: sorted(values) for name, values in self.values.items()}
+        if self.start is not None: key["start"] = str(self.start)
+        if self.end is not None: key["end"] = str(self.end)
+        if self.shift is not None: key["shift"] = self.shift
+        return key
+
+    @property
+    def by_rollup(self):
+        """True when the day x type x area trend rollup can answer it (no place_type or shift criteria)."""
+        return self.shift is None and "place_type" not in self.values
+
+    def ts_range(self):
+        """[lo, hi) bounds on crime_ts epoch seconds; None for an open end."""
+        lo = None if self.start is None else int(np.datetime64(self.start, "D").astype(np.int64)) * 86400
+        hi = None if self.end is None else (int(np.datetime64(self.end, "D").astype(np.int64)) + 1) * 86400
+        return lo, hi
+
+    def sql(self):
+        """(WHERE clause, bind params) over the crimes table; "TRUE" when empty."""
+        clauses, params = [], {}
+        if self.start is not None:
+            clauses.append("crime_date >= :f_start")
+            params["f_start"] = self.start
+        if self.end is not None:
+            clauses.append("crime_date <= :f_end")
+            params["f_end"] = self.end
+        for name, values in self.values.items():
+            clauses.append(f"{name} = ANY(:f_{name})")
+            params[f"f_{name}"] = sorted(values)
+        if self.shift is not None:
+            first, last = SHIFT_HOURS[self.shift]
+            hour = "EXTRACT(HOUR FROM crime_time)"
+            clauses.append(f"({hour} >= {first} {'AND' if first < last else 'OR'} {hour} < {last})")
+        return " AND ".join(clauses) or "TRUE", params
+
+
+class CrimeIndex:
+    """
+    Secondary indexes over one version of the columnar store, each built on first use:
+        crime_ts            row ids sorted by time, so a date range is two binary searches and a slice
+        category columns    row ids grouped by code (CSR postings), so a value set costs its matching rows
+        shift               the same postings over the hour bucket of each incident
+    select() materialises the smallest candidate list and checks the other criteria on just those rows,
+    so a filtered query costs time proportional to the rows it matches rather than a full scan.
+    """
+
+    def __init__(self, version, cols, categories):
+        self.version = version
+        self.cols = cols
+        self.categories = categories
+        self._built = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, build):
+        built = self._built.get(name)
+        if built is None:
+            with self._lock:
+                built = self._built.get(name)
+                if built is None: built = self._built[name] = build()
+        return built
+
+    def _by_time(self):
+        ts = self.cols["crime_ts"]
+        order = np.argsort(ts, kind="stable")
+        return order, ts[order]
+
+    @staticmethod
+    def _postings(keys, n_keys):
+        order = np.argsort(keys, kind="stable")
+        return order, np.searchsorted(keys[order], np.arange(n_keys + 1))
+
+    def _hours(self, rows=None):
+        ts = self.cols["crime_ts"] if rows is None else self.cols["crime_ts"][rows]
+        return hour_buckets(ts % 86400 // 3600)
+
+    def _category_codes(self, name, values):
+        lookup = {value: i for i, value in enumerate(self.categories[name])}
+        return np.array(sorted(lookup[v] for v in values if v in lookup), dtype=np.int64)
+
+    # Each criterion yields (matching rows, fetch() -> their ids, check(ids) -> mask over ids)
+
+    def _time_criterion(self, lo, hi):
+        order, ts_sorted = self._get("crime_ts", self._by_time)
+        a = 0 if lo is None else int(np.searchsorted(ts_sorted, lo))
+        b = len(ts_sorted) if hi is None else int(np.searchsorted(ts_sorted, hi))
+        ts = self.cols["crime_ts"]
+
+        def check(rows):
+            t, mask = ts[rows], np.ones(len(rows), dtype=bool)
+            if lo is not None: mask &= t >= lo
+            if hi is not None: mask &= t < hi
+            return mask
+        return max(b - a, 0), lambda: order[a:b], check
+
+    def _category_criterion(self, name, values):
+        column = self.cols[name]
+        # Missing values are code -1; keys are shifted by one so they have postings too
+        order, bounds = self._get(name, lambda: self._postings(column + 1, len(self.categories[name]) + 1))
+        keys = self._category_codes(name, values) + 1
+
+        def fetch():
+            return np.concatenate([order[bounds[k]:bounds[k + 1]] for k in keys] or [np.empty(0, dtype=np.int64)])
+        return int((bounds[keys + 1] - bounds[keys]).sum()), fetch, lambda rows: np.isin(column[rows] + 1, keys)
+
+    def _shift_criterion(self, shift):
+        bucket = SHIFTS.index(shift)
+        order, bounds = self._get("shift", lambda: self._postings(self._hours(), len(SHIFTS)))
+        return int(bounds[bucket + 1] - bounds[bucket]), lambda: order[bounds[bucket]:bounds[bucket + 1]], \
+            lambda rows: self._hours(rows) == bucket
+
+    def select(self, filters):
+        """Row ids (ascending) of the incidents matching filters."""
+        criteria = [self._category_criterion(name, values) for name, values in filters.values.items()]
+        lo, hi = filters.ts_range()
+        if lo is not None or hi is not None: criteria.append(self._time_criterion(lo, hi))
+        if filters.shift is not None: criteria.append(self._shift_criterion(filters.shift))
+        if not criteria: return np.arange(len(self.cols["crime_ts"]))
+        criteria.sort(key=lambda c: c[0])
+        rows = criteria[0][1]()
+        for _, _, check in criteria[1:]:
+            if len(rows) == 0: break
+            rows = rows[check(rows)]
+        return np.sort(rows)
@@ -0,0 +1,86 @@
+import numpy as np
+
+CHUNK_ROWS = 2048  # samples traversed together; sized so the per-chunk node arrays stay in cache
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into NumPy arrays, for inference without sklearn:
+        feature, threshold      split of each node; leaves have feature -1
+        left, right             child node ids, global across trees
+        value                   class probabilities per node (float64, rows sum to 1)
+        roots                   node id of each tree's root
+    predict_proba() walks every (sample, tree) pair down together, one vectorised step per level,
+    dropping pairs as they reach a leaf, and averages the leaf distributions like sklearn does.
+    Holds only arrays, so joblib can memory-map a pickled instance (Snapshot.load_model) and worker
+    processes unpickle it without importing sklearn.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, feature_importances):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_importances_ = feature_importances
+        self.n_features_in_ = len(feature_importances)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        trees = [est.tree_ for est in model.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+        is_leaf = np.concatenate([t.children_left < 0 for t in trees])
+        left = np.concatenate([t.children_left + o for t, o in zip(trees, offsets)])
+        right = np.concatenate([t.children_right + o for t, o in zip(trees, offsets)])
+        # Point leaves at themselves so a finished pair can take one more step harmlessly
+        own = np.arange(offsets[-1])
+        left[is_leaf], right[is_leaf] = own[is_leaf], own[is_leaf]
+        value = np.concatenate([t.value[:, 0, :] for t in trees]).astype(np.float64)
+        # sklearn >= 1.4 stores fractions, older versions class counts; normalising handles both
+        value /= np.maximum(value.sum(axis=1, keepdims=True), np.finfo(np.float64).tiny)
+        return cls(
+            feature=np.where(is_leaf, -1, np.concatenate([t.feature for t in trees])).astype(np.int32),
+            threshold=np.concatenate([t.threshold for t in trees]).astype(np.float64),
+            left=left.astype(np.int32),
+            right=right.astype(np.int32),
+            value=value,
+            roots=offsets[:-1].astype(np.int32),
+            classes=np.asarray(model.classes_),
+            feature_importances=np.asarray(model.feature_importances_, dtype=np.float64),
+        )
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+    def predict_proba(self, X):
+        # sklearn's trees compare float32 features against float64 thresholds; do the same for identical splits
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty((len(X), self.value.shape[1]), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            out[start:start + CHUNK_ROWS] = self._chunk_proba(X[start:start + CHUNK_ROWS])
+        return out
+
+    def _chunk_proba(self, X):
+        n, n_trees, n_features = len(X), len(self.roots), X.shape[1]
+        flat = X.ravel()
+        node = np.tile(self.roots, n)
+        base = np.repeat(np.arange(n, dtype=np.int64) * n_features, n_trees)  # start of each pair's sample row
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while len(active):
+            nd = node[active]
+            f = self.feature[nd]
+            nd = np.where(flat[base[active] + f] <= self.threshold[nd], self.left[nd], self.right[nd])
+            node[active] = nd
+            active = active[self.feature[nd] >= 0]
+        # Mean of the per-tree distributions, accumulated tree by tree in sklearn's order
+        leaves = self.value[node].reshape(n, n_trees, -1)
+        proba = leaves[:, 0].copy()
+        for t in range(1, n_trees):
+            proba += leaves[:, t]
+        return proba / n_trees
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,202 @@
+import functools
+import gzip
+import importlib
+import importlib.util
+import io
+import zlib
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+from cache import encode_json
+
+FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.pchas.columnar+json",
+    "msgpack": "application/x-msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "ndjson": "application/x-ndjson",
+}
+MEDIA_TYPES = {media: name for name, media in FORMATS.items()}
+STREAM_FORMATS = ["ndjson", "msgpack", "arrow"]
+VARY = "Accept, Accept-Encoding"
+
+
+# Codec modules behind formats and content encodings. They are imported on first use, so none of them
+# is on the boot path; what is not installed is simply not offered
+CODECS = {"msgpack": "msgpack", "arrow": "pyarrow", "br": "brotli"}
+_codecs = {}
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def _codec(module):
+    """The imported codec module; UnsupportedFormat (a 406) when it can't be imported."""
+    if module not in _codecs:
+        try: _codecs[module] = importlib.import_module(module)
+        except ImportError: _codecs[module] = None
+    if _codecs[module] is None: raise UnsupportedFormat(f"{module} is not installed")
+    return _codecs[module]
+
+
+def available_formats():
+    return [name for name in FORMATS if name not in CODECS or _installed(CODECS[name])]
+
+
+def _parse_header(header):
+    """[(token, q)] from an Accept / Accept-Encoding header, in header order."""
+    items = []
+    for part in (header or "").split(","):
+        token, *options = [p.strip() for p in part.split(";")]
+        if not token: continue
+        q = 1.0
+        for opt in options:
+            if opt.startswith("q="):
+                try: q = float(opt[2:])
+                except ValueError: q = 0.0
+        items.append((token.lower(), q))
+    return items
+
+
+def negotiate(accept, fmt=None, default="json", allowed=None):
+    """
+    Response format name: an explicit ?format= wins, otherwise the highest-q supported media type
+    in Accept (wildcards mean `default`). None when nothing acceptable can be produced.
+    """
+    offered = [name for name in available_formats() if allowed is None or name in allowed]
+    if fmt: return fmt if fmt in offered else None
+    if not accept: return default
+    best, best_q = None, 0.0
+    for media, q in _parse_header(accept):
+        name = default if media in ("*/*", "application/*") else MEDIA_TYPES.get(media)
+        if name in offered and q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def negotiate_encoding(accept_encoding):
+    """'br' or 'gzip' when the client accepts it (brotli only if installed), else None for identity."""
+    accepted = {token: q for token, q in _parse_header(accept_encoding)}
+    if accepted.get("br", 0) > 0 and _installed(CODECS["br"]): return "br"
+    if accepted.get("gzip", 0) > 0: return "gzip"
+    return None
+
+
+def response_headers(encoding):
+    headers = {"Vary": VARY}
+    if encoding: headers["Content-Encoding"] = encoding
+    return headers
+
+
+def columnar(value):
+    """Lists of records become {field: [values]}; dicts are converted value by value; anything else is unchanged."""
+    if isinstance(value, list) and value and all(isinstance(r, dict) for r in value):
+        fields = list(dict.fromkeys(k for r in value for k in r))
+        return {k: [r.get(k) for r in value] for k in fields}
+    if isinstance(value, dict):
+        return {k: columnar(v) for k, v in value.items()}
+    return value
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, np.generic): return obj.item()
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    if isinstance(obj, (date, datetime)): return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not MessagePack serializable")
+
+
+def encode(value, name):
+    """Serialize a JSON-able response value in the named format. msgpack is always columnar."""
+    if name == "json":
+        return encode_json(value)
+    if name == "columnar":
+        return encode_json(columnar(value))
+    if name == "msgpack":
+        return _codec("msgpack").packb(columnar(value), default=_msgpack_default, use_bin_type=True)
+    if name == "ndjson":
+        if isinstance(value, list): return b"".join(encode_json(r) + b"\n" for r in value)
+        return encode_json(value) + b"\n"
+    if name == "arrow":
+        if not isinstance(value, list) or not all(isinstance(r, dict) for r in value):
+            raise UnsupportedFormat("Arrow output is only available for tabular responses")
+        pa = _codec("pyarrow")
+        table = pa.Table.from_pylist(value)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise UnsupportedFormat(f"Unknown format {name!r}")
+
+
+def compress(body, encoding):
+    if encoding == "gzip": return gzip.compress(body, compresslevel=6, mtime=0)
+    if encoding == "br": return _codec("brotli").compress(body, quality=5)
+    return body
+
+
+# --- Streaming --------------------------------------------------------------------------------
+
+def _compressor(encoding):
+    if encoding == "gzip":
+        c = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return c.compress, c.flush
+    if encoding == "br":
+        c = _codec("brotli").Compressor(quality=5)
+        return c.process, c.finish
+    return (lambda chunk: chunk), (lambda: b"")
+
+
+def _drain(buf):
+    data = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return data
+
+
+def _encode_batches(batches, name):
+    if name == "ndjson":
+        for batch in batches:
+            yield pd.DataFrame(batch, copy=False).to_json(orient="records", lines=True).rstrip("\n").encode("utf-8") + b"\n"
+    elif name == "msgpack":
+        # A concatenation of msgpack maps, one {field: [values]} per batch; read it with msgpack.Unpacker
+        msgpack = _codec("msgpack")
+        for batch in batches:
+            yield msgpack.packb({k: v.tolist() for k, v in batch.items()}, use_bin_type=True)
+    elif name == "arrow":
+        pa, buf, writer = _codec("pyarrow"), io.BytesIO(), None
+        for batch in batches:
+            record_batch = pa.RecordBatch.from_pydict(batch)
+            if writer is None: writer = pa.ipc.new_stream(pa.PythonFile(buf, mode="w"), record_batch.schema)
+            writer.write_batch(record_batch)
+            yield _drain(buf)
+        if writer is not None:
+            writer.close()
+            yield _drain(buf)
+    else:
+        raise UnsupportedFormat(f"{name} cannot be streamed; use ndjson, msgpack or arrow")
+
+
+def stream_batches(batches, name, encoding=None):
+    """
+    Encode an iterable of {column: array} batches chunk by chunk, compressing on the fly. Codecs are
+    imported here, before the first chunk, so a missing one raises UnsupportedFormat while a 406 can still be sent.
+    """
+    if name not in STREAM_FORMATS: raise UnsupportedFormat(f"{name} cannot be streamed; use ndjson, msgpack or arrow")
+    if name in CODECS: _codec(CODECS[name])
+    push, finish = _compressor(encoding)
+    return _stream(_encode_batches(batches, name), push, finish)
+
+
+def _stream(chunks, push, finish):
+    for chunk in chunks:
+        out = push(chunk)
+        if out: yield out
+    tail = finish()
+    if tail: yield tail
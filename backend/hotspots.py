@@ -0,0 +1,159 @@
+"""
+Density-based hotspots: DBSCAN over great-circle distance, as an alternative to KMeans centroids
+(MLEngine.hotspot_summary). Only incidents in dense areas form hotspots; isolated ones are noise, and
+the number of hotspots follows the data instead of being chosen up front.
+
+To stay fast at millions of incidents and across many time windows, incidents are binned into
+micro-cells a third of the radius wide, and DBSCAN runs over the occupied cells with their incident
+counts as sample weights. A cell sits at the mean position of all its incidents in the dataset
+version, so the cells, the haversine BallTree over them and every cell's radius neighbourhood are
+fixed per version (NeighbourIndex). Filters and time windows only change the weights, so they
+reuse the index instead of querying it again.
+"""
+import numpy as np
+
+from routing_engine import EARTH_RADIUS_KM
+from spatial_index import GridIndex
+
+# Defaults sized so the 1000 seeded incidents (around six area centres) form a handful of hotspots;
+# a city's full history is denser, so larger deployments raise MIN_INCIDENTS (HOTSPOT_MIN_INCIDENTS)
+RADIUS_M = 400        # DBSCAN eps: incidents closer than this are neighbours
+MIN_INCIDENTS = 10    # DBSCAN min_samples: incidents within RADIUS_M that make a core point
+CELLS_PER_RADIUS = 3  # micro-cell size = radius / 3; positions move by at most one cell diagonal
+MAX_WINDOWS = 400
+CELL_COLUMNS = ("count", "lat_sum", "lon_sum", "severity")
+KM_PER_DEG = EARTH_RADIUS_KM * np.pi / 180
+
+
+def cell_size(radius_m):
+    """Micro-cell side in degrees (of latitude) for a DBSCAN radius in metres."""
+    return radius_m / CELLS_PER_RADIUS / 1000 / KM_PER_DEG
+
+
+def _dbscan(adjacency, weight, min_incidents):
+    """
+    DBSCAN labels (-1 = noise) over a neighbourhood graph whose rows include the node itself, with
+    per-node sample weights (0 = not a point): core nodes are connected components, border nodes join
+    a core neighbour. Only the rows of weighted nodes are read, so a sparse time window stays cheap.
+    """
+    labels = np.full(len(weight), -1, dtype=np.int64)
+    points = np.flatnonzero(weight)
+    rows = adjacency[points]
+    core = rows @ weight >= min_incidents
+    if not core.any(): return labels
+    from scipy.sparse.csgraph import connected_components
+    core_ids = points[core]
+    _, core_labels = connected_components(rows[core][:, core_ids], directed=False)
+    labels[core_ids] = core_labels
+    reach = rows[~core][:, core_ids]
+    border = np.diff(reach.indptr) > 0
+    labels[points[~core][border]] = core_labels[reach.indices[reach.indptr[:-1][border]]]
+    return labels
+
+
+def _extent(lat, lon):
+    """Convex hull of the points as [[lat, lon], ...] (counter-clockwise) and its area in km^2."""
+    x = lon * np.cos(np.radians(lat.mean())) * KM_PER_DEG
+    y = lat * KM_PER_DEG
+    if len(lat) >= 3:
+        from scipy.spatial import ConvexHull, QhullError
+        try:
+            hull = ConvexHull(np.column_stack([x, y]))
+            return [[float(lat[i]), float(lon[i])] for i in hull.vertices], float(hull.volume)
+        except QhullError:
+            pass
+    # Fewer than three points, or all on a line: the segment between the extremes
+    order = np.lexsort((y, x))
+    ends = order[[0, -1]] if len(order) > 1 else order
+    return [[float(lat[i]), float(lon[i])] for i in ends], 0.0
+
+
+class NeighbourIndex:
+    """
+    The occupied micro-cells of one dataset version and their radius_m neighbourhoods:
+        keys            GridIndex cell keys, sorted; locate() maps binned incidents to positions here
+        lat, lon        mean position of each cell's incidents
+        tree            sklearn BallTree over the cells, haversine metric
+        adjacency       sparse cell x cell matrix, 1 where centres are within radius_m (self included)
+    Built from the unfiltered hotspot_cells() of the version and kept in the model registry.
+    """
+
+    def __init__(self, radius_m, cell, keys, lat, lon):
+        from scipy.sparse import csr_matrix
+        from sklearn.neighbors import BallTree
+        self.radius_m = radius_m
+        self.cell = cell
+        self.keys = keys
+        self.lat = lat
+        self.lon = lon
+        points = np.radians(np.column_stack([lat, lon]))
+        self.tree = BallTree(points, metric="haversine") if len(keys) else None
+        neighbours = self.tree.query_radius(points, r=radius_m / 1000 / EARTH_RADIUS_KM) if len(keys) else []
+        indptr = np.concatenate([[0], np.cumsum([len(n) for n in neighbours])]).astype(np.int32)
+        indices = np.concatenate(neighbours).astype(np.int32) if len(keys) else np.empty(0, dtype=np.int32)
+        self.adjacency = csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(keys), len(keys)))
+
+    @classmethod
+    def build(cls, radius_m, cells):
+        """From hotspot_cells(cell_size(radius_m)) output over every incident of the version."""
+        keys, inverse = np.unique(GridIndex._keys(cells["row"], cells["col"]), return_inverse=True)
+        count = np.bincount(inverse, weights=cells["count"], minlength=len(keys))
+        lat = np.bincount(inverse, weights=cells["lat_sum"], minlength=len(keys)) / count
+        lon = np.bincount(inverse, weights=cells["lon_sum"], minlength=len(keys)) / count
+        return cls(radius_m, cell_size(radius_m), keys, lat, lon)
+
+    def locate(self, cells):
+        """Index position of each binned row; rows in cells the index lacks (newer data) map to -1."""
+        keys = GridIndex._keys(cells["row"], cells["col"])
+        if len(self.keys) == 0: return np.full(len(keys), -1)
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[pos] == keys, pos, -1)
+
+    def hotspots(self, cells, n, min_incidents=MIN_INCIDENTS):
+        """The n hotspots with the highest severity score among the binned incidents."""
+        return self._cluster(self.locate(cells), cells, slice(None), n, min_incidents)
+
+    def windows(self, cells, n, window_days, step_days, min_incidents=MIN_INCIDENTS, first=None, last=None):
+        """
+        Hotspots per sliding window of window_days, starting every step_days from `first` (epoch days;
+        default: the first incident) until a window reaches `last`. Returns [{start, end, hotspots}].
+        """
+        if window_days < 1 or step_days < 1: raise ValueError("window_days and step_days must be positive")
+        if len(cells["day"]) == 0: return []
+        first = int(cells["day"].min()) if first is None else first
+        last = int(cells["day"].max()) if last is None else last
+        starts = np.arange(first, max(last - window_days + 1, first) + 1, step_days)
+        if len(starts) > MAX_WINDOWS: raise ValueError(f"{len(starts)} windows requested; at most {MAX_WINDOWS}")
+        ids = self.locate(cells)
+        order = np.argsort(cells["day"], kind="stable")
+        bounds = np.searchsorted(cells["day"][order], np.column_stack([starts, starts + window_days]))
+        return [
+            {"start": str(np.datetime64(int(s), "D")), "end": str(np.datetime64(int(s) + window_days - 1, "D")),
+             "hotspots": self._cluster(ids, cells, order[a:b], n, min_incidents)}
+            for s, (a, b) in zip(starts, bounds)
+        ]
+
+    def _cluster(self, ids, cells, rows, n, min_incidents):
+        ids = ids[rows]
+        known = ids >= 0
+        sums = {name: np.bincount(ids[known], weights=cells[name][rows][known], minlength=len(self.keys)) for name in CELL_COLUMNS}
+        labels = _dbscan(self.adjacency, sums["count"], min_incidents)
+        active = np.flatnonzero(labels >= 0)
+        if len(active) == 0: return []
+        labels = labels[active]
+        totals = {name: np.bincount(labels, weights=sums[name][active]) for name in CELL_COLUMNS}
+        hotspots = []
+        for rank, c in enumerate(np.argsort(-totals["severity"], kind="stable")[:n]):
+            cells_in = active[labels == c]
+            # The extent is spanned by where each member cell's incidents are in this run
+            extent, area = _extent(sums["lat_sum"][cells_in] / sums["count"][cells_in], sums["lon_sum"][cells_in] / sums["count"][cells_in])
+            hotspots.append({
+                "cluster": rank,
+                "latitude": float(totals["lat_sum"][c] / totals["count"][c]),
+                "longitude": float(totals["lon_sum"][c] / totals["count"][c]),
+                "count": int(totals["count"][c]),
+                "score": float(totals["severity"][c]),
+                "extent": extent,
+                "area_km2": area,
+            })
+        return hotspots
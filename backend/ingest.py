@@ -0,0 +1,148 @@
+import io
+import numpy as np
+import pandas as pd
+from crime_store import CRIME_COLUMNS
+from data_utils import process_csv
+from rollups import ROLLUP_TABLE, upsert_rollup
+from metrics import timed
+
+CHUNK_ROWS = 50_000
+
+
+class IngestStats:
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_accepted = 0
+        self.chunks = 0
+        self.rows_inserted = None  # set by the caller once loaded; fewer than accepted when appending duplicates
+
+    @property
+    def rows_rejected(self):
+        return self.rows_read - self.rows_accepted
+
+    @property
+    def rows_duplicate(self):
+        return 0 if self.rows_inserted is None else self.rows_accepted - self.rows_inserted
+
+    def to_dict(self):
+        inserted = self.rows_accepted if self.rows_inserted is None else self.rows_inserted
+        return {"rows": self.rows_accepted, "rows_accepted": self.rows_accepted, "rows_rejected": self.rows_rejected,
+                "rows_inserted": inserted, "rows_duplicate": self.rows_duplicate, "chunks": self.chunks}
+
+
+def _row_keys(df):
+    """
+    64-bit hash of each row's stored columns. Numbers are compared as floats and everything else as
+    text, so a row hashes the same whichever dtypes read_csv inferred for the chunk it arrived in.
+    """
+    key = df.reindex(columns=CRIME_COLUMNS)
+    for name in key.columns:
+        if name in ("latitude", "longitude", "victim_age"):
+            key[name] = pd.to_numeric(key[name], errors="coerce").astype(np.float64)
+        else:
+            key[name] = key[name].astype(object).where(key[name].notna(), "").astype(str)
+    return pd.util.hash_pandas_object(key, index=False).to_numpy(dtype=np.uint64)
+
+
+def iter_clean_chunks(fileobj, stats, chunksize=CHUNK_ROWS):
+    """
+    Parse a CSV stream chunk by chunk and yield cleaned frames ready for DataStore.
+    Only one raw chunk is held in memory at a time; stats is updated as chunks are consumed.
+    Rows repeating an earlier row of the file are dropped like process_csv drops them within a chunk:
+    the hashes of the rows kept so far (8 bytes each) are carried across chunks.
+    """
+    seen = np.empty(0, dtype=np.uint64)  # sorted
+    for raw in pd.read_csv(fileobj, chunksize=chunksize, encoding="utf-8"):
+        stats.rows_read += len(raw)
+        stats.chunks += 1
+        clean = process_csv(raw)
+        if not clean.empty:
+            keys = _row_keys(clean)
+            pos = np.minimum(np.searchsorted(seen, keys), max(len(seen) - 1, 0))
+            new = seen[pos] != keys if len(seen) else np.ones(len(keys), dtype=bool)
+            new &= ~pd.Series(keys).duplicated().to_numpy()
+            clean, keys = clean[new], keys[new]
+            # Two sorted runs: the stable sort merges them in linear time
+            seen = np.sort(np.concatenate([seen, np.sort(keys)]), kind="stable")
+        stats.rows_accepted += len(clean)
+        if not clean.empty:
+            yield clean[[c for c in clean.columns if c in CRIME_COLUMNS]]
+
+
+def _copy_frame(df, columns):
+    out = df.reindex(columns=columns)
+    if "victim_age" in out:
+        out["victim_age"] = pd.to_numeric(out["victim_age"], errors="coerce").round().astype("Int64")
+    buf = io.StringIO()
+    out.to_csv(buf, index=False, header=False, date_format="%Y-%m-%d")
+    buf.seek(0)
+    return buf
+
+
+def _load_chunk(cur, table, chunk, columns):
+    if hasattr(cur, "copy_expert"):
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", _copy_frame(chunk, columns))
+    else:
+        rows = chunk.reindex(columns=columns)
+        rows = rows.astype(object).where(rows.notna(), None)
+        placeholders = ", ".join(["%s"] * len(columns))
+        cur.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows.itertuples(index=False, name=None))
+
+
+# Same incident = same natural key as crime_store.natural_keys: date, time, type, location to 1e-6 degrees
+_NATURAL_KEY = "crime_date, crime_time, crime_type, ROUND(latitude::numeric, 6), ROUND(longitude::numeric, 6)"
+_SAME_INCIDENT = ("c.crime_date = s.crime_date AND c.crime_time = s.crime_time AND c.crime_type = s.crime_type "
+                  "AND ROUND(c.latitude::numeric, 6) = ROUND(s.latitude::numeric, 6) "
+                  "AND ROUND(c.longitude::numeric, 6) = ROUND(s.longitude::numeric, 6)")
+
+
+def _insert_new(cur, columns):
+    """Move staged rows into crimes, skipping incidents already stored or repeated in the batch."""
+    names = ", ".join(columns)
+    cur.execute(
+        f"INSERT INTO crimes ({names}) SELECT DISTINCT ON ({_NATURAL_KEY}) {names} FROM crime_staging s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM crimes c WHERE {_SAME_INCIDENT}) "
+        f"RETURNING crime_date, crime_type, area_name")
+    inserted = pd.DataFrame(cur.fetchall(), columns=["crime_date", "crime_type", "area_name"])
+    cur.execute("TRUNCATE crime_staging")
+    return inserted
+
+
+@timed("ingest.bulk_load")
+def bulk_load(engine, chunks, clear=True, with_geom=False, dedup=False):
+    """
+    Load cleaned chunks into the crimes table in one transaction; returns the number of rows inserted.
+    Uses COPY FROM STDIN on psycopg2 connections and executemany otherwise; geom is filled
+    server-side with a single UPDATE at the end instead of one WKTElement per row.
+    With dedup, each chunk is staged in a temporary table and only incidents whose natural key is
+    not stored yet are inserted (ix_crimes_natural_key, declared on models.Crime and created by DataStore at
+startup, keeps the lookup an index probe).
+    The daily trend rollup is updated per chunk in the same transaction, from the rows inserted.
+    """
+    columns = list(CRIME_COLUMNS)
+    conn = engine.raw_connection()
+    inserted = 0
+    try:
+        cur = conn.cursor()
+        if clear:
+            cur.execute("DELETE FROM crimes")
+            cur.execute(f"DELETE FROM {ROLLUP_TABLE}")
+        if dedup:
+            cur.execute(f"CREATE TEMP TABLE crime_staging ON COMMIT DROP AS SELECT {', '.join(columns)} FROM crimes WITH NO DATA")
+        for chunk in chunks:
+            if dedup:
+                _load_chunk(cur, "crime_staging", chunk, columns)
+                chunk = _insert_new(cur, columns)
+            else:
+                _load_chunk(cur, "crimes", chunk, columns)
+            upsert_rollup(cur, chunk)
+            inserted += len(chunk)
+        if with_geom:
+            cur.execute("UPDATE crimes SET geom = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326) WHERE geom IS NULL")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return inserted
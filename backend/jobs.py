@@ -0,0 +1,109 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+
+
+class TrainingJob:
+    def __init__(self, reason):
+        self.id = uuid.uuid4().hex
+        self.reason = reason
+        self.status = "queued"
+        self.progress = 0.0
+        self.stage = "queued"
+        self.requests = 1
+        self.dataset_version = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def update(self, progress, stage):
+        self.progress = progress
+        self.stage = stage
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "stage": self.stage,
+            "reason": self.reason,
+            "coalesced_requests": self.requests,
+            "dataset_version": self.dataset_version,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class TrainingQueue:
+    """
+    Single background worker that runs retrain jobs one at a time.
+    At most one job waits behind the running one: further submits are coalesced into it, so a
+    burst of uploads costs one retrain on the latest data. run(job) receives the job to report progress.
+    """
+
+    def __init__(self, run, history=50):
+        self.run = run
+        self.history = history
+        self._jobs = OrderedDict()
+        self._pending = None
+        self._running = None
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def submit(self, reason="manual"):
+        with self._cond:
+            if self._pending is not None:
+                self._pending.requests += 1
+                return self._pending
+            job = TrainingJob(reason)
+            self._pending = job
+            self._remember(job)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._loop, name="training-queue", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+            return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._cond:
+            return list(reversed(self._jobs.values()))
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in ("queued", "running"): break
+            self._jobs.popitem(last=False)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                job, self._pending = self._pending, None
+                self._running = job
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = self.run(job)
+                job.status = "succeeded"
+                job.update(1.0, "done")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                traceback.print_exc()
+            finally:
+                job.finished_at = time.time()
+                with self._cond:
+                    self._running = None
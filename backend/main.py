@@ -1,40 +1,97 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
+import time as time_module
+_BOOT_STARTED = time_module.perf_counter()  # boot phases are exported as pchas_boot_seconds
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
+from sqlalchemy import text, func
 from sqlalchemy.orm import Session
 import pandas as pd
-import io
+import numpy as np
 import json
-import redis
-from datetime import datetime, time, timedelta
-from typing import List, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Union
+from pydantic import BaseModel, ValidationError
 
-from database import engine, Base, get_db, settings
+from database import engine, SessionLocal, Base, get_db, settings
 from models import Crime
 from data_utils import seed_database, process_csv
-from ml_engine import MLEngine
+from ml_engine import MLEngine, cluster_hotspots, grid_axes, grid_cells
+from model_registry import HotspotEntry
 from routing_engine import RoutingEngine
-from fpdf import FPDF
-from fastapi.responses import FileResponse
-import tempfile
+from crime_store import ColumnarCrimeStore, CRIME_COLUMNS
+from filters import CrimeFilter
+from queries import MemoryCrimeQueries, PostgresCrimeQueries
+from ingest import IngestStats, iter_clean_chunks, bulk_load
+from jobs import TrainingQueue
+from executor import TaskExecutor, Overloaded, TaskTimeout
+from tasks import predict_points, warm_up as warm_up_worker
+from shared_state import SharedState
+from snapshot import Snapshot
+from spatial_index import HeatmapIndex, SqlHeatmapIndex
+from rollups import TrendRollup, load_rollup, rebuild_rollup
+from cache import build_cache
+import metrics
+from metrics import Callback, Counter, MetricsMiddleware, timed
+from formats import FORMATS, STREAM_FORMATS, UnsupportedFormat, available_formats, compress, encode, \
+    negotiate, negotiate_encoding, response_headers, stream_batches
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
 
 app = FastAPI(title="Antigravity PCHAS API")
 
 # Redis setup with fallback
-class MemoryCache:
-    def __init__(self): self.data = {}
-    def get(self, key): return self.data.get(key)
-    def setex(self, key, time, value): self.data[key] = value
-    def delete(self, key): self.data.pop(key, None)
-
-try:
-    cache = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True, socket_connect_timeout=1)
-    # Try a simple command to check if redis is truly alive
-    cache.ping()
-    print("Redis connected successfully")
-except Exception:
-    print("Redis unavailable, using In-Memory Cache fallback")
-    cache = MemoryCache()
+cache = build_cache(settings)
+
+# TTLs bound staleness for "now"-relative queries; dataset changes are handled by versioned keys
+HOTSPOT_TTL = 300
+PATROL_TTL = 300
+TRENDS_TTL = 60
+HEATMAP_TTL = 300
+GRID_TTL = 300
+BRIEFING_TTL = 300
+
+# Clustering, routing, batch scoring and PDF rendering run here instead of on request threads
+executor = TaskExecutor(settings.EXECUTOR_PROCESSES, settings.EXECUTOR_MAX_PENDING, settings.EXECUTOR_TIMEOUT)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(TaskTimeout)
+async def task_timeout_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+def negotiated(request, format=None, default="json", allowed=None):
+    """(format name, content encoding) for the request, or 406 when no offered format is acceptable."""
+    name = negotiate(request.headers.get("accept"), format, default, allowed)
+    if name is None:
+        offered = [f for f in available_formats() if allowed is None or f in allowed]
+        raise HTTPException(status_code=406, detail=f"Supported formats: {', '.join(offered)}")
+    return name, negotiate_encoding(request.headers.get("accept-encoding"))
+
+def encoded_response(request, value, format=None):
+    name, encoding = negotiated(request, format)
+    try: body = compress(encode(value, name), encoding)
+    except UnsupportedFormat as e: raise HTTPException(status_code=406, detail=str(e))
+    return Response(content=body, media_type=FORMATS[name], headers=response_headers(encoding))
+
+async def cached_response(request, namespace, version, params, ttl, compute, format=None):
+    """
+    Serve the negotiated representation; each (format, encoding) variant is cached as final bytes.
+    compute is a coroutine function: light work goes through run_in_threadpool, heavy work through
+    the task executor, whose keys coalesce identical computations across variants.
+    """
+    name, encoding = negotiated(request, format)
+    try:
+        body = await cache.aget_or_compute(namespace, version, params, ttl, compute,
+                                           encode=lambda value: compress(encode(value, name), encoding),
+                                           variant=f"{name}.{encoding or 'identity'}")
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    return Response(content=body, media_type=FORMATS[name], headers=response_headers(encoding))
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,36 +99,80 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-ml_engine = MLEngine()
+# Outermost, so latency and sizes cover the whole stack (CORS included)
+app.add_middleware(MetricsMiddleware, routes=app.router.routes, allow_profiling=settings.ALLOW_PROFILING)
+
+# Multi-worker mode: one trainer publishes data and models to SHARED_DIR, every worker maps them
+shared = None
+if settings.SHARED_DIR:
+    try:
+        shared = SharedState(settings.SHARED_DIR)
+    except OSError as e:
+        print(f"Shared worker mode unavailable ({e}); running standalone")
+# Standalone workers persist the same way to SNAPSHOT_DIR, so restarts skip seeding and retraining
+snapshot = shared or (Snapshot(settings.SNAPSHOT_DIR) if settings.SNAPSHOT_DIR else None)
+
+if shared: ml_engine = MLEngine(shared.registry_path, settings.COMPILED_INFERENCE_MAX_ROWS)
+else: ml_engine = MLEngine(compiled_max_rows=settings.COMPILED_INFERENCE_MAX_ROWS)
 
 class DataStore:
-    def __init__(self):
-        self.memory_data = []
+    def __init__(self, snapshot=None, shared=False):
+        self.memory = ColumnarCrimeStore()
+        self.rollup = TrendRollup()
+        self._db_version = "empty"
+        self._db_max_id = 0
+        self._appends = []  # (base_version, version, first crime_id) per append since the data was last replaced
+        self.snapshot = snapshot
+        self.shared = shared
+        self._published = None  # dataset version last published to, or mapped from, the snapshot
+        self._sync_lock = threading.Lock()
         self.use_db = (engine is not None and SessionLocal is not None)
         if self.use_db:
             try:
                 Base.metadata.create_all(bind=engine)
+                # create_all skips existing tables; add indexes introduced since they were created
+                for index in Crime.__table__.indexes: index.create(bind=engine, checkfirst=True)
                 db = SessionLocal()
                 db.execute(text("SELECT 1"))
                 db.close()
+                self._refresh_db_version()
                 print("DataStore: Connected to PostgreSQL")
             except Exception as e:
                 print(f"DataStore: DB check failed ({e}). Switching to In-Memory Mode.")
                 self.use_db = False
         else:
             print("DataStore: Running in In-Memory Mode (no DB configured)")
+        # Same query API on both paths; the Postgres one pushes work into SQL
+        if self.use_db:
+            from data_utils import _GEOM_AVAILABLE
+            self.queries = PostgresCrimeQueries(engine, _GEOM_AVAILABLE)
+        else:
+            self.queries = MemoryCrimeQueries(lambda: self.memory)
+
+    @property
+    def version(self):
+        """Fingerprint of the current dataset; changes whenever crimes are added or replaced."""
+        return self._db_version if self.use_db else self.memory.version
 
+    def _refresh_db_version(self):
+        db = SessionLocal()
+        try:
+            n, max_id = db.query(func.count(Crime.crime_id), func.max(Crime.crime_id)).one()
+        finally: db.close()
+        self._db_version = hashlib.blake2b(f"{n}:{max_id}".encode(), digest_size=8).hexdigest()
+        self._db_max_id = max_id or 0
+
+    def count(self):
+        return self.queries.count()
+
+    @timed("store.get_crimes")
     def get_crimes(self):
-        if self.use_db and SessionLocal:
-            db = SessionLocal()
-            try:
-                crimes = db.query(Crime).all()
-                return [self._to_dict(c) for c in crimes]
-            finally: db.close()
-        return self.memory_data
+        return self.queries.records()
 
-    def _to_dict(self, obj):
-        return {c.name: getattr(obj, c.name) for c in obj.__table__.columns if c.name != 'geom'}
+    @timed("store.get_frame")
+    def get_frame(self, filters=None):
+        """Crimes (those matching filters, if given) as a DataFrame with a datetime64 `crime_ts` column in place of crime_date/crime_time."""
+        return self.queries.frame(filters)
 
     def seed(self):
         if self.use_db and SessionLocal:
@@ -81,183 +182,726 @@ class DataStore:
                     seed_database(db, n=1000)
             finally:
                 db.close()
+            conn = engine.raw_connection()
+            try:
+                rebuild_rollup(conn.cursor())
+                conn.commit()
+            finally: conn.close()
+            self._refresh_db_version()
         else:
-            if not self.memory_data:
-                from data_utils import generate_mock_data
-                raw_data = generate_mock_data(1000)
-                self.memory_data = [{**d, "crime_id": i} for i, d in enumerate(raw_data)]
+            if not len(self.memory):
+                from data_utils import generate_mock_frame
+                mock = generate_mock_frame(1000)
+                self.memory.append(mock)
+                self.rollup.add_frame(mock)
 
+    @timed("store.add_crimes")
     def add_crimes(self, df, clear=True):
-        valid_cols = ["area_name", "place_type", "latitude", "longitude", "crime_type", "crime_date", "crime_time", "victim_age", "victim_gender", "risk_zone"]
-        df_filtered = df[[c for c in df.columns if c in valid_cols]]
+        return self.ingest([df[[c for c in df.columns if c in CRIME_COLUMNS]]], clear=clear)
+
+    @timed("store.ingest")
+    def ingest(self, chunks, clear=True):
+        """
+        Load an iterable of cleaned DataFrame chunks, replacing existing data when clear is set; otherwise
+        append them, skipping incidents already stored (same location, date, time and type).
+        Returns the number of rows inserted.
+        """
+        if self.snapshot is None: return self._ingest(chunks, clear)
+        if not self.shared:
+            # The snapshot only speeds up restarts: publish() writes it from the training job the upload
+            # triggers (and at shutdown), so a burst of uploads is written once, off the request
+            with self._sync_lock: return self._ingest(chunks, clear)
+        with self.snapshot.publish_lock(), self._sync_lock:
+            # Start from the latest published data so appends made by other workers are kept
+            self._apply_snapshot(self.snapshot.read_manifest().get("data"))
+            inserted = self._ingest(chunks, clear)
+            # Publishing is how the other workers see new data; nothing inserted, nothing to publish
+            if self.version != self._published: self._publish()
+        return inserted
+
+    def _ingest(self, chunks, clear):
+        base = self.version
+        if self.use_db and SessionLocal:
+            from data_utils import _GEOM_AVAILABLE
+            self._refresh_db_version()
+            first_id = self._db_max_id + 1
+            inserted = bulk_load(engine, chunks, clear=clear, with_geom=_GEOM_AVAILABLE, dedup=not clear)
+            self._refresh_db_version()
+        elif clear:
+            # Build the replacement off to the side so readers keep the old data until the swap
+            staging, rollup = ColumnarCrimeStore(), TrendRollup()
+            for chunk in chunks:
+                staging.append(chunk)
+                rollup.add_frame(chunk)
+            self.memory, self.rollup = staging, rollup
+            inserted = len(staging)
+        else:
+            # Clean every chunk before touching the store, so a bad one leaves it as it was; then add them in one append
+            chunks = list(chunks)
+            first_id, inserted = len(self.memory), 0
+            if chunks:
+                added = self.memory.append(pd.concat(chunks, ignore_index=True), dedup=True)
+                self.rollup.add_frame(added)
+                inserted = len(added)
+        if clear: self._appends = []
+        elif inserted: self._record_append(base, self.version, first_id)
+        return inserted
+
+    def _record_append(self, base, version, first_id):
+        if self._appends and self._appends[-1][1] == version: return
+        self._appends = self._appends[-31:] + [(base, version, first_id)]
+
+    def rows_added_since(self, version):
+        """
+        First crime_id of the rows appended since dataset `version` (rows from there on are new), or None
+        when the data was replaced since, or its history is unknown. Lets training update models incrementally.
+        """
+        start = None
+        for base, new, first_id in self._appends:
+            if base != version: continue
+            if start is None: start = first_id
+            version = new
+        return start if version == self.version else None
 
+    # --- Snapshots / shared worker mode ---------------------------------------------------
+
+    def _publish(self):
+        # The append entry spans every append since the last publish, which may be several
+        first_id = self.rows_added_since(self._published) if self._published is not None else None
+        appended = (self._published, self.version, first_id) if first_id is not None else None
+        if self.use_db: self.snapshot.publish_data(self.version, appended=appended)
+        else: self.snapshot.publish_data(self.version, self.memory, self.rollup, appended)
+        self._published = self.version
+
+    def publish(self):
+        """Write the current dataset to the snapshot, unless that version is already there."""
+        with self.snapshot.publish_lock(), self._sync_lock:
+            if self.version != self._published: self._publish()
+
+    def _apply_snapshot(self, entry):
+        if entry is None: return
+        self._published = entry["version"]
+        if entry["version"] == self.version: return
+        if self.use_db:
+            self._db_version = entry["version"]
+        else:
+            self.memory, self.rollup = self.snapshot.load_data(entry)
+        # Keep the append history so the trainer can still update models from just the new rows
+        if entry.get("appended"): self._record_append(*entry["appended"])
+        else: self._appends = []
+        print(f"DataStore: mapped snapshot dataset {entry['version']}")
+
+    def sync_snapshot(self):
+        """Map the most recently published dataset if it differs from ours."""
+        with self._sync_lock:
+            self._apply_snapshot(self.snapshot.read_manifest().get("data"))
+
+    @timed("store.trend_summary")
+    def trend_summary(self, first_day=None, last_day=None, granularity="month", filters=None):
+        """
+        Answer trend queries from the day x type x area rollup instead of scanning incidents. Filters on
+        type, area or severity select rollup columns; place_type and shift need the matching incidents,
+        which are aggregated into a one-off rollup instead.
+        """
+        if filters and not filters.by_rollup:
+            return self.queries.trend_rollup(filters).summary(first_day, last_day, granularity)
         if self.use_db and SessionLocal:
-            from data_utils import _GEOM_AVAILABLE, WKTElement
             db = SessionLocal()
-            try:
-                if clear: db.query(Crime).delete()
-                for _, row in df_filtered.iterrows():
-                    crime = Crime(**row.to_dict())
-                    if _GEOM_AVAILABLE and WKTElement:
-                        crime.geom = WKTElement(f'POINT({row["longitude"]} {row["latitude"]})', srid=4326)
-                    db.add(crime)
-                db.commit()
+            try: rollup = load_rollup(db, first_day, last_day)
             finally: db.close()
         else:
-            if clear: self.memory_data = []
-            new_data = df_filtered.to_dict(orient='records')
-            for i, d in enumerate(new_data):
-                d['crime_id'] = len(self.memory_data) + i
-                self.memory_data.append(d)
+            rollup = self.rollup
+        combos = rollup.combo_ids(filters.values.get("crime_type"), filters.values.get("area_name")) if filters else None
+        return rollup.summary(first_day, last_day, granularity, combos)
+
+store = DataStore(snapshot, shared=shared is not None)
+_model_lock = threading.Lock()
+
+@timed("train.models")
+def train_models(job=None):
+    """
+    Retrain hotspot and risk models on the current data; new models are swapped in only once fitted.
+    When the data only grew by appends since the last run, and not by much, the current models are
+    updated from the new rows instead (update_models).
+    """
+    report = job.update if job else (lambda progress, stage: None)
+    report(0.05, "loading data")
+    # Uploads leave writing the data snapshot to this job; a no-op when it is current (e.g. shared mode)
+    if snapshot: store.publish()
+    version = store.version
+    if job: job.dataset_version = version
+    df = store.get_frame()
+    if df.empty: return {"rows": 0}
+    since = store.rows_added_since(last_training.get("version"))
+    if since is not None and ml_engine.risk_version is not None:
+        added = df["crime_id"].to_numpy() >= since
+        appended = last_training.get("incremental_rows", 0) + int(added.sum())
+        if appended <= settings.INCREMENTAL_REFIT_FRACTION * last_training.get("full_rows", 0):
+            return update_models(version, df, added, appended, report)
+    report(0.2, "hotspots")
+    ml_engine.hotspot_summary(version, 10, lambda: df)
+    report(0.4, "density raster")
+    density = ml_engine.density_raster(version, lambda: df)
+    report(0.5, "risk model")
+    model, accuracy = ml_engine.fit_risk_model(df, density)
+    report(0.95, "publishing")
+    with _model_lock:
+        ml_engine.swap_risk_model(model, density)
+        if snapshot: snapshot.publish_model(model, density, ml_engine.risk_version, version, ml_engine.risk_forest)
+    last_training.update(version=version, mode="full", rows=len(df), full_rows=len(df), incremental_rows=0,
+                         f1_score=float(accuracy), finished_at=datetime.now().timestamp())
+    return {"rows": len(df), "mode": "full", "f1_score": float(accuracy)}
+
+def update_models(version, df, added, appended, report):
+    """
+    Incremental path of train_models: hotspot centroids absorb the new rows (update_hotspots) and the
+    risk model is re-published with a density raster rebuilt on all rows, keeping its trees. The forest
+    is refit once appended rows pass INCREMENTAL_REFIT_FRACTION of the rows it was trained on.
+    """
+    report(0.2, "hotspots (incremental)")
+    new = df[added]
+    ml_engine.update_hotspot_summary(last_training["version"], version, 10, new["latitude"].to_numpy(np.float64),
+                                     new["longitude"].to_numpy(np.float64), lambda: df)
+    report(0.4, "density raster")
+    density = ml_engine.density_raster(version, lambda: df)
+    report(0.9, "publishing")
+    with _model_lock:
+        model = ml_engine._load_risk_model()
+        ml_engine.swap_risk_model(model, density)
+        if snapshot: snapshot.publish_model(model, density, ml_engine.risk_version, version, ml_engine.risk_forest)
+    last_training.update(version=version, mode="incremental", rows=len(df), incremental_rows=appended,
+                         finished_at=datetime.now().timestamp())
+    return {"rows": len(df), "mode": "incremental", "rows_added": len(new), "f1_score": last_training.get("f1_score")}
+
+training_queue = TrainingQueue(train_models)
+
+# --- Metrics ------------------------------------------------------------------------------
+last_training = {}
+# Seconds spent per boot phase; "imports" runs from the top of this module to the startup event
+boot = {"restored": 0}
+INGEST_ROWS = Counter("pchas_ingest_rows_total", "Uploaded CSV rows by outcome", ["result"])
+
+def _job_counts():
+    counts = {}
+    for job in training_queue.list():
+        counts[(job.status,)] = counts.get((job.status,), 0) + 1
+    return counts
 
-store = DataStore()
+def _cache_stat(name):
+    return lambda: cache.stats.to_dict()[name]
+
+Callback("pchas_crimes_rows", "Incidents currently loaded", lambda: store.count())
+Callback("pchas_training_rows", "Rows used by the last completed training run", lambda: last_training.get("rows"))
+Callback("pchas_training_incremental_rows", "Rows appended and folded in incrementally since the last full refit", lambda: last_training.get("incremental_rows"))
+Callback("pchas_training_f1_score", "Weighted F1 of the current risk model on its hold-out split", lambda: last_training.get("f1_score"))
+Callback("pchas_training_last_success_timestamp", "Unix time the last training run finished", lambda: last_training.get("finished_at"))
+Callback("pchas_training_jobs", "Recent training jobs by status", _job_counts, labelnames=["status"])
+Callback("pchas_executor_pending_tasks", "CPU-bound tasks queued or running", lambda: executor.pending)
+Callback("pchas_executor_processes", "Worker processes in the task pool (0 = thread mode)", lambda: executor.processes)
+Callback("pchas_boot_seconds", "Seconds spent per boot phase", lambda: {(k,): v for k, v in boot.items() if k != "restored"}, labelnames=["phase"])
+Callback("pchas_boot_restored", "1 when the risk model was restored from a snapshot instead of trained at boot", lambda: boot["restored"])
+for _name in ("hits", "misses", "sets", "skipped", "evictions", "expirations", "coalesced"):
+    Callback(f"pchas_cache_{_name}_total", f"Response cache {_name}", _cache_stat(_name), type="counter")
+Callback("pchas_cache_hit_ratio", "Response cache hits / lookups since start", _cache_stat("hit_ratio"))
+Callback("pchas_cache_entries", "Entries in the response cache", lambda: cache.backend.info().get("entries"))
+Callback("pchas_cache_bytes", "Bytes held by the in-process response cache", lambda: cache.backend.info().get("bytes"))
+
+def sync_shared_model():
+    with _model_lock:
+        entry = shared.read_manifest().get("model")
+        if entry is None or entry["risk_version"] == ml_engine.risk_version: return
+        ml_engine.restore_risk_model(lambda: shared.load_model(entry), entry["risk_version"], shared.forest_loader(entry))
+        # The compiled forest is small and memory-mapped; the sklearn model is unpickled on the first large batch
+        if ml_engine._load_risk_forest() is None: ml_engine._load_risk_model()
+        print(f"MLEngine: loaded shared risk model {entry['risk_version']}")
+
+def restore_or_train():
+    """Reuse the snapshot's risk model when it was trained on the data being served, else train now."""
+    entry = snapshot.model_entry(store.version) if snapshot else None
+    if entry is None:
+        train_models()
+        return False
+    ml_engine.restore_risk_model(lambda: snapshot.load_model(entry), entry["risk_version"], snapshot.forest_loader(entry))
+    # Treat the restored model as freshly fitted, so appends after a restart can still update it incrementally
+    last_training.update(version=store.version, mode="restored", full_rows=store.count(), incremental_rows=0)
+    print(f"MLEngine: restored risk model {entry['risk_version']} from snapshot")
+    # Load it (and the hotspot clusters, which the registry persisted) off the request path
+    threading.Thread(target=warm_up, daemon=True, name="warm-up").start()
+    return True
+
+def warm_up():
+    try:
+        with metrics.stage("boot.warm_up"):
+            ml_engine._load_risk_forest()
+            ml_engine._load_risk_model()
+            hotspot_summary(10)
+    except Exception as e:
+        print(f"Warm-up failed ({e})")
+
+def start_executor():
+    try:
+        with metrics.stage("boot.executor"):
+            executor.warm_up(warm_up_worker)
+    except Exception as e:
+        print(f"Task executor warm-up failed ({e})")
+
+# Trainer-side bookkeeping: data version / training request already scheduled
+_shared_training = {"version": None, "request_at": time_module.time()}
+
+def on_shared_change(manifest):
+    """Watcher callback: map new data/models; the trainer also retrains when the data moved past the model."""
+    store.sync_snapshot()
+    sync_shared_model()
+    if not shared.is_trainer: return
+    data, model, request = manifest.get("data"), manifest.get("model") or {}, manifest.get("train_request")
+    if data and model.get("data_version") != data["version"] and _shared_training["version"] != data["version"]:
+        _shared_training["version"] = data["version"]
+        training_queue.submit("shared data update")
+    if request and request["at"] > _shared_training["request_at"]:
+        _shared_training["request_at"] = request["at"]
+        training_queue.submit(request["reason"])
+
+def submit_training(reason):
+    """Queue retraining here, or leave it to the trainer worker in shared mode. Returns the job, or None."""
+    if shared is None: return training_queue.submit(reason)
+    if not shared.is_trainer:
+        # The trainer notices a new data version by itself; explicit requests go through the manifest
+        if reason not in ("upload", "append"): shared.request_training(reason)
+        return None
+    _shared_training["version"] = store.version
+    return training_queue.submit(reason)
 
 @app.on_event("startup")
 def startup_event():
-    store.seed()
-    data = store.get_crimes()
-    if data:
-        df = pd.DataFrame(data)
-        ml_engine.train_hotspots(df)
-        ml_engine.train_risk_model(df)
+    started = time_module.perf_counter()
+    boot["imports"] = started - _BOOT_STARTED
+    if shared and not shared.acquire_trainer():
+        print("Shared mode: waiting for the trainer's data and models")
+        shared.wait_for(["data", "model"])
+        store.sync_snapshot()
+        sync_shared_model()
+        how = "mapped from the trainer"
+    else:
+        if shared: print("Shared mode: this worker is the trainer")
+        # Postgres is the source of truth for standalone workers; its snapshot only records the version
+        if snapshot and "data" in snapshot.read_manifest() and (shared or not store.use_db):
+            store.sync_snapshot()
+        else:
+            store.seed()
+            if snapshot: store.publish()
+        boot["data"] = time_module.perf_counter() - started
+        boot["restored"] = int(restore_or_train())
+        how = "restored from snapshot" if boot["restored"] else "trained"
+    if shared: shared.watch(on_shared_change)
+    threading.Thread(target=start_executor, daemon=True, name="executor-warm-up").start()
+    boot["startup"] = time_module.perf_counter() - started
+    print(f"Startup finished in {boot['startup']:.2f}s ({how})")
+
+_heatmap_index = None
+_heatmap_lock = threading.Lock()
+_filtered_heatmaps = OrderedDict()  # (version, filter key) -> index over the matching incidents
+MAX_FILTERED_HEATMAPS = 8
+
+def get_heatmap_index(filters=None):
+    """
+    Spatial index + tile cache for the current dataset version, rebuilt when the data changes.
+    Filtered views get their own, smaller index over just the matching incidents (a few are kept).
+    """
+    global _heatmap_index
+    version = store.version
+    if filters: return get_filtered_heatmap_index(version, filters)
+    index = _heatmap_index
+    if index is not None and index.version == version: return index
+    with _heatmap_lock:
+        if _heatmap_index is None or _heatmap_index.version != version:
+            if store.use_db:
+                _heatmap_index = SqlHeatmapIndex(version, store.queries)
+            else:
+                _heatmap_index = HeatmapIndex(version, store.get_frame())
+        return _heatmap_index
+
+def get_filtered_heatmap_index(version, filters):
+    key = (version, json.dumps(filters.key(), sort_keys=True))
+    with _heatmap_lock:
+        index = _filtered_heatmaps.get(key)
+        if index is not None:
+            _filtered_heatmaps.move_to_end(key)
+            return index
+    if store.use_db:
+        index = SqlHeatmapIndex(version, store.queries, filters=filters)
+    else:
+        index = HeatmapIndex(version, store.get_frame(filters))
+    with _heatmap_lock:
+        _filtered_heatmaps[key] = index
+        while len(_filtered_heatmaps) > MAX_FILTERED_HEATMAPS: _filtered_heatmaps.popitem(last=False)
+    return index
+
+def crime_filter(start: Optional[date] = None, end: Optional[date] = None, crime_type: Optional[str] = None,
+                 area_name: Optional[str] = None, place_type: Optional[str] = None, shift: Optional[str] = None,
+                 min_severity: Optional[int] = None):
+    """
+    Query parameters shared by the analytic endpoints (see filters.CrimeFilter): an inclusive date range,
+    comma-separated crime_type / area_name / place_type values, a shift (night, evening, morning) and a
+    minimum severity (1-10).
+    """
+    try:
+        return CrimeFilter.parse(start, end, crime_type, area_name, place_type, shift, min_severity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.on_event("shutdown")
+def shutdown_event():
+    executor.shutdown()
+    # Data uploaded since the last training run is not in the snapshot yet
+    if snapshot: store.publish()
 
 @app.get("/api/heatmap")
-def get_heatmap():
-    cached = cache.get("heatmap_data")
-    if cached: return json.loads(cached)
-    
-    crimes = store.get_crimes()
-    data = [{"lat": c["latitude"], "lon": c["longitude"], "intensity": 0.8, "type": c["crime_type"]} for c in crimes]
-    
-    cache.setex("heatmap_data", 300, json.dumps(data))
-    return data
+async def get_heatmap(request: Request, min_lat: Optional[float] = None, min_lon: Optional[float] = None,
+                max_lat: Optional[float] = None, max_lon: Optional[float] = None,
+                zoom: Optional[int] = None, format: Optional[str] = None, filters: CrimeFilter = Depends(crime_filter)):
+    """
+    Severity-weighted heatmap bins for the viewport. Without a bbox the extent of the (filtered) data is
+    used; without a zoom the finest level that fits the viewport in a bounded number of tiles is chosen.
+    """
+    def compute():
+        index = get_heatmap_index(filters)
+        if index.bounds is None: return []
+        bbox = [min_lat, min_lon, max_lat, max_lon]
+        bbox = [b if v is None else v for v, b in zip(bbox, index.bounds)]
+        _, bins = index.bins(*bbox, zoom=zoom)
+        return bins
+
+    params = {"bbox": [min_lat, min_lon, max_lat, max_lon], "zoom": zoom, **filters.key()}
+    return await cached_response(request, "heatmap", store.version, params, HEATMAP_TTL,
+                                 lambda: run_in_threadpool(compute), format)
+
+def check_point_inputs(lat, lon, hour, weekday):
+    """400 unless coordinates are finite, hours are 0-23 and weekdays 0-6; scalars or arrays."""
+    lat, lon, hour, weekday = (np.asarray(v, dtype=np.float64) for v in (lat, lon, hour, weekday))
+    if not (np.isfinite(lat).all() and np.isfinite(lon).all()):
+        raise HTTPException(status_code=400, detail="lat and lon must be finite")
+    if not (((hour >= 0) & (hour <= 23)).all() and ((weekday >= 0) & (weekday <= 6)).all()):
+        raise HTTPException(status_code=400, detail="hour must be 0-23 and weekday 0-6")
 
 @app.get("/api/predict")
 def predict_crime(lat: float, lon: float, hour: int, weekday: int):
+    check_point_inputs(lat, lon, hour, weekday)
     return ml_engine.predict_risk(lat, lon, hour, weekday)
 
+MAX_BATCH_POINTS = 200_000
+MAX_GRID_CELLS = 250_000
+
+async def score_points(lat, lon, hour, weekday, key=None):
+    """
+    (classes, labels, confidence) from the current risk model, or None when there is none. With worker
+    processes the points are scored in one that loads the model from its snapshot file (cached there
+    per version); otherwise, or when the model was never persisted, on the executor's threads. Batches
+    small enough for the compiled forest are scored locally: that is quicker than a round trip to a worker.
+    """
+    n_points = np.broadcast(lat, lon, hour, weekday).size
+    offload = snapshot and executor.processes and not ml_engine.uses_forest(n_points)
+    model_file = snapshot.model_file(ml_engine.risk_version) if offload else None
+    if model_file is not None:
+        classes, best, confidence = await executor.run(key, predict_points, model_file, lat, lon, hour, weekday)
+        return classes, classes[best], confidence
+    result = await executor.run(key, ml_engine.predict_risk_batch, lat, lon, hour, weekday, local=True)
+    if result is None: return None
+    model, labels, confidence = result
+    return model.classes_, labels, confidence
+
+class BatchPredictRequest(BaseModel):
+    lat: List[float]
+    lon: List[float]
+    hour: Union[int, List[int]]
+    weekday: Union[int, List[int]]
+
+@app.post("/api/predict/batch")
+async def predict_crime_batch(request: Request, format: Optional[str] = None):
+    """
+    Score many points at once. Accepts JSON {"lat": [...], "lon": [...], "hour": int | [...], "weekday": int | [...]}
+    or an application/octet-stream body of little-endian float64 (lat, lon, hour, weekday) records.
+    Results are columnar: one array per field, in input order.
+    """
+    if request.headers.get("content-type", "").startswith("application/octet-stream"):
+        body = await request.body()
+        if len(body) % 32:
+            raise HTTPException(status_code=400, detail="Binary body must be float64 (lat, lon, hour, weekday) records")
+        lat, lon, hour, weekday = np.frombuffer(body, dtype='<f8').reshape(-1, 4).T
+    else:
+        try:
+            payload = BatchPredictRequest(**await request.json())
+        except (ValidationError, ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        lat, lon, hour, weekday = payload.lat, payload.lon, payload.hour, payload.weekday
+
+    if len(lat) != len(lon) or any(not np.isscalar(v) and len(v) != len(lat) for v in (hour, weekday)):
+        raise HTTPException(status_code=400, detail="lat, lon, hour and weekday must have the same length")
+    if len(lat) > MAX_BATCH_POINTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_POINTS} points per batch")
+    check_point_inputs(lat, lon, hour, weekday)
+    if len(lat) == 0:
+        return encoded_response(request, {"count": 0, "risk_level": [], "confidence": [], "risk_score": []}, format)
+
+    result = await score_points(lat, lon, hour, weekday)
+    if result is None: return {"error": "Model not trained"}
+    _, labels, confidence = result
+    return encoded_response(request, {
+        "count": int(len(labels)),
+        "risk_level": labels.tolist(),
+        "confidence": confidence.tolist(),
+        "risk_score": (confidence * 100).tolist()
+    }, format)
+
+@app.get("/api/predict/grid")
+async def predict_crime_grid(request: Request, min_lat: float, min_lon: float, max_lat: float, max_lon: float, hour: int, weekday: int,
+                       resolution: float = 0.01, format: Optional[str] = None):
+    """Risk raster over a bounding box; resolution is the cell size in degrees."""
+    if not np.isfinite([min_lat, min_lon, max_lat, max_lon, resolution]).all() or resolution <= 0 or max_lat <= min_lat or max_lon <= min_lon:
+        raise HTTPException(status_code=400, detail="Invalid bounding box or resolution")
+    check_point_inputs(min_lat, min_lon, hour, weekday)
+    rows, cols = grid_cells(max_lat - min_lat, resolution), grid_cells(max_lon - min_lon, resolution)
+    if rows * cols > MAX_GRID_CELLS:
+        raise HTTPException(status_code=413, detail=f"Grid of {rows}x{cols} exceeds {MAX_GRID_CELLS} cells; use a coarser resolution")
+
+    params = {"bbox": [min_lat, min_lon, max_lat, max_lon], "resolution": resolution, "hour": hour, "weekday": weekday}
+    version = ml_engine.risk_version
+
+    async def compute():
+        lats, lons = grid_axes(min_lat, min_lon, max_lat, max_lon, resolution)
+        grid_lat, grid_lon = np.meshgrid(lats, lons, indexing='ij')
+        result = await score_points(grid_lat, grid_lon, hour, weekday, key=("risk-grid", version, json.dumps(params)))
+        if result is None: return {"error": "Model not trained"}
+        classes, labels, confidence = result
+        # classes_ is sorted, so searchsorted maps labels to compact codes
+        return {
+            "bbox": [min_lat, min_lon, max_lat, max_lon],
+            "resolution": resolution,
+            "shape": list(confidence.shape),
+            "lats": lats.tolist(),
+            "lons": lons.tolist(),
+            "classes": classes.tolist(),
+            "risk_level": np.searchsorted(classes, labels).tolist(),
+            "risk_score": (confidence * 100).tolist()
+        }
+
+    return await cached_response(request, "risk-grid", version, params, GRID_TTL, compute, format)
+
+HOTSPOT_ALGORITHMS = ("kmeans", "density")
+
+def hotspot_algorithm(algorithm: str = "kmeans"):
+    """
+    Hotspot detection for /api/hotspots and the patrol route: "kmeans" partitions every incident into
+    n clusters; "density" reports the n highest-scoring dense areas found by DBSCAN (hotspots.py).
+    """
+    if algorithm not in HOTSPOT_ALGORITHMS:
+        raise HTTPException(status_code=400, detail=f"algorithm must be one of: {', '.join(HOTSPOT_ALGORITHMS)}")
+    return algorithm
+
+def density_index():
+    return ml_engine.neighbour_index(store.version, settings.HOTSPOT_RADIUS_M, store.queries.hotspot_cells)
+
+def density_hotspots(n, filters=None):
+    """Top n DBSCAN hotspots by severity score; every filter reuses the version's neighbour index."""
+    index = density_index()
+    return index.hotspots(store.queries.hotspot_cells(index.cell, filters), n, settings.HOTSPOT_MIN_INCIDENTS)
+
+def hotspot_summary(n_clusters, filters=None, algorithm="kmeans"):
+    """
+    Cluster summaries for the current data: ST_ClusterKMeans in Postgres, sklearn KMeans in memory.
+    Filtered summaries cluster just the matching incidents; they skip the registry (the response cache
+    keeps them), so ad-hoc filters do not evict or persist models. algorithm="density" uses DBSCAN instead.
+    """
+    if algorithm == "density": return density_hotspots(n_clusters, filters)
+    version = store.version
+    if filters:
+        if store.use_db: return store.queries.hotspot_clusters(n_clusters, filters)
+        df = store.get_frame(filters)
+        if df.empty: return []
+        lat, lon = df['latitude'].to_numpy(np.float64), df['longitude'].to_numpy(np.float64)
+        key = ("kmeans", version, n_clusters, json.dumps(filters.key(), sort_keys=True))
+        return executor.run_sync(key, cluster_hotspots, lat, lon, n_clusters).summary
+    if store.use_db:
+        key = (version, "st_clusterkmeans", n_clusters)
+        return ml_engine.registry.get_or_train(key, lambda: HotspotEntry(None, store.queries.hotspot_clusters(n_clusters))).summary
+
+    def cluster(lat, lon, k):
+        # Called on a request thread on registry misses only; the fit itself goes to a worker process
+        return executor.run_sync(("kmeans", version, k), cluster_hotspots, lat, lon, k)
+    return ml_engine.hotspot_summary(version, n_clusters, store.get_frame, cluster)
+
+def top_hotspots(n_clusters, filters=None, algorithm="kmeans"):
+    return hotspot_summary(n_clusters, filters, algorithm) if store.count() else []
+
 @app.get("/api/hotspots")
-def get_hotspots():
-    df = pd.DataFrame(store.get_crimes())
-    if df.empty: return []
-    df = ml_engine.train_hotspots(df)
-    
-    hotspots = df.groupby('cluster').agg({
-        'latitude': 'mean',
-        'longitude': 'mean',
-        'crime_id': 'count'
-    }).rename(columns={'crime_id': 'count'}).reset_index()
-    
-    return hotspots.to_dict(orient='records')
+async def get_hotspots(request: Request, format: Optional[str] = None, filters: CrimeFilter = Depends(crime_filter),
+                       algorithm: str = Depends(hotspot_algorithm)):
+    """
+    The 10 hotspots of the (filtered) incidents. algorithm=density records also carry a severity-weighted
+    score, the convex extent of the hotspot as [[lat, lon], ...] and its area in km^2.
+    """
+    params = {"n_clusters": 10, "algorithm": algorithm, **filters.key()}
+    return await cached_response(request, "hotspots", store.version, params, HOTSPOT_TTL,
+                                 lambda: run_in_threadpool(top_hotspots, 10, filters, algorithm), format)
 
-@app.get("/api/patrol-route")
-def get_patrol_route(n_hotspots: int = 5, n_officers: int = 1):
-    df = pd.DataFrame(store.get_crimes())
-    if df.empty: return []
-    hotspots_df = ml_engine.train_hotspots(df, n_clusters=n_hotspots)
-    # Get top clusters
-    df_clustered = ml_engine.train_hotspots(hotspots_df, n_clusters=n_hotspots)
-    top_clusters = df_clustered.groupby('cluster').agg({
-        'latitude': 'mean',
-        'longitude': 'mean'
-    }).reset_index().to_dict(orient='records')
-    
+@app.get("/api/hotspots/windows")
+async def get_hotspot_windows(request: Request, window_days: int = 7, step_days: int = 7, n_hotspots: int = 10,
+                              format: Optional[str] = None, filters: CrimeFilter = Depends(crime_filter)):
+    """
+    Density hotspots per sliding time window: windows of window_days starting every step_days, from
+    filters.start (default: the first incident) until one reaches filters.end (default: the last).
+    All windows share one neighbour index, so each costs a pass over its own incidents only.
+    """
+    first = int(np.datetime64(filters.start, 'D').astype(np.int64)) if filters.start else None
+    last = int(np.datetime64(filters.end, 'D').astype(np.int64)) if filters.end else None
+
+    def compute():
+        index = density_index()
+        cells = store.queries.hotspot_cells(index.cell, filters)
+        try:
+            return index.windows(cells, n_hotspots, window_days, step_days, settings.HOTSPOT_MIN_INCIDENTS, first, last)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    params = {"window_days": window_days, "step_days": step_days, "n_hotspots": n_hotspots, **filters.key()}
+    return await cached_response(request, "hotspot-windows", store.version, params, HOTSPOT_TTL,
+                                 lambda: run_in_threadpool(compute), format)
+
+async def compute_patrol_route(n_hotspots, n_officers, filters=None, algorithm="kmeans"):
+    version = store.version
+    top_clusters = await run_in_threadpool(top_hotspots, n_hotspots, filters, algorithm)
     hotspots = [{"lat": h['latitude'], "lon": h['longitude'], "id": h['cluster']} for h in top_clusters]
-    return RoutingEngine.optimize_patrol(hotspots, n_officers=n_officers)
+    if not hotspots: return []
+    # Keyed without the response format, so JSON and msgpack requests for one route share a solve
+    key = ("patrol", version, n_hotspots, n_officers, algorithm, json.dumps(filters.key(), sort_keys=True) if filters else None)
+    return await executor.run(key, RoutingEngine.optimize_patrol, hotspots, n_officers)
+
+async def patrol_route_bytes(n_hotspots, n_officers, filters=None, algorithm="kmeans"):
+    params = {"n_hotspots": n_hotspots, "n_officers": n_officers, "algorithm": algorithm, **(filters.key() if filters else {})}
+    return await cache.aget_or_compute("patrol", store.version, params, PATROL_TTL,
+                                       lambda: compute_patrol_route(n_hotspots, n_officers, filters, algorithm))
+
+@app.get("/api/patrol-route")
+async def get_patrol_route(request: Request, n_hotspots: int = 5, n_officers: int = 1, format: Optional[str] = None,
+                           filters: CrimeFilter = Depends(crime_filter), algorithm: str = Depends(hotspot_algorithm)):
+    params = {"n_hotspots": n_hotspots, "n_officers": n_officers, "algorithm": algorithm, **filters.key()}
+    return await cached_response(request, "patrol", store.version, params, PATROL_TTL,
+                                 lambda: compute_patrol_route(n_hotspots, n_officers, filters, algorithm), format)
 
 @app.get("/api/trends")
-def get_trends(range: str = "12m"):
-    df = pd.DataFrame(store.get_crimes())
-    if df.empty:
-        return {
-            "monthly_trends": [],
-            "category_distribution": {},
-            "total_incidents": 0
-        }
-    
-    df['crime_date'] = pd.to_datetime(df['crime_date'])
+async def get_trends(request: Request, range: str = "12m", granularity: Optional[str] = None, format: Optional[str] = None,
+                     filters: CrimeFilter = Depends(crime_filter)):
+    if filters.start or filters.end:
+        # Arbitrary window; daily buckets for up to two months, monthly beyond that
+        first = np.datetime64(filters.start, 'D') if filters.start else None
+        last = np.datetime64(filters.end, 'D') if filters.end else None
+        if granularity is None:
+            granularity = "day" if first is not None and last is not None and (last - first).astype(int) <= 62 else "month"
+        return await cached_trends(request, first, last, granularity, filters, format)
+
     now = datetime.now()
-    
-    if range == "30d":
-        start_date = now - timedelta(days=30)
-        df = df[df['crime_date'] >= start_date]
-        # Group by day for 30d
-        trends = df.groupby(df['crime_date'].dt.date).size().reset_index(name='count')
-        trends.rename(columns={'crime_date': 'label'}, inplace=True)
-    else:
-        # Default 12 months
-        start_date = now - timedelta(days=365)
-        df = df[df['crime_date'] >= start_date]
-        # Group by month
-        trends = df.groupby(df['crime_date'].dt.to_period('M')).size().reset_index(name='count')
-        trends.rename(columns={'crime_date': 'label'}, inplace=True)
-        trends['label'] = trends['label'].astype(str)
-
-    # Crime by category
-    categories = df['crime_type'].value_counts().to_dict()
-    
-    return {
-        "monthly_trends": trends.to_dict(orient='records'),
-        "category_distribution": categories,
-        "total_incidents": len(df)
-    }
+    days, granularity = (30, "day") if range == "30d" else (365, "month")
+    # Incidents are dated at midnight, so only whole days after the cut-off qualify
+    cutoff = now - timedelta(days=days)
+    first = np.datetime64(cutoff.date(), 'D') + (0 if cutoff.time() == time(0) else 1)
+    return await cached_trends(request, first, None, granularity, filters, format)
+
+async def cached_trends(request, first, last, granularity, filters=None, format=None):
+    params = {"first": str(first), "last": str(last), "granularity": granularity, **(filters.key() if filters else {})}
+    return await cached_response(request, "trends", store.version, params, TRENDS_TTL,
+                                 lambda: run_in_threadpool(store.trend_summary, first, last, granularity, filters), format)
 
 @app.post("/api/upload")
-async def upload_csv(file: UploadFile = File(...)):
-    content = await file.read()
-    df = pd.read_csv(io.StringIO(content.decode('utf-8')))
-    
+async def upload_csv(file: UploadFile = File(...), mode: str = "replace"):
+    """mode=replace swaps in the uploaded incidents; mode=append adds the ones not already loaded (daily feeds)."""
+    if mode not in ("replace", "append"): raise HTTPException(status_code=400, detail="mode must be 'replace' or 'append'")
+    stats = IngestStats()
     try:
-        df_processed = process_csv(df)
-        store.add_crimes(df_processed)
-        # Clear cache to reflect new data
-        cache.delete("heatmap_data")
-        # Retrain models
-        startup_event()
-        return {"status": "success", "rows": len(df_processed)}
+        # Parse and load straight from the spooled upload, one chunk at a time
+        stats.rows_inserted = await run_in_threadpool(store.ingest, iter_clean_chunks(file.file, stats), mode == "replace")
+        INGEST_ROWS.inc(stats.rows_accepted, result="accepted")
+        INGEST_ROWS.inc(stats.rows_rejected, result="rejected")
+        INGEST_ROWS.inc(stats.rows_duplicate, result="duplicate")
+        # Retrain in the background; bursts of uploads coalesce into one job. Nothing new, nothing to retrain.
+        job = submit_training("upload" if mode == "replace" else "append") if stats.rows_inserted or mode == "replace" else None
+        return {"status": "success", "mode": mode, **stats.to_dict(), "job_id": job.id if job else None}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/train")
+def trigger_training():
+    job = submit_training("manual")
+    return job.to_dict() if job else {"id": None, "status": "forwarded", "reason": "manual"}
+
+# In-memory lookups: async so they answer even while every request thread is busy
+@app.get("/api/jobs")
+async def list_jobs():
+    return [job.to_dict() for job in training_queue.list()]
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = training_queue.get(job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.get("/api/incidents/nearby")
+def get_nearby_incidents(lat: float, lon: float, radius_m: float = 500):
+    """Incident count and per-type breakdown within radius_m metres (ST_DWithin on the DB path)."""
+    if radius_m <= 0: raise HTTPException(status_code=400, detail="radius_m must be positive")
+    return store.queries.nearby(lat, lon, radius_m)
+
+@app.get("/api/incidents/export")
+def export_incidents(request: Request, format: Optional[str] = None):
+    """
+    Dump every incident as a stream: NDJSON by default, or msgpack / Arrow IPC record batches.
+    Rows are encoded (and compressed) one batch at a time, so memory stays flat however large the table is.
+    """
+    name, encoding = negotiated(request, format, default="ndjson", allowed=STREAM_FORMATS)
+    try: chunks = stream_batches(store.queries.iter_batches(), name, encoding)
+    except UnsupportedFormat as e: raise HTTPException(status_code=406, detail=str(e))
+    return StreamingResponse(chunks, media_type=FORMATS[name], headers=response_headers(encoding))
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of request, stage, cache, training and data metrics."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return cache.info()
+
+async def briefing_bytes(kind, n_hotspots, n_officers, filters=None, algorithm="kmeans"):
+    """
+    Briefing for the current patrol route: one PDF ("pdf") or a ZIP of per-officer PDFs ("zip").
+    Rendered in memory by the task executor (one task per officer for the ZIP) and cached by
+    (dataset version, n_hotspots, n_officers), so a shift change full of identical requests renders once.
+    """
+    async def compute():
+        # fpdf is only needed here; importing it lazily keeps it off the boot path
+        from briefing import render_briefing, render_officer_briefing, briefing_zip
+        routes = json.loads(await patrol_route_bytes(n_hotspots, n_officers, filters, algorithm))
+        if kind == "zip":
+            pdfs = await asyncio.gather(*(executor.run(None, render_officer_briefing, route) for route in routes))
+            return briefing_zip(routes, pdfs)
+        return await executor.run(None, render_briefing, routes)
+
+    params = {"n_hotspots": n_hotspots, "n_officers": n_officers, "algorithm": algorithm, **(filters.key() if filters else {})}
+    return await cache.aget_or_compute(f"briefing-{kind}", store.version, params, BRIEFING_TTL, compute, encode=bytes)
+
 @app.get("/api/patrol-route/export")
-def export_patrol_route(n_hotspots: int = 5, n_officers: int = 1):
-    routes = get_patrol_route(n_hotspots, n_officers)
-    
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt="PCHAS Patrol Briefing Sheet", ln=True, align='C')
-    pdf.ln(10)
-    
-    for route in routes:
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(200, 10, txt=f"OFFICER {route['officer_id']} - ROUTE ASSIGNMENT", ln=True)
-        pdf.set_font("Arial", '', 10)
-        pdf.cell(200, 10, txt=f"Total Distance: {route['total_distance_km']:.2f} km | Est. Time: {route['est_time_mins']} mins", ln=True)
-        pdf.ln(5)
-        
-        pdf.set_font("Arial", 'B', 10)
-        pdf.cell(30, 10, "Sequence", 1)
-        pdf.cell(80, 10, "Latitude", 1)
-        pdf.cell(80, 10, "Longitude", 1)
-        pdf.ln()
-        
-        pdf.set_font("Arial", '', 10)
-        for idx, h in enumerate(route['sequence']):
-            pdf.cell(30, 10, str(idx+1), 1)
-            pdf.cell(80, 10, str(h['lat']), 1)
-            pdf.cell(80, 10, str(h['lon']), 1)
-            pdf.ln()
-        pdf.ln(10)
-
-    # Save to temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        pdf.output(tmp.name)
-        return FileResponse(
-            tmp.name,
-            filename="patrol_briefing.pdf",
-            media_type="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=patrol_briefing.pdf"}
-        )
+async def export_patrol_route(n_hotspots: int = 5, n_officers: int = 1, filters: CrimeFilter = Depends(crime_filter),
+                              algorithm: str = Depends(hotspot_algorithm)):
+    pdf = await briefing_bytes("pdf", n_hotspots, n_officers, filters, algorithm)
+    return Response(content=pdf, media_type="application/pdf",
+                    headers={"Content-Disposition": "attachment; filename=patrol_briefing.pdf"})
+
+@app.get("/api/patrol-route/export/batch")
+async def export_patrol_briefings(n_hotspots: int = 5, n_officers: int = 1, filters: CrimeFilter = Depends(crime_filter),
+                                  algorithm: str = Depends(hotspot_algorithm)):
+    """One briefing PDF per officer, zipped; the route is solved once for all of them."""
+    archive = await briefing_bytes("zip", n_hotspots, n_officers, filters, algorithm)
+    return Response(content=archive, media_type="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=patrol_briefings.zip"})
+
 def get_accuracy():
     # Return last trained accuracy or retrain
     return {"f1_score": 0.88, "status": "Stable"}
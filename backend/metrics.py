@@ -0,0 +1,219 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from starlette.routing import Match
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+SIZE_BUCKETS = [256 * 4 ** i for i in range(10)]  # 256 B .. 64 MiB
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock: items = list(self.values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = list(buckets)
+        self.values = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None: entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock: items = [(k, list(counts), total) for k, (counts, total) in self.values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Callback(Metric):
+    """Values read at scrape time from fn(), which returns {label values tuple: value} (or a bare number)."""
+
+    def __init__(self, name, help, fn, type="gauge", labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def samples(self):
+        try: values = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} failed ({e})")
+            return []
+        if not isinstance(values, dict): values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in values.items() if v is not None]
+
+
+REGISTRY = []
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Stage timers -----------------------------------------------------------------------------
+
+STAGE_SECONDS = Histogram("pchas_stage_duration_seconds", "Time spent in named hot-path stages", ["stage"])
+
+# Per-request list of (stage, seconds) while profiling; None otherwise. Context variables follow
+# the request into run_in_threadpool workers, so stages timed there are attributed to it.
+_profile = contextvars.ContextVar("pchas_profile", default=None)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _profile.get()
+        if stages is not None: stages.append((name, elapsed))
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def server_timing(stages, total):
+    """Server-Timing header value: one entry per stage (repeats summed, in first-seen order) plus the total."""
+    merged = {}
+    for name, seconds in stages:
+        merged[name] = merged.get(name, 0.0) + seconds
+    entries = [f"{name.replace(' ', '_')};dur={seconds * 1000:.2f}" for name, seconds in merged.items()]
+    return ", ".join(entries + [f"total;dur={total * 1000:.2f}"])
+
+
+# --- HTTP middleware --------------------------------------------------------------------------
+
+HTTP_REQUESTS = Counter("pchas_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("pchas_http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+HTTP_REQUEST_BYTES = Histogram("pchas_http_request_size_bytes", "HTTP request body size", ["route"], SIZE_BUCKETS)
+HTTP_RESPONSE_BYTES = Histogram("pchas_http_response_size_bytes", "HTTP response body size (as sent)", ["route"], SIZE_BUCKETS)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and payload sizes per route template. Requests sent
+    with `X-Profile: 1` (when allowed) get a Server-Timing header with the stage breakdown.
+    Stages that run while a streaming body is being sent are counted in metrics but miss the header.
+    """
+
+    def __init__(self, app, routes, allow_profiling=False):
+        self.app = app
+        self.routes = routes
+        self.allow_profiling = allow_profiling
+
+    def route_name(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL: return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = self.route_name(scope)
+        headers = dict(scope["headers"])
+        profiling = self.allow_profiling and headers.get(b"x-profile", b"").lower() in (b"1", b"true")
+        stages = [] if profiling else None
+        token = _profile.set(stages)
+        start = time.perf_counter()
+        status, sent = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profiling:
+                    timing = server_timing(stages, time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", timing)]}
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+            HTTP_LATENCY.observe(elapsed, method=method, route=route)
+            HTTP_RESPONSE_BYTES.observe(sent, route=route)
+            length = headers.get(b"content-length")
+            if length and length.isdigit(): HTTP_REQUEST_BYTES.observe(int(length), route=route)
@@ -1,88 +1,321 @@
+import copy
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import f1_score
-import joblib
-import os
+import threading
+import uuid
+from model_registry import ModelRegistry, HotspotEntry, REGISTRY_PATH
+from metrics import stage, timed
+from density import DensityRaster, hour_buckets
+from forest import CompiledForest
+from hotspots import NeighbourIndex, cell_size
 
-MODEL_PATH = "models/"
-if not os.path.exists(MODEL_PATH):
-    os.makedirs(MODEL_PATH)
+# sklearn is imported inside the methods that fit models: it is the slowest import in the app, and a
+# restored snapshot only needs it once a model is first unpickled (see restore_risk_model)
+
+TIME_WEIGHTS = np.array([0.8, 0.5, 0.2])  # night, evening, morning (hour_buckets order)
+RISK_FEATURES = ['latitude', 'longitude', 'hour', 'weekday', 'spatial_density', 'time_weight']
+
+def time_weights(hour):
+    return TIME_WEIGHTS[hour_buckets(hour)]
+
+def cluster_hotspots(lat, lon, n_clusters):
+    """KMeans over incident coordinates -> HotspotEntry(model, per-cluster centroid/count records)."""
+    model, labels = MLEngine.fit_hotspots(pd.DataFrame({'latitude': lat, 'longitude': lon}), n_clusters)
+    if model is None: return HotspotEntry(None, [])
+    counts = np.bincount(labels, minlength=model.n_clusters)
+    lat_mean = np.bincount(labels, weights=lat, minlength=model.n_clusters) / np.maximum(counts, 1)
+    lon_mean = np.bincount(labels, weights=lon, minlength=model.n_clusters) / np.maximum(counts, 1)
+    summary = [
+        {"cluster": int(c), "latitude": float(lat_mean[c]), "longitude": float(lon_mean[c]), "count": int(counts[c])}
+        for c in range(model.n_clusters) if counts[c] > 0
+    ]
+    return HotspotEntry(model, summary)
+
+def update_hotspots(entry, lat, lon):
+    """
+    Fold new incidents into a fitted HotspotEntry instead of reclustering everything: each point joins
+    its nearest centroid, which moves to the running mean of its members (MiniBatchKMeans' per-centre
+    update with learning rate 1/count). Cluster ids stay stable; the next full fit corrects any drift.
+    """
+    if entry.model is None or len(lat) == 0: return entry
+    k = entry.model.n_clusters
+    counts, lat_sum, lon_sum = np.zeros(k), np.zeros(k), np.zeros(k)
+    for rec in entry.summary:
+        c = rec["cluster"]
+        counts[c], lat_sum[c], lon_sum[c] = rec["count"], rec["latitude"] * rec["count"], rec["longitude"] * rec["count"]
+    labels = entry.model.predict(pd.DataFrame({'latitude': lat, 'longitude': lon}))
+    counts += np.bincount(labels, minlength=k)
+    lat_sum += np.bincount(labels, weights=lat, minlength=k)
+    lon_sum += np.bincount(labels, weights=lon, minlength=k)
+    model = copy.deepcopy(entry.model)  # the base entry is still served for its own version
+    centers = np.array(model.cluster_centers_)
+    filled = counts > 0
+    centers[filled] = np.column_stack([lat_sum, lon_sum])[filled] / counts[filled, None]
+    model.cluster_centers_ = centers
+    summary = [
+        {"cluster": int(c), "latitude": float(centers[c, 0]), "longitude": float(centers[c, 1]), "count": int(counts[c])}
+        for c in range(k) if counts[c] > 0
+    ]
+    return HotspotEntry(model, summary)
+
+def grid_cells(span, resolution):
+    """Cells of `resolution` degrees covering span; the quotient is rounded first so exact multiples get no extra cell."""
+    return int(np.ceil(round(span / resolution, 9)))
+
+def grid_axes(min_lat, min_lon, max_lat, max_lon, resolution):
+    """
+    Cell-centre latitudes and longitudes of a lat/lon grid, south to north and west to east. The last cell
+    of an axis is clipped to the bbox when the span isn't a multiple of resolution, so every centre is inside.
+    """
+    def centres(lo, hi):
+        edges = lo + np.arange(grid_cells(hi - lo, resolution) + 1) * resolution
+        edges[-1] = hi
+        return (edges[:-1] + edges[1:]) / 2
+    return centres(min_lat, max_lat), centres(min_lon, max_lon)
+
+def score_points(model, density, lat, lon, hour, weekday):
+    """
+    One predict_proba pass over broadcast inputs, with the same features as training (raster lookup +
+    time weight). Returns (index into model.classes_, confidence), both shaped like the inputs.
+    """
+    lat, lon, hour, weekday = np.broadcast_arrays(
+        np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+        np.asarray(hour, dtype=np.int64), np.asarray(weekday, dtype=np.int64))
+    X = np.column_stack([lat.ravel(), lon.ravel(), hour.ravel(), weekday.ravel(),
+                         density.lookup(lat, lon, hour).ravel(), time_weights(hour).ravel()])
+    # sklearn models were fitted on a DataFrame and check the column names; a CompiledForest takes the array
+    if hasattr(model, "feature_names_in_"): X = pd.DataFrame(X, columns=RISK_FEATURES)
+    probs = model.predict_proba(X)
+    best = probs.argmax(axis=1)
+    # Equivalent to model.predict() without a second pass over the trees
+    return best.reshape(lat.shape), probs[np.arange(len(best)), best].reshape(lat.shape)
 
 class MLEngine:
-    def __init__(self):
+    """
+    compiled_max_rows: predictions for up to this many points use the risk model compiled to flat arrays
+    (forest.CompiledForest), which skips sklearn's per-call overhead; larger batches, where sklearn's
+    Cython traversal is faster, use the sklearn model. 0 disables the compiled path.
+    """
+
+    def __init__(self, registry_path=REGISTRY_PATH, compiled_max_rows=256):
         self.hotspot_model = None
         self.risk_model = None
-        
-    def train_hotspots(self, df, n_clusters=10):
-        if df.empty: return df
-        X = df[['latitude', 'longitude']]
+        self.risk_forest = None
+        self.risk_density = None
+        self.risk_version = None
+        self.compiled_max_rows = compiled_max_rows
+        self._restore = None
+        self._restore_forest = None
+        self._restore_lock = threading.Lock()
+        self.registry = ModelRegistry(registry_path)
+        self._importance = None
+        self._importance_for = None
+
+    @staticmethod
+    @timed("ml.fit_hotspots")
+    def fit_hotspots(df, n_clusters=10):
+        """Fit KMeans on lat/lon without touching shared state. Returns (model, labels) or (None, None)."""
         # Adjust n_clusters if we have very little data
         actual_clusters = min(n_clusters, len(df))
-        if actual_clusters < 1: return df
-        
-        self.hotspot_model = KMeans(n_clusters=actual_clusters, random_state=42, n_init='auto')
-        df['cluster'] = self.hotspot_model.fit_predict(X)
-        joblib.dump(self.hotspot_model, f"{MODEL_PATH}hotspot_model.joblib")
+        if actual_clusters < 1: return None, None
+        from sklearn.cluster import KMeans
+        model = KMeans(n_clusters=actual_clusters, random_state=42, n_init='auto')
+        labels = model.fit_predict(df[['latitude', 'longitude']])
+        return model, labels
+
+    @timed("ml.train_hotspots")
+    def train_hotspots(self, df, n_clusters=10):
+        """Label df's incidents by KMeans cluster. Not persisted: versioned clusterings live in the registry (hotspot_summary)."""
+        if df.empty: return df
+        model, labels = self.fit_hotspots(df, n_clusters)
+        if model is None: return df
+        self.hotspot_model = model
+        df['cluster'] = labels
         return df
 
-    def prepare_features(self, df):
-        # Feature Engineering for Random Forest
-        df['crime_date'] = pd.to_datetime(df['crime_date'])
-        df['hour'] = pd.to_datetime(df['crime_time'], format='%H:%M:%S').dt.hour
+    def hotspot_summary(self, version, n_clusters, load_frame, cluster=cluster_hotspots):
+        """
+        Cluster centroids and sizes for a dataset version, trained once and served from the registry.
+        load_frame is only called on a registry miss; cluster(lat, lon, n_clusters) does the fitting
+        (the API passes one that runs cluster_hotspots in the task executor).
+        """
+        def train():
+            df = load_frame()
+            return cluster(df['latitude'].to_numpy(np.float64), df['longitude'].to_numpy(np.float64), n_clusters)
+
+        entry = self.registry.get_or_train((version, "kmeans", n_clusters), train)
+        if entry.model is not None: self.hotspot_model = entry.model
+        return entry.summary
+
+    def update_hotspot_summary(self, base_version, version, n_clusters, lat, lon, load_frame):
+        """
+        Hotspots for `version` when it is `base_version` plus the incidents at lat/lon: the base
+        clustering updated with update_hotspots. Falls back to a full fit if the base was never clustered.
+        """
+        base = self.registry.get((base_version, "kmeans", n_clusters))
+        if base is None or base.model is None: return self.hotspot_summary(version, n_clusters, load_frame)
+        entry = self.registry.get_or_train((version, "kmeans", n_clusters), lambda: update_hotspots(base, lat, lon))
+        self.hotspot_model = entry.model
+        return entry.summary
+
+    def neighbour_index(self, version, radius_m, load_cells):
+        """
+        Micro-cell neighbourhoods for density hotspots (hotspots.NeighbourIndex), built once per dataset
+        version and radius and kept in the registry. load_cells(cell) bins every incident (hotspot_cells).
+        """
+        return self.registry.get_or_train((version, "dbscan", f"{radius_m:g}m"),
+                                          lambda: NeighbourIndex.build(radius_m, load_cells(cell_size(radius_m))))
+
+    def density_raster(self, version, load_frame):
+        """Hour-bucketed density raster for a dataset version, built once and kept in the registry."""
+        return self.registry.get_or_train((version, "density", "hourly"),
+                                          lambda: DensityRaster.from_frame(self.prepare_time_features(load_frame())))
+
+    def prepare_time_features(self, df):
+        if 'crime_ts' in df:
+            # Columnar store frames carry a single datetime64 column instead of date + time
+            df['crime_date'] = df['crime_ts'].dt.normalize()
+            df['hour'] = df['crime_ts'].dt.hour
+        else:
+            df['crime_date'] = pd.to_datetime(df['crime_date'])
+            df['hour'] = pd.to_datetime(df['crime_time'], format='%H:%M:%S').dt.hour
         df['weekday'] = df['crime_date'].dt.weekday
-        
-        # Spatial Density (simulated for mock)
-        df['spatial_density'] = df.groupby('area_name')['latitude'].transform('count') / len(df)
+        return df
+
+    @timed("ml.prepare_features")
+    def prepare_features(self, df, density=None):
+        # Feature Engineering for Random Forest
+        df = self.prepare_time_features(df)
+
+        # Share of incidents in the surrounding window for this hour bucket; the same lookup serves inference
+        if density is None: density = DensityRaster.from_frame(df)
+        df['spatial_density'] = density.lookup(df['latitude'].to_numpy(), df['longitude'].to_numpy(), df['hour'].to_numpy())
         
         # Time weights (High weight for night/evening)
-        df['time_weight'] = df['hour'].apply(lambda x: 0.8 if 22 <= x or x < 6 else 0.5 if 14 <= x < 22 else 0.2)
+        df['time_weight'] = time_weights(df['hour'].to_numpy())
         
         # Target variable: Risk Level (Simulated based on severity and frequency)
-        df['risk_score'] = (df['spatial_density'] * 40 + df['time_weight'] * 30 + (df['victim_age']/100)*10) * 2
+        df['risk_score'] = ((df['spatial_density'] * 40 + df['time_weight'] * 30 + (df['victim_age']/100)*10) * 2).clip(upper=100)
         df['risk_level'] = pd.cut(df['risk_score'], bins=[0, 40, 70, 100], labels=['Low', 'Medium', 'High'])
         
         return df
 
-    def train_risk_model(self, df):
-        df = self.prepare_features(df)
+    @timed("ml.fit_risk_model")
+    def fit_risk_model(self, df, density):
+        """Train a risk model on features from `density` without touching self.risk_model. Returns (model, accuracy)."""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import f1_score
+        df = self.prepare_features(df, density)
         
-        features = ['latitude', 'longitude', 'hour', 'weekday', 'spatial_density', 'time_weight']
-        X = df[features]
+        X = df[RISK_FEATURES]
         y = df['risk_level']
         
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
-        self.risk_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.risk_model.fit(X_train, y_train)
-        
-        y_pred = self.risk_model.predict(X_test)
-        accuracy = f1_score(y_test, y_pred, average='weighted')
+        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        with stage("ml.risk_fit"):
+            model.fit(X_train, y_train)
         
-        joblib.dump(self.risk_model, f"{MODEL_PATH}risk_model.joblib")
+        with stage("ml.risk_evaluate"):
+            y_pred = model.predict(X_test)
+            accuracy = f1_score(y_test, y_pred, average='weighted')
+        return model, accuracy
+
+    @timed("ml.train_risk_model")
+    def train_risk_model(self, df):
+        df = self.prepare_time_features(df)
+        density = DensityRaster.from_frame(df)
+        model, accuracy = self.fit_risk_model(df, density)
+        self.swap_risk_model(model, density)
         return accuracy
 
+    @timed("ml.swap_risk_model")
+    def swap_risk_model(self, model, density):
+        # Publish with a single assignment; readers keep the old model until here. Persisting the
+        # model is the caller's job (Snapshot.publish_model), keyed by the risk_version set below.
+        self.use_risk_model(model, density, uuid.uuid4().hex[:12])
+
+    def use_risk_model(self, model, density, risk_version, forest=None):
+        """Adopt a fitted model, e.g. one published by another process, without retraining or re-saving it."""
+        if forest is None and self.compiled_max_rows and model is not None:
+            with stage("ml.compile_risk_model"):
+                forest = CompiledForest.from_sklearn(model)
+        # The model and the raster its features came from are published together
+        self.risk_density, self.risk_model, self.risk_forest = density, model, forest
+        self._restore = self._restore_forest = None
+        # Identifies this model in cache keys (prediction grids)
+        self.risk_version = risk_version
+
+    def restore_risk_model(self, load, risk_version, load_forest=None):
+        """
+        Serve a persisted model under risk_version. load() returns (model, density) and only runs on
+        first use, so booting from a snapshot pays neither the unpickling nor the sklearn import.
+        load_forest() likewise returns (CompiledForest, density), for artifacts that include one.
+        """
+        self.risk_model = self.risk_forest = None
+        self._restore, self._restore_forest = load, load_forest
+        self.risk_version = risk_version
+
+    def _load_risk_model(self):
+        if self.risk_model is None and self._restore is not None:
+            with self._restore_lock:
+                load = self._restore
+                if self.risk_model is None and load is not None:
+                    with stage("ml.restore_risk_model"):
+                        model, density = load()
+                    self.risk_density, self.risk_model = density, model
+                    self._restore = None
+        return self.risk_model
+
+    def _load_risk_forest(self):
+        """The compiled model: from its own artifact when there is one (no sklearn import), else compiled now."""
+        if self.risk_forest is None and self.compiled_max_rows:
+            with self._restore_lock:
+                load = self._restore_forest
+                if self.risk_forest is None and load is not None:
+                    with stage("ml.restore_risk_forest"):
+                        forest, density = load()
+                    self.risk_density, self.risk_forest = density, forest
+                    self._restore_forest = None
+            if self.risk_forest is None and self._load_risk_model() is not None:
+                with self._restore_lock:
+                    if self.risk_forest is None: self.risk_forest = CompiledForest.from_sklearn(self.risk_model)
+        return self.risk_forest
+
+    def uses_forest(self, n_points):
+        return 0 < n_points <= self.compiled_max_rows
+
+    @timed("ml.predict_risk_batch")
+    def predict_risk_batch(self, lat, lon, hour, weekday):
+        """
+        Score many points in one predict_proba pass. Scalars broadcast against arrays.
+        Returns (model, labels, confidence) as arrays, or None if no model is available.
+        """
+        n_points = np.broadcast(np.asarray(lat), np.asarray(lon), np.asarray(hour), np.asarray(weekday)).size
+        model = self._load_risk_forest() if self.uses_forest(n_points) else None
+        if model is None: model = self._load_risk_model()
+        if model is None: return None
+        best, confidence = score_points(model, self.risk_density, lat, lon, hour, weekday)
+        return model, model.classes_[best], confidence
+
+    def feature_importance(self, model):
+        if self._importance_for is not model:
+            self._importance = dict(zip(['lat', 'lon', 'hour', 'weekday', 'density', 'weight'], model.feature_importances_.tolist()))
+            self._importance_for = model
+        return self._importance
+
+    @timed("ml.predict_risk")
     def predict_risk(self, lat, lon, hour, weekday):
-        if not self.risk_model:
-            if os.path.exists(f"{MODEL_PATH}risk_model.joblib"):
-                self.risk_model = joblib.load(f"{MODEL_PATH}risk_model.joblib")
-            else:
-                return {"error": "Model not trained"}
-        
-        # Simple simulation of density/weight for single prediction
-        spatial_density = 0.05 
-        time_weight = 0.8 if 22 <= hour or hour < 6 else 0.5
-        
-        features = np.array([[lat, lon, hour, weekday, spatial_density, time_weight]])
-        prediction = self.risk_model.predict(features)[0]
-        probs = self.risk_model.predict_proba(features)[0]
-        confidence = np.max(probs)
+        result = self.predict_risk_batch([lat], [lon], [hour], [weekday])
+        if result is None:
+            return {"error": "Model not trained"}
+        model, labels, confidence = result
+        confidence = float(confidence[0])
         
         return {
-            "risk_level": prediction,
-            "confidence": float(confidence),
-            "risk_score": float(confidence * 100),
-            "feature_importance": dict(zip(['lat', 'lon', 'hour', 'weekday', 'density', 'weight'], self.risk_model.feature_importances_))
+            "risk_level": labels[0],
+            "confidence": confidence,
+            "risk_score": confidence * 100,
+            "feature_importance": self.feature_importance(model)
         }
@@ -0,0 +1,92 @@
+import glob
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import joblib
+
+REGISTRY_PATH = os.path.join("models", "registry")
+
+# model: fitted estimator, summary: per-cluster records served by /api/hotspots and /api/patrol-route
+HotspotEntry = namedtuple("HotspotEntry", ["model", "summary"])
+
+
+class ModelRegistry:
+    """
+    Fitted models keyed by (dataset_version, algorithm, params).
+    Each key is trained at most once: concurrent misses wait on a per-key lock, and the finished
+    entry is published with a single dict assignment so readers never observe a partial model.
+    Entries are also written to disk (tmp file + os.replace) so restarts on the same data reuse them.
+    """
+
+    def __init__(self, path=REGISTRY_PATH, max_entries=32):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key):
+        version, algorithm, params = key
+        return os.path.join(self.path, f"{algorithm}-{params}-{version}.joblib")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        path = self._file(key)
+        if os.path.exists(path):
+            try:
+                entry = joblib.load(path)
+            except Exception as e:
+                print(f"ModelRegistry: could not load {path} ({e})")
+                return None
+            self._remember(key, entry)
+            return entry
+        return None
+
+    def get_or_train(self, key, train):
+        """Return the entry for key, calling train() to build it only if no one else has."""
+        entry = self.get(key)
+        if entry is not None: return entry
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self.get(key)
+            if entry is None:
+                entry = train()
+                self._remember(key, entry)
+                self._persist(key, entry)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _persist(self, key, entry):
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            joblib.dump(entry, tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"ModelRegistry: could not persist {path} ({e})")
+            if os.path.exists(tmp): os.remove(tmp)
+            return
+        # Artifacts for older dataset versions of the same model are dead weight
+        _, algorithm, params = key
+        for stale in glob.glob(os.path.join(self.path, f"{algorithm}-{params}-*.joblib")):
+            if stale != path:
+                try: os.remove(stale)
+                except OSError: pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
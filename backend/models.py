@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Time
+from sqlalchemy import Column, Index, Integer, String, Float, Date, Time
 from database import Base
 
 # Geometry support is optional — only available when PostGIS + geoalchemy2 is installed
@@ -24,5 +24,22 @@ class Crime(Base):
     victim_gender = Column(String)
     risk_zone = Column(String)
 
+    # Natural-key lookups when appending (ingest.bulk_load(dedup=True)); the leading crime_date also
+    # serves date-range filters, the others the category filters of filters.CrimeFilter
+    __table_args__ = (
+        Index("ix_crimes_natural_key", "crime_date", "crime_time", "crime_type"),
+        Index("ix_crimes_crime_type", "crime_type"),
+        Index("ix_crimes_area_name", "area_name"),
+    )
+
+class CrimeDailyRollup(Base):
+    """Pre-aggregated incident counts per day, crime type and area; kept in sync by the ingest path."""
+    __tablename__ = "crime_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    crime_type = Column(String, primary_key=True)
+    area_name = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
 if _GEOM_AVAILABLE:
     Crime.geom = Column(Geometry(geometry_type='POINT', srid=4326))
@@ -0,0 +1,289 @@
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from crime_store import CATEGORICAL_COLUMNS, ColumnarCrimeStore
+from data_utils import SEVERITY_MAP
+from filters import CrimeIndex
+from rollups import TrendRollup, _epoch_days
+from routing_engine import EARTH_RADIUS_KM
+
+FRAME_COLUMNS = ["crime_id", "latitude", "longitude", "victim_age", "crime_ts"] + CATEGORICAL_COLUMNS
+BATCH_ROWS = 50_000
+
+
+def _metres_to_degrees(lat, metres):
+    dlat = metres / 1000 / EARTH_RADIUS_KM * 180 / np.pi
+    return dlat, dlat / max(np.cos(np.radians(lat)), 1e-6)
+
+
+def _severity_sql():
+    """SQL CASE scoring crime_type by SEVERITY_MAP (unknown types score 1), with its bind params."""
+    cases = " ".join(f"WHEN :t{i} THEN {int(v)}" for i, v in enumerate(SEVERITY_MAP.values()))
+    return f"CASE crime_type {cases} ELSE 1 END", {f"t{i}": name for i, name in enumerate(SEVERITY_MAP)}
+
+
+def _nearby_summary(crime_types):
+    counts = pd.Series(crime_types, dtype=object).value_counts()
+    return {"count": int(counts.sum()), "by_type": {k: int(v) for k, v in counts.items()}}
+
+
+class MemoryCrimeQueries:
+    """
+    Query API over the in-memory ColumnarCrimeStore; mirrors PostgresCrimeQueries.
+    Filtered queries (filters.CrimeFilter) go through a CrimeIndex kept for the current store version.
+    """
+
+    def __init__(self, get_store):
+        self.get_store = get_store
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    def count(self):
+        return len(self.get_store())
+
+    def index(self):
+        """Secondary indexes for the current data; replaced (and rebuilt lazily) when the version changes."""
+        store = self.get_store()
+        index = self._index
+        if index is not None and index.version == store.version: return index
+        with self._index_lock:
+            if self._index is None or self._index.version != store.version:
+                self._index = CrimeIndex(store.version, *store.arrays())
+            return self._index
+
+    def frame(self, filters=None):
+        if not filters: return self.get_store().frame()
+        index = self.index()
+        return ColumnarCrimeStore.build_frame(index.cols, index.categories, index.select(filters))
+
+    def trend_rollup(self, filters):
+        """Day x type x area counts over just the matching incidents, for criteria the stored rollup lacks."""
+        index = self.index()
+        rows = index.select(filters)
+        rollup = TrendRollup()
+        names = {name: np.array(index.categories[name] + [None], dtype=object) for name in ("crime_type", "area_name")}
+        rollup.add(index.cols["crime_ts"][rows] // 86400, names["crime_type"][index.cols["crime_type"][rows]],
+                   names["area_name"][index.cols["area_name"][rows]])
+        return rollup
+
+    def hotspot_cells(self, cell, filters=None):
+        """
+        Matching incidents binned for hotspots.NeighbourIndex: grid row/col of `cell` degrees, epoch day,
+        count, lat/lon sums and severity. One row per incident here; Postgres groups by cell and day.
+        """
+        index = self.index()
+        cols = index.cols
+        rows = index.select(filters) if filters else np.arange(len(cols["crime_ts"]))
+        rows = rows[np.isfinite(cols["latitude"][rows]) & np.isfinite(cols["longitude"][rows])]
+        lat, lon = cols["latitude"][rows], cols["longitude"][rows]
+        lut = np.array([SEVERITY_MAP.get(t, 1) for t in index.categories["crime_type"]] + [1], dtype=np.float64)
+        return {
+            "row": np.floor(lat / cell).astype(np.int64),
+            "col": np.floor(lon / cell).astype(np.int64),
+            "day": cols["crime_ts"][rows] // 86400,
+            "count": np.ones(len(rows)),
+            "lat_sum": lat,
+            "lon_sum": lon,
+            "severity": lut[cols["crime_type"][rows]],
+        }
+
+    def iter_batches(self, batch_size=BATCH_ROWS):
+        cols, categories = self.get_store().arrays()
+        names = {name: np.array(categories[name] + [None], dtype=object) for name in CATEGORICAL_COLUMNS}
+        for start in range(0, len(cols["crime_id"]), batch_size):
+            rows = slice(start, start + batch_size)
+            batch = {name: cols[name][rows] for name in FRAME_COLUMNS if name not in names}
+            batch.update({name: lookup[cols[name][rows]] for name, lookup in names.items()})
+            yield batch
+
+    def records(self):
+        return self.get_store().records()
+
+    def bounds(self):
+        cols, _ = self.get_store().arrays()
+        if len(cols["latitude"]) == 0: return None
+        return (float(cols["latitude"].min()), float(cols["longitude"].min()),
+                float(cols["latitude"].max()), float(cols["longitude"].max()))
+
+    def nearby(self, lat, lon, radius_m):
+        """Incidents within radius_m metres of (lat, lon): total and per-type counts."""
+        cols, categories = self.get_store().arrays()
+        dlat, dlon = _metres_to_degrees(lat, radius_m)
+        # Cheap bbox prefilter, then exact great-circle distance on the survivors
+        mask = (np.abs(cols["latitude"] - lat) <= dlat) & (np.abs(cols["longitude"] - lon) <= dlon)
+        plat, plon = np.radians(cols["latitude"][mask]), np.radians(cols["longitude"][mask])
+        a = np.sin((plat - np.radians(lat)) / 2) ** 2 + np.cos(plat) * np.cos(np.radians(lat)) * np.sin((plon - np.radians(lon)) / 2) ** 2
+        inside = 2 * EARTH_RADIUS_KM * 1000 * np.arcsin(np.sqrt(np.clip(a, 0, 1))) <= radius_m
+        codes = cols["crime_type"][mask][inside]
+        names = np.array(categories["crime_type"] + [None], dtype=object)
+        return _nearby_summary(names[codes])
+
+
+class PostgresCrimeQueries:
+    """
+    Pushes aggregation and filtering into Postgres/PostGIS instead of materialising ORM objects.
+    Raw rows, when needed, are streamed through a server-side cursor in NumPy batches.
+    """
+
+    def __init__(self, engine, has_geom):
+        self.engine = engine
+        self.has_geom = has_geom
+
+    def count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM crimes")).scalar()
+
+    def iter_batches(self, batch_size=BATCH_ROWS, filters=None):
+        """Yield dicts of NumPy arrays (FRAME_COLUMNS), batch_size rows at a time."""
+        where, params = filters.sql() if filters else ("TRUE", {})
+        sql = text(
+            "SELECT crime_id, latitude, longitude, victim_age, "
+            "EXTRACT(EPOCH FROM crime_date + COALESCE(crime_time, TIME '00:00'))::bigint AS crime_ts, "
+            f"{', '.join(CATEGORICAL_COLUMNS)} FROM crimes WHERE crime_date IS NOT NULL AND {where} ORDER BY crime_id"
+        )
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(sql, params)
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows: break
+                columns = list(zip(*rows))
+                yield {
+                    "crime_id": np.asarray(columns[0], dtype=np.int64),
+                    "latitude": np.asarray(columns[1], dtype=np.float64),
+                    "longitude": np.asarray(columns[2], dtype=np.float64),
+                    "victim_age": np.asarray([np.nan if v is None else v for v in columns[3]], dtype=np.float32),
+                    "crime_ts": np.asarray(columns[4], dtype=np.int64),
+                    **{name: np.asarray(columns[5 + i], dtype=object) for i, name in enumerate(CATEGORICAL_COLUMNS)},
+                }
+
+    def frame(self, filters=None):
+        """Same shape as ColumnarCrimeStore.frame(): numeric columns, datetime64 crime_ts, categoricals."""
+        batches = list(self.iter_batches(filters=filters))
+        if not batches: return pd.DataFrame(columns=FRAME_COLUMNS)
+        data = {name: np.concatenate([b[name] for b in batches]) for name in FRAME_COLUMNS}
+        data["crime_ts"] = data["crime_ts"].view("datetime64[s]")
+        for name in CATEGORICAL_COLUMNS:
+            data[name] = pd.Categorical(data[name])
+        return pd.DataFrame(data, copy=False)
+
+    def records(self):
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(
+                "SELECT crime_id, area_name, place_type, latitude, longitude, crime_type, crime_date, crime_time, "
+                "victim_age, victim_gender, risk_zone FROM crimes ORDER BY crime_id"))
+            return [dict(row._mapping) for row in result]
+
+    def bounds(self, filters=None):
+        where, params = filters.sql() if filters else ("TRUE", {})
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"SELECT MIN(latitude), MIN(longitude), MAX(latitude), MAX(longitude) FROM crimes WHERE {where}"), params).one()
+        return None if row[0] is None else tuple(float(v) for v in row)
+
+    def trend_rollup(self, filters):
+        """Day x type x area counts over just the matching incidents, for criteria the rollup table lacks."""
+        where, params = filters.sql()
+        sql = text(f"SELECT crime_date, crime_type, area_name, COUNT(*) FROM crimes "
+                   f"WHERE crime_date IS NOT NULL AND {where} GROUP BY 1, 2, 3")
+        with self.engine.connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        rollup = TrendRollup()
+        if rows:
+            days, types, areas, counts = zip(*rows)
+            rollup.add(_epoch_days(days), list(types), list(areas), counts)
+        return rollup
+
+    def _bbox_clause(self):
+        # The && operator uses the GiST index on geom; the plain comparisons make the bounds half-open
+        clause = "latitude >= :lat0 AND latitude < :lat1 AND longitude >= :lon0 AND longitude < :lon1"
+        if self.has_geom:
+            clause = "geom && ST_MakeEnvelope(:lon0, :lat0, :lon1, :lat1, 4326) AND " + clause
+        return clause
+
+    def tile_bins(self, min_lat, min_lon, size, n_bins, crime_type=None, filters=None):
+        """Heatmap bins for one tile, aggregated in SQL. Same keys as HeatmapIndex._compute_tile."""
+        step = size / n_bins
+        severity, params = _severity_sql()
+        params.update(lat0=min_lat, lon0=min_lon, lat1=min_lat + size, lon1=min_lon + size, step=step, last=n_bins - 1)
+        where = self._bbox_clause()
+        if filters:
+            clause, filter_params = filters.sql()
+            where += f" AND {clause}"
+            params.update(filter_params)
+        if crime_type is not None:
+            where += " AND crime_type = :crime_type"
+            params["crime_type"] = crime_type
+        sql = text(
+            "SELECT LEAST(FLOOR((latitude - :lat0) / :step), :last)::int AS r, "
+            "LEAST(FLOOR((longitude - :lon0) / :step), :last)::int AS c, "
+            f"COUNT(*), SUM({severity}), AVG(latitude), AVG(longitude), "
+            "MODE() WITHIN GROUP (ORDER BY crime_type) "
+            f"FROM crimes WHERE {where} GROUP BY 1, 2 ORDER BY 1, 2"
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if not rows: return None
+        _, _, counts, sev, lat, lon, types = zip(*rows)
+        return {
+            "lat": np.asarray(lat, dtype=np.float64),
+            "lon": np.asarray(lon, dtype=np.float64),
+            "count": np.asarray(counts, dtype=np.int64),
+            "severity": np.asarray(sev, dtype=np.float64),
+            "type": np.asarray(types, dtype=object),
+        }
+
+    def hotspot_cells(self, cell, filters=None):
+        """Same arrays as MemoryCrimeQueries.hotspot_cells, grouped by cell and day in SQL."""
+        severity, params = _severity_sql()
+        where, filter_params = filters.sql() if filters else ("TRUE", {})
+        sql = text(
+            "SELECT FLOOR(latitude / :cell)::bigint, FLOOR(longitude / :cell)::bigint, crime_date - DATE '1970-01-01', "
+            f"COUNT(*), SUM(latitude), SUM(longitude), SUM({severity}) FROM crimes "
+            f"WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND crime_date IS NOT NULL AND {where} GROUP BY 1, 2, 3"
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(sql, {**params, **filter_params, "cell": cell}).fetchall()
+        columns = list(zip(*rows)) or [()] * 7
+        return {
+            "row": np.asarray(columns[0], dtype=np.int64),
+            "col": np.asarray(columns[1], dtype=np.int64),
+            "day": np.asarray(columns[2], dtype=np.int64),
+            "count": np.asarray(columns[3], dtype=np.float64),
+            "lat_sum": np.asarray(columns[4], dtype=np.float64),
+            "lon_sum": np.asarray(columns[5], dtype=np.float64),
+            "severity": np.asarray(columns[6], dtype=np.float64),
+        }
+
+    def hotspot_clusters(self, n_clusters, filters=None):
+        """Cluster centroids and sizes via ST_ClusterKMeans, same records as MLEngine.hotspot_summary."""
+        point = "geom" if self.has_geom else "ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)"
+        where, params = filters.sql() if filters else ("TRUE", {})
+        sql = text(
+            "SELECT cluster, AVG(latitude), AVG(longitude), COUNT(*) FROM ("
+            f"  SELECT latitude, longitude, ST_ClusterKMeans({point}, :k) OVER () AS cluster FROM crimes WHERE {where}"
+            ") clustered GROUP BY cluster ORDER BY cluster"
+        )
+        with self.engine.connect() as conn:
+            k = min(n_clusters, conn.execute(text(f"SELECT COUNT(*) FROM crimes WHERE {where}"), params).scalar() or 0)
+            if k < 1: return []
+            rows = conn.execute(sql, {**params, "k": k}).fetchall()
+        return [{"cluster": int(c), "latitude": float(la), "longitude": float(lo), "count": int(n)} for c, la, lo, n in rows]
+
+    def nearby(self, lat, lon, radius_m):
+        params = {"lat": lat, "lon": lon, "r": radius_m}
+        if self.has_geom:
+            # A cast to geography can't use the GiST index on geom, so a bbox prefilter (&&) does the lookup.
+            # Padded 1%: geography measures on the spheroid, and longitude degrees shrink towards the far edge.
+            dlat, _ = _metres_to_degrees(lat, radius_m * 1.01)
+            _, dlon = _metres_to_degrees(min(abs(lat) + dlat, 90.0), radius_m * 1.01)
+            params.update(dlat=float(dlat), dlon=float(dlon))
+            where = ("geom && ST_Expand(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326), :dlon, :dlat) AND "
+                     "ST_DWithin(geom::geography, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :r)")
+        else:
+            where = ("2 * 6371008.8 * ASIN(SQRT(POWER(SIN(RADIANS(latitude - :lat) / 2), 2) + "
+                     "COS(RADIANS(:lat)) * COS(RADIANS(latitude)) * POWER(SIN(RADIANS(longitude - :lon) / 2), 2))) <= :r")
+        sql = text(f"SELECT crime_type, COUNT(*) FROM crimes WHERE {where} GROUP BY crime_type ORDER BY 2 DESC")
+        with self.engine.connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return {"count": int(sum(n for _, n in rows)), "by_type": {t: int(n) for t, n in rows if t is not None}}
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+ROLLUP_TABLE = "crime_daily_rollup"
+
+
+def _epoch_days(dates):
+    return pd.to_datetime(pd.Series(dates).to_numpy()).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+class TrendRollup:
+    """
+    Incident counts by day x (crime_type, area_name), kept as a dense (days, combos) int64 matrix.
+    New batches are folded in with np.add.at, and any date-range query is a slice + sum whose cost
+    depends on the number of days and combos, not on the number of incidents.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.day0 = 0
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.combos = {}
+        self.combo_type = []
+        self.combo_area = []
+
+    def add_frame(self, df):
+        if df.empty: return
+        self.add(_epoch_days(df["crime_date"]), df["crime_type"].to_numpy(dtype=object),
+                 df["area_name"].to_numpy(dtype=object) if "area_name" in df else np.full(len(df), None, dtype=object))
+
+    def add(self, days, crime_types, areas, weights=None):
+        days = np.asarray(days, dtype=np.int64)
+        if len(days) == 0: return
+        weights = np.ones(len(days), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+        # Aggregate the batch first so the Python-level work is per distinct combo, not per row
+        grouped = pd.DataFrame({"day": days, "crime_type": crime_types, "area_name": areas, "n": weights}) \
+            .groupby(["day", "crime_type", "area_name"], dropna=False, sort=False)["n"].sum()
+        g_days = grouped.index.get_level_values(0).to_numpy(dtype=np.int64)
+        pairs = list(zip(grouped.index.get_level_values(1), grouped.index.get_level_values(2)))
+        with self._lock:
+            if not self.counts.flags.writeable: self.counts = self.counts.copy()  # mapped by open()
+            combo_ids = np.fromiter((self._combo_id(t, a) for t, a in pairs), dtype=np.int64, count=len(pairs))
+            self._reserve(int(g_days.min()), int(g_days.max()), len(self.combo_type))
+            np.add.at(self.counts, (g_days - self.day0, combo_ids), grouped.to_numpy(dtype=np.int64))
+
+    def _combo_id(self, crime_type, area):
+        crime_type = None if pd.isna(crime_type) else crime_type
+        area = None if pd.isna(area) else area
+        key = (crime_type, area)
+        cid = self.combos.get(key)
+        if cid is None:
+            cid = self.combos[key] = len(self.combo_type)
+            self.combo_type.append(crime_type)
+            self.combo_area.append(area)
+        return cid
+
+    def _reserve(self, first_day, last_day, n_combos):
+        n_days, have_combos = self.counts.shape
+        if n_days == 0:
+            self.day0 = first_day
+        lo = min(first_day, self.day0)
+        hi = max(last_day, self.day0 + n_days - 1)
+        if lo == self.day0 and hi - lo + 1 <= n_days and n_combos <= have_combos: return
+        grown = np.zeros((hi - lo + 1, max(n_combos, have_combos)), dtype=np.int64)
+        grown[self.day0 - lo:self.day0 - lo + n_days, :have_combos] = self.counts
+        self.counts, self.day0 = grown, lo
+
+    def save(self, path):
+        with self._lock:
+            counts, meta = self.counts, {"day0": self.day0, "combo_type": list(self.combo_type), "combo_area": list(self.combo_area)}
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "rollup_counts.npy"), counts)
+        with open(os.path.join(path, "rollup.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def open(cls, path):
+        """Map a saved rollup read-only; add() copies the matrix before its first write."""
+        with open(os.path.join(path, "rollup.json")) as f:
+            meta = json.load(f)
+        rollup = cls()
+        rollup.day0 = meta["day0"]
+        rollup.combo_type, rollup.combo_area = meta["combo_type"], meta["combo_area"]
+        rollup.combos = {(t, a): i for i, (t, a) in enumerate(zip(rollup.combo_type, rollup.combo_area))}
+        counts_path = os.path.join(path, "rollup_counts.npy")
+        rollup.counts = np.load(counts_path, mmap_mode="r") if rollup.combo_type else np.load(counts_path)
+        return rollup
+
+    def combo_ids(self, crime_types=None, areas=None):
+        """Columns of the (crime_type, area_name) combos within the given value sets (None = any)."""
+        with self._lock:
+            pairs = list(zip(self.combo_type, self.combo_area))
+        return np.array([i for i, (t, a) in enumerate(pairs)
+                         if (crime_types is None or t in crime_types) and (areas is None or a in areas)], dtype=np.int64)
+
+    def summary(self, first_day=None, last_day=None, granularity="month", combos=None):
+        """
+        Trend series, per-type totals and incident count for days in [first_day, last_day] (numpy datetime64[D]
+        or None), optionally over only the combo columns in combos (see combo_ids).
+        """
+        with self._lock:
+            counts, day0, combo_type = self.counts, self.day0, list(self.combo_type)
+        n_days = counts.shape[0]
+        lo = 0 if first_day is None else int(np.clip(first_day.astype(np.int64) - day0, 0, n_days))
+        hi = n_days if last_day is None else int(np.clip(last_day.astype(np.int64) - day0 + 1, lo, n_days))
+        block = counts[lo:hi]
+        if combos is not None:
+            combos = combos[combos < len(combo_type)]  # combos added since combo_ids() ran are not in this snapshot
+            block, combo_type = block[:, combos], [combo_type[i] for i in combos]
+        per_day = block.sum(axis=1)
+        days = (np.arange(lo, hi) + day0).astype("datetime64[D]")
+
+        if granularity == "day":
+            nz = per_day > 0
+            trends = [{"label": str(d), "count": int(c)} for d, c in zip(days[nz], per_day[nz])]
+        else:
+            months = days.astype("datetime64[M]")
+            unique, inverse = np.unique(months, return_inverse=True)
+            per_month = np.bincount(inverse, weights=per_day, minlength=len(unique)).astype(np.int64)
+            trends = [{"label": str(m), "count": int(c)} for m, c in zip(unique, per_month) if c > 0]
+
+        per_combo = block.sum(axis=0)
+        categories = {}
+        for crime_type, c in zip(combo_type, per_combo.tolist()):
+            if crime_type is not None and c:
+                categories[crime_type] = categories.get(crime_type, 0) + c
+        categories = dict(sorted(categories.items(), key=lambda kv: -kv[1]))
+
+        return {
+            "monthly_trends": trends,
+            "category_distribution": categories,
+            "total_incidents": int(per_day.sum())
+        }
+
+
+# --- Postgres materialization -------------------------------------------------------------
+
+def upsert_rollup(cur, df):
+    """Fold one cleaned chunk into the rollup table (called inside the ingest transaction)."""
+    if df.empty: return
+    grouped = pd.DataFrame({
+        "day": pd.to_datetime(df["crime_date"]).dt.date,
+        "crime_type": df["crime_type"].astype(object).fillna(""),
+        "area_name": df["area_name"].astype(object).fillna("") if "area_name" in df else "",
+    }).groupby(["day", "crime_type", "area_name"]).size()
+    cur.executemany(
+        f"INSERT INTO {ROLLUP_TABLE} (day, crime_type, area_name, count) VALUES (%s, %s, %s, %s) "
+        f"ON CONFLICT (day, crime_type, area_name) DO UPDATE SET count = {ROLLUP_TABLE}.count + EXCLUDED.count",
+        [(d, t, a, int(n)) for (d, t, a), n in grouped.items()]
+    )
+
+
+def rebuild_rollup(cur):
+    cur.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    cur.execute(
+        f"INSERT INTO {ROLLUP_TABLE} (day, crime_type, area_name, count) "
+        f"SELECT crime_date, COALESCE(crime_type, ''), COALESCE(area_name, ''), COUNT(*) "
+        f"FROM crimes WHERE crime_date IS NOT NULL GROUP BY 1, 2, 3"
+    )
+
+
+def load_rollup(db, first_day=None, last_day=None):
+    """Read the materialized rows for a date range into a TrendRollup."""
+    from sqlalchemy import text
+    clauses, params = [], {}
+    if first_day is not None:
+        clauses.append("day >= :first")
+        params["first"] = pd.Timestamp(first_day).date()
+    if last_day is not None:
+        clauses.append("day <= :last")
+        params["last"] = pd.Timestamp(last_day).date()
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = db.execute(text(f"SELECT day, crime_type, area_name, count FROM {ROLLUP_TABLE}{where}"), params).fetchall()
+    rollup = TrendRollup()
+    if rows:
+        days, types, areas, counts = zip(*rows)
+        rollup.add(_epoch_days(days), [t or None for t in types], [a or None for a in areas], counts)
+    return rollup
@@ -1,48 +1,171 @@
-import networkx as nx
+import time
 import numpy as np
-from scipy.spatial.distance import cdist
+from metrics import stage, timed
+
+EARTH_RADIUS_KM = 6371.0088
+MINS_PER_KM = 10  # average patrol speed incl. stops
+
+
+def haversine_matrix(lat, lon):
+    """Pairwise great-circle distances in km."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def tour_length(dist, tour, closed=True):
+    if len(tour) < 2: return 0.0
+    total = dist[tour[:-1], tour[1:]].sum()
+    return float(total + dist[tour[-1], tour[0]]) if closed else float(total)
+
+
+def nearest_neighbour_tour(dist, start=0):
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    tour = np.empty(n, dtype=np.int64)
+    current = start
+    for k in range(n):
+        tour[k] = current
+        visited[current] = True
+        if k == n - 1: break
+        row = np.where(visited, np.inf, dist[current])
+        current = int(row.argmin())
+    return tour
+
+
+def two_opt(dist, tour, deadline):
+    """Best-improvement 2-opt per anchor edge, vectorized over the second edge."""
+    n = len(tour)
+    if n < 4: return tour
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(n - 2):
+            a, b = tour[i], tour[i + 1]
+            js = np.arange(i + 2, n if i > 0 else n - 1)
+            if len(js) == 0: continue
+            c, d = tour[js], tour[(js + 1) % n]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            k = int(delta.argmin())
+            if delta[k] < -1e-9:
+                j = js[k]
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                improved = True
+            if time.perf_counter() >= deadline: break
+    return tour
+
+
+def or_opt(dist, tour, deadline, max_segment=3):
+    """Move segments of 1..max_segment stops (optionally reversed) to their cheapest other position."""
+    n = len(tour)
+    if n < 5: return tour
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 0
+            while i < n and time.perf_counter() < deadline:
+                if length >= n - 2: break
+                seg_idx = (np.arange(i, i + length)) % n
+                seg = tour[seg_idx]
+                p, q = tour[(i - 1) % n], tour[(i + length) % n]
+                s0, s1 = seg[0], seg[-1]
+                gain = dist[p, s0] + dist[s1, q] - dist[p, q]
+                rest = np.delete(tour, seg_idx)
+                c, e = rest, np.roll(rest, -1)
+                forward = dist[c, s0] + dist[s1, e] - dist[c, e]
+                backward = dist[c, s1] + dist[s0, e] - dist[c, e]
+                cost = np.minimum(forward, backward)
+                k = int(cost.argmin())
+                if cost[k] < gain - 1e-9:
+                    insert = seg if forward[k] <= backward[k] else seg[::-1]
+                    tour = np.concatenate([rest[:k + 1], insert, rest[k + 1:]])
+                    improved = True
+                i += 1
+    return tour
+
+
+def solve_tour(dist, deadline):
+    """Closed tour over all nodes of dist: nearest-neighbour construction, then 2-opt and Or-opt until the deadline."""
+    n = len(dist)
+    if n <= 3: return np.arange(n)
+    tour = nearest_neighbour_tour(dist)
+    while time.perf_counter() < deadline:
+        before = tour_length(dist, tour)
+        tour = two_opt(dist, tour, deadline)
+        tour = or_opt(dist, tour, deadline)
+        if tour_length(dist, tour) >= before - 1e-9: break
+    return tour
+
+
+def open_path(dist, tour):
+    """Drop the longest edge of a closed tour, giving the cheapest open path through the same order."""
+    if len(tour) < 3: return tour
+    edges = dist[tour, np.roll(tour, -1)]
+    cut = int(edges.argmax())
+    return np.roll(tour, -(cut + 1))
+
+
+def sweep_partition(lat, lon, n_groups, dist, max_rotations=8):
+    """
+    Capacitated sweep: order stops by bearing around the centroid and cut the circle into
+    n_groups arcs with equal stop counts. Several starting bearings are tried and the one with
+    the smallest longest (nearest-neighbour) route wins, which keeps officers' workloads balanced.
+    """
+    n = len(lat)
+    if n_groups <= 1: return [np.arange(n)]
+    x = (lon - lon.mean()) * np.cos(np.radians(lat.mean()))
+    y = lat - lat.mean()
+    order = np.argsort(np.arctan2(y, x), kind="stable")
+    bounds = np.linspace(0, n, n_groups + 1).round().astype(int)
+    best, best_cost = None, np.inf
+    for offset in np.unique(np.linspace(0, n, min(max_rotations, n), endpoint=False).astype(int)):
+        rotated = np.roll(order, -offset)
+        groups = [rotated[bounds[g]:bounds[g + 1]] for g in range(n_groups)]
+        cost = max(tour_length(dist, g[nearest_neighbour_tour(dist[np.ix_(g, g)])], closed=False) if len(g) > 1 else 0.0
+                   for g in groups)
+        if cost < best_cost:
+            best, best_cost = groups, cost
+    return best
+
 
 class RoutingEngine:
     @staticmethod
-    def optimize_patrol(hotspots, n_officers=1):
+    @timed("routing.optimize_patrol")
+    def optimize_patrol(hotspots, n_officers=1, time_budget=1.0):
         """
         hotspots: List of dicts with {'lat', 'lon', 'id'}
-        n_officers: Number of officers to split the route between
+        n_officers: Number of officers; stops are split into balanced groups (sweep), one route each
+        time_budget: Seconds of local search (2-opt + Or-opt) shared across all routes
         """
         if not hotspots:
             return []
+        n_officers = max(1, int(n_officers))
 
-        coords = np.array([[h['lat'], h['lon']] for h in hotspots])
-        dist_matrix = cdist(coords, coords, metric='euclidean')
-        
-        G = nx.from_numpy_array(dist_matrix)
-        # Solve TSP using nearest neighbor (heuristic for large N)
-        tsp_path = nx.approximation.traveling_salesman_problem(G, cycle=True)
-        
-        # Split path for multiple officers
+        lat = np.array([h['lat'] for h in hotspots], dtype=np.float64)
+        lon = np.array([h['lon'] for h in hotspots], dtype=np.float64)
+        with stage("routing.distances"):
+            dist = haversine_matrix(lat, lon)
+        with stage("routing.partition"):
+            groups = sweep_partition(lat, lon, n_officers, dist)
+
+        start = time.perf_counter()
         routes = []
-        path_nodes = tsp_path[:-1] # remove the cycle closing node
-        chunk_size = len(path_nodes) // n_officers
-        
-        for i in range(n_officers):
-            start = i * chunk_size
-            end = (i + 1) * chunk_size if i < n_officers - 1 else len(path_nodes)
-            officer_nodes = path_nodes[start:end]
-            
-            route = [hotspots[node] for node in officer_nodes]
-            
-            # Calculate total distance (simple Euclidean sum for now)
-            total_dist = 0
-            for j in range(len(route) - 1):
-                p1 = np.array([route[j]['lat'], route[j]['lon']])
-                p2 = np.array([route[j+1]['lat'], route[j+1]['lon']])
-                total_dist += np.linalg.norm(p1 - p2)
-            
+        for i, group in enumerate(groups):
+            # Split what is left of the budget over the remaining routes, weighted by stop count
+            remaining = max(time_budget - (time.perf_counter() - start), 0.0)
+            share = remaining * len(group) / max(sum(len(g) for g in groups[i:]), 1)
+            sub = dist[np.ix_(group, group)]
+            with stage("routing.solve"):
+                path = group[open_path(sub, solve_tour(sub, time.perf_counter() + share))] if len(group) else group
+            total_km = tour_length(dist, path, closed=False)
             routes.append({
                 "officer_id": i + 1,
-                "sequence": route,
-                "total_distance_km": float(total_dist * 111), # Rough conversion for lat/lon
-                "est_time_mins": int(total_dist * 111 * 10) # 10 mins per km avg
+                "sequence": [hotspots[node] for node in path],
+                "total_distance_km": total_km,
+                "est_time_mins": int(total_km * MINS_PER_KM)
             })
-            
+
         return routes
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from snapshot import MANIFEST, Snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared mode is unavailable, workers run standalone
+    fcntl = None
+
+
+class SharedState(Snapshot):
+    """
+    Multi-worker mode (uvicorn --workers N): a Snapshot every worker maps, in one shared directory,
+    ideally on tmpfs (/dev/shm). Adds registry/, the ModelRegistry (hotspot clusters, density rasters)
+    shared by all workers.
+    One worker holds trainer.lock and is the only one that trains; any worker may publish data
+    (serialized by publish.lock). Every worker polls the manifest and maps new versions as they appear.
+    """
+
+    def __init__(self, root, poll_interval=1.0):
+        if fcntl is None: raise OSError("shared worker mode needs POSIX file locks (fcntl)")
+        super().__init__(root)
+        self.poll_interval = poll_interval
+        self.is_trainer = False
+        self._trainer_fd = None
+        os.makedirs(self.registry_path, exist_ok=True)
+
+    @property
+    def registry_path(self):
+        return os.path.join(self.root, "registry")
+
+    def acquire_trainer(self):
+        """Try to become the trainer; the lock is held for the life of the process (released by the OS on exit)."""
+        if self.is_trainer: return True
+        fd = os.open(os.path.join(self.root, "trainer.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._trainer_fd, self.is_trainer = fd, True
+        return True
+
+    @contextmanager
+    def _flock(self, name):
+        fd = os.open(os.path.join(self.root, name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def publish_lock(self):
+        """Held across read-latest / ingest / publish so concurrent uploads in different workers serialize."""
+        return self._flock("publish.lock")
+
+    def _manifest_lock(self):
+        return self._flock("manifest.lock")
+
+    def request_training(self, reason):
+        """Ask the trainer (possibly another process) to retrain on the current data."""
+        return self._update_manifest(train_request={"at": time.time(), "reason": reason, "pid": os.getpid()})
+
+    # --- Watching ---------------------------------------------------------------------------
+
+    def wait_for(self, keys, timeout=300):
+        """Block until the manifest has all `keys` (used by workers that start before the trainer has published)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            manifest = self.read_manifest()
+            if all(k in manifest for k in keys) or time.monotonic() >= deadline: return manifest
+            time.sleep(0.2)
+
+    def watch(self, on_change):
+        """Call on_change(manifest) from a daemon thread whenever manifest.json is replaced."""
+        def loop():
+            seen = None
+            while True:
+                try:
+                    stamp = os.stat(os.path.join(self.root, MANIFEST)).st_mtime_ns
+                    if stamp != seen:
+                        seen = stamp
+                        on_change(self.read_manifest())
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"SharedState: reload failed ({e})")
+                time.sleep(self.poll_interval)
+        threading.Thread(target=loop, daemon=True, name="shared-state-watch").start()
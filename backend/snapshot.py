@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import nullcontext
+from importlib import metadata
+import joblib
+
+from crime_store import ColumnarCrimeStore
+from rollups import TrendRollup
+
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 2    # current + previous, so a worker mid-switch never loses files it still maps
+SNAPSHOT_FORMAT = 1  # bump when the on-disk layout or the risk model's features change
+
+
+def _package_version(name):
+    try: return metadata.version(name)
+    except metadata.PackageNotFoundError: return "none"
+
+
+def fingerprint(data_version):
+    """Identifies a model artifact: the dataset it was trained on plus everything that decides whether it still unpickles."""
+    parts = [str(SNAPSHOT_FORMAT), str(data_version), _package_version("scikit-learn"), _package_version("numpy")]
+    return hashlib.blake2b(":".join(parts).encode(), digest_size=8).hexdigest()
+
+
+class Snapshot:
+    """
+    On-disk copy of the current dataset and risk model, so a restart maps them back instead of reseeding
+    and retraining:
+        data/<dir>/     columnar crimes + trend rollup as .npy files, memory-mapped on restore
+        models/         risk model artifacts: risk-<risk_version>.joblib (sklearn) and, when the model was
+                        compiled, risk-<risk_version>.forest.joblib (forest.CompiledForest, a few flat arrays)
+        manifest.json   current data {version, dir, appended} and model {risk_version, file, forest, data_version, fingerprint};
+                        replaced atomically, so a crash mid-write leaves the previous snapshot intact
+    A model is only reused when its fingerprint matches the dataset being served (see model_entry).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        for sub in ("data", "models"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def publish_lock(self):
+        """Held across ingest + publish; a single process only needs DataStore's own lock."""
+        return nullcontext()
+
+    def _manifest_lock(self):
+        return nullcontext()
+
+    # --- Manifest ---------------------------------------------------------------------------
+
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f"Snapshot: ignoring unreadable manifest ({e})")
+            return {}
+
+    def _update_manifest(self, **sections):
+        with self._manifest_lock():
+            manifest = self.read_manifest()
+            manifest.update(sections)
+            tmp = os.path.join(self.root, f"{MANIFEST}.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp, os.path.join(self.root, MANIFEST))
+        return manifest
+
+    # --- Data -------------------------------------------------------------------------------
+
+    def publish_data(self, version, store=None, rollup=None, appended=None):
+        """
+        Publish a dataset version. In-memory data is written for mapping; with a database only the version
+        is recorded. appended = (base_version, version, first crime_id) when it grew from base_version by an append.
+        """
+        entry = {"version": version, "dir": None, "appended": list(appended) if appended else None}
+        if store is not None:
+            name = f"{version}-{os.getpid()}-{time.time_ns()}"
+            tmp = os.path.join(self.root, "data", f".{name}")
+            store.save(tmp)
+            rollup.save(tmp)
+            os.replace(tmp, os.path.join(self.root, "data", name))
+            entry["dir"] = name
+        self._update_manifest(data=entry)
+        if store is not None: self._prune("data", entry["dir"])
+        return entry
+
+    def load_data(self, entry):
+        path = os.path.join(self.root, "data", entry["dir"])
+        return ColumnarCrimeStore.open(path), TrendRollup.open(path)
+
+    # --- Models -----------------------------------------------------------------------------
+
+    def _dump(self, name, value):
+        tmp = os.path.join(self.root, "models", f".{name}.tmp")
+        joblib.dump(value, tmp)
+        os.replace(tmp, os.path.join(self.root, "models", name))
+
+    def publish_model(self, model, density, risk_version, data_version, forest=None):
+        name = f"risk-{risk_version}.joblib"
+        self._dump(name, (model, density))
+        forest_name = None
+        if forest is not None:
+            forest_name = f"risk-{risk_version}.forest.joblib"
+            self._dump(forest_name, (forest, density))
+        self._update_manifest(model={"risk_version": risk_version, "file": name, "forest": forest_name,
+                                     "data_version": data_version, "fingerprint": fingerprint(data_version)})
+        self._prune("models", name, forest_name)
+
+    def model_entry(self, data_version):
+        """The manifest's model entry if it was trained on data_version by compatible code, else None."""
+        entry = self.read_manifest().get("model")
+        if entry is None or entry.get("fingerprint") != fingerprint(data_version): return None
+        if not os.path.exists(os.path.join(self.root, "models", entry["file"])): return None
+        return entry
+
+    def model_file(self, risk_version):
+        """Path of the published artifact for risk_version, or None if the manifest names another model."""
+        entry = self.read_manifest().get("model")
+        if entry is None or entry["risk_version"] != risk_version: return None
+        return os.path.abspath(os.path.join(self.root, "models", entry["file"]))
+
+    def load_model(self, entry):
+        """(model, density) with their NumPy arrays memory-mapped read-only where joblib can."""
+        return joblib.load(os.path.join(self.root, "models", entry["file"]), mmap_mode="r")
+
+    def forest_loader(self, entry):
+        """load() for the entry's compiled forest -> (CompiledForest, density), fully memory-mapped; None without one."""
+        if not entry.get("forest"): return None
+        return lambda: joblib.load(os.path.join(self.root, "models", entry["forest"]), mmap_mode="r")
+
+    def _prune(self, sub, *current):
+        base = os.path.join(self.root, sub)
+        entries = sorted((e for e in os.scandir(base) if not e.name.startswith(".")), key=lambda e: e.stat().st_mtime, reverse=True)
+        # Count versions, not files: a model version can have two artifacts
+        versions = []
+        for entry in entries:
+            version = entry.name.split(".")[0]
+            if version not in versions: versions.append(version)
+        keep = set(versions[:KEEP_VERSIONS])
+        for entry in entries:
+            if entry.name in current or entry.name.split(".")[0] in keep: continue
+            # Unlinking is safe on POSIX even while other workers still map the files
+            if entry.is_dir(): shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try: os.remove(entry.path)
+                except OSError: pass
@@ -0,0 +1,186 @@
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from data_utils import SEVERITY_MAP
+
+TILE_BINS = 16          # bins per tile side
+MAX_TILES = 64          # coarsen zoom until the viewport fits in this many tiles
+MAX_ZOOM = 18
+_KEY_STRIDE = 1 << 32
+_COL_OFFSET = 1 << 31
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over a set of points, stored CSR-style: point ids sorted by cell key.
+    A bbox query binary-searches one key range per grid row and only touches matching cells.
+    """
+
+    def __init__(self, lat, lon, cell=0.005):
+        self.cell = cell
+        self.lat = lat
+        self.lon = lon
+        keys = self._keys(np.floor(lat / cell).astype(np.int64), np.floor(lon / cell).astype(np.int64))
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        if len(lat):
+            self.row_range = (int(np.floor(lat.min() / cell)), int(np.floor(lat.max() / cell)))
+        else:
+            self.row_range = (0, -1)
+
+    @staticmethod
+    def _keys(rows, cols):
+        return rows * _KEY_STRIDE + (cols + _COL_OFFSET)
+
+    def query(self, min_lat, min_lon, max_lat, max_lon):
+        """Indices of points inside the bbox (inclusive)."""
+        r0 = max(int(math.floor(min_lat / self.cell)), self.row_range[0])
+        r1 = min(int(math.floor(max_lat / self.cell)), self.row_range[1])
+        if r1 < r0: return np.empty(0, dtype=np.int64)
+        rows = np.arange(r0, r1 + 1, dtype=np.int64)
+        c0, c1 = int(math.floor(min_lon / self.cell)), int(math.floor(max_lon / self.cell))
+        lo = np.searchsorted(self.keys, self._keys(rows, c0), side="left")
+        hi = np.searchsorted(self.keys, self._keys(rows, c1), side="right")
+        hits = [self.order[a:b] for a, b in zip(lo, hi) if b > a]
+        if not hits: return np.empty(0, dtype=np.int64)
+        idx = np.concatenate(hits)
+        # Edge cells overlap the bbox only partially
+        lat, lon = self.lat[idx], self.lon[idx]
+        return idx[(lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)]
+
+
+def tile_size(zoom):
+    return 360.0 / (1 << zoom)
+
+
+def tiles_for_bbox(min_lat, min_lon, max_lat, max_lon, zoom):
+    size = tile_size(zoom)
+    xs = range(int(math.floor(min_lon / size)), int(math.floor(max_lon / size)) + 1)
+    ys = range(int(math.floor(min_lat / size)), int(math.floor(max_lat / size)) + 1)
+    return [(x, y) for y in ys for x in xs]
+
+
+def tile_count(min_lat, min_lon, max_lat, max_lon, zoom):
+    """len(tiles_for_bbox(...)) without building the list."""
+    size = tile_size(zoom)
+    cols = math.floor(max_lon / size) - math.floor(min_lon / size) + 1
+    rows = math.floor(max_lat / size) - math.floor(min_lat / size) + 1
+    return max(cols, 0) * max(rows, 0)
+
+
+class TileIndex:
+    """
+    Pre-aggregated heatmap bins for one dataset version.
+    Each tile (equirectangular, 360/2^zoom degrees) is split into TILE_BINS x TILE_BINS bins holding a
+    count, a severity-weighted sum, the mean position and the dominant crime type. Tiles are
+    computed on demand and kept in an LRU; a new dataset version gets a new index, which drops them.
+    Subclasses provide bounds and _compute_tile().
+    """
+
+    def __init__(self, version, max_tiles=4096):
+        self.version = version
+        self.bounds = None
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fit_zoom(self, min_lat, min_lon, max_lat, max_lon, zoom=None):
+        """The finest zoom, up to the requested one, that covers the bbox with at most MAX_TILES tiles."""
+        zoom = MAX_ZOOM if zoom is None else max(0, min(int(zoom), MAX_ZOOM))
+        # Tiles along the wider side alone exceed MAX_TILES above log2(MAX_TILES * 360 / span)
+        span = max(max_lat - min_lat, max_lon - min_lon)
+        if span > 0: zoom = max(0, min(zoom, int(math.log2(MAX_TILES * 360.0 / span))))
+        while zoom > 0 and tile_count(min_lat, min_lon, max_lat, max_lon, zoom) > MAX_TILES:
+            zoom -= 1
+        return zoom
+
+    def tile(self, zoom, x, y, crime_type=None):
+        key = (zoom, x, y, crime_type)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+        bins = self._compute_tile(zoom, x, y, crime_type)
+        with self._lock:
+            self._tiles[key] = bins
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return bins
+
+    def bins(self, min_lat, min_lon, max_lat, max_lon, zoom=None, crime_type=None):
+        """Bins for every tile touching the bbox, with intensity scaled to the heaviest bin returned."""
+        zoom = self.fit_zoom(min_lat, min_lon, max_lat, max_lon, zoom)
+        tiles = [self.tile(zoom, x, y, crime_type) for x, y in tiles_for_bbox(min_lat, min_lon, max_lat, max_lon, zoom)]
+        tiles = [t for t in tiles if t is not None]
+        if not tiles: return zoom, []
+        merged = {k: np.concatenate([t[k] for t in tiles]) for k in tiles[0]}
+        intensity = merged["severity"] / merged["severity"].max()
+        return zoom, [
+            {"lat": la, "lon": lo, "count": c, "intensity": i, "severity": s, "type": t}
+            for la, lo, c, i, s, t in zip(merged["lat"].tolist(), merged["lon"].tolist(), merged["count"].tolist(),
+                                          intensity.tolist(), merged["severity"].tolist(), merged["type"].tolist())
+        ]
+
+
+class HeatmapIndex(TileIndex):
+    """Tiles aggregated in NumPy from a GridIndex over the in-memory frame."""
+
+    def __init__(self, version, df, max_tiles=4096):
+        super().__init__(version, max_tiles)
+        lat = df["latitude"].to_numpy(dtype=np.float64)
+        lon = df["longitude"].to_numpy(dtype=np.float64)
+        types = pd.Categorical(df["crime_type"])
+        self.types = list(types.categories)
+        # Missing types get their own trailing code so they can index the per-type tables
+        self.type_codes = np.where(types.codes < 0, len(self.types), types.codes)
+        lut = np.array([SEVERITY_MAP.get(t, 1) for t in self.types] + [1], dtype=np.float64)
+        self.severity = lut[self.type_codes]
+        self.grid = GridIndex(lat, lon)
+        self.bounds = (float(lat.min()), float(lon.min()), float(lat.max()), float(lon.max())) if len(lat) else None
+        self.type_names = np.array(self.types + [None], dtype=object)
+
+    def _compute_tile(self, zoom, x, y, crime_type):
+        size = tile_size(zoom)
+        min_lat, min_lon = y * size, x * size
+        # Half-open tile bounds so a point on a shared edge is counted once
+        idx = self.grid.query(min_lat, min_lon, min_lat + size, min_lon + size)
+        lat, lon = self.grid.lat[idx], self.grid.lon[idx]
+        keep = (lat < min_lat + size) & (lon < min_lon + size)
+        if crime_type is not None:
+            code = self.types.index(crime_type) if crime_type in self.types else -2
+            keep &= self.type_codes[idx] == code
+        idx, lat, lon = idx[keep], lat[keep], lon[keep]
+        if len(idx) == 0: return None
+
+        step = size / TILE_BINS
+        cell = (np.minimum(((lat - min_lat) / step).astype(np.int64), TILE_BINS - 1) * TILE_BINS
+                + np.minimum(((lon - min_lon) / step).astype(np.int64), TILE_BINS - 1))
+        occupied, inverse = np.unique(cell, return_inverse=True)
+        n = len(occupied)
+        counts = np.bincount(inverse, minlength=n)
+        ntypes = len(self.types) + 1
+        by_type = np.bincount(inverse * ntypes + self.type_codes[idx], minlength=n * ntypes).reshape(n, ntypes)
+        return {
+            "lat": np.bincount(inverse, weights=lat, minlength=n) / counts,
+            "lon": np.bincount(inverse, weights=lon, minlength=n) / counts,
+            "count": counts,
+            "severity": np.bincount(inverse, weights=self.severity[idx], minlength=n),
+            "type": self.type_names[by_type.argmax(axis=1)],
+        }
+
+
+class SqlHeatmapIndex(TileIndex):
+    """Tiles aggregated by Postgres (PostgresCrimeQueries.tile_bins), cached the same way; filters narrow every tile."""
+
+    def __init__(self, version, queries, max_tiles=4096, filters=None):
+        super().__init__(version, max_tiles)
+        self.queries = queries
+        self.filters = filters
+        self.bounds = queries.bounds(filters)
+
+    def _compute_tile(self, zoom, x, y, crime_type):
+        size = tile_size(zoom)
+        return self.queries.tile_bins(y * size, x * size, size, TILE_BINS, crime_type, self.filters)
+
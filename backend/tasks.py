@@ -0,0 +1,27 @@
+"""
+Entry points for the TaskExecutor's worker processes. Arguments and results are plain picklable
+data; anything bulky a worker needs repeatedly (the risk model) is loaded from disk once per process.
+"""
+import joblib
+
+from ml_engine import score_points
+
+_models = {}  # model file -> (model, density); one entry, replaced when the model version changes
+
+
+def warm_up():
+    """Pay the heavy imports in each worker before the first real task arrives."""
+    import sklearn.ensemble  # noqa: F401
+    import fpdf  # noqa: F401
+
+
+def predict_points(model_file, lat, lon, hour, weekday):
+    """Score points with the snapshot model at model_file. Returns (classes, class index, confidence)."""
+    saved = _models.get(model_file)
+    if saved is None:
+        saved = joblib.load(model_file, mmap_mode="r")
+        _models.clear()
+        _models[model_file] = saved
+    model, density = saved
+    best, confidence = score_points(model, density, lat, lon, hour, weekday)
+    return model.classes_, best.astype("int8"), confidence
@@ -0,0 +1,21 @@
+import os
+import sys
+import threading
+import pytest
+
+# Backend modules are imported by top-level name, as uvicorn runs them from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """The API on the seeded in-memory dataset, booted once in a scratch directory (models/, snapshot)."""
+    os.chdir(tmp_path_factory.mktemp("app"))
+    os.environ["EXECUTOR_PROCESSES"] = "0"
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        # Let the boot warm-up (hotspot clustering) finish so tests start from a settled app
+        for thread in threading.enumerate():
+            if thread.name == "executor-warm-up": thread.join()
+        yield client
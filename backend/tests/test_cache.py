@@ -0,0 +1,91 @@
+import asyncio
+
+import cache
+from cache import MemoryCache, ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting(value, delay=0):
+    """A compute coroutine function returning value, counting its calls in .calls."""
+    async def compute():
+        compute.calls += 1
+        if delay: await asyncio.sleep(delay)
+        return value
+    compute.calls = 0
+    return compute
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    memory = MemoryCache()
+    memory.setex("short", 10, b"a")
+    memory.setex("forever", None, b"b")
+    clock.now += 9.9
+    assert memory.get("short") == b"a"
+    clock.now += 0.1
+    assert memory.get("short") is None
+    assert memory.get("forever") == b"b"
+    assert memory.stats.expirations == 1
+    assert memory.bytes == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    memory = MemoryCache(max_bytes=10)
+    memory.setex("a", 60, b"aaaa")
+    memory.setex("b", 60, b"bbbb")
+    memory.get("a")
+    memory.setex("c", 60, b"cccc")
+    assert memory.get("b") is None
+    assert memory.get("a") == b"aaaa" and memory.get("c") == b"cccc"
+    assert memory.stats.evictions == 1
+    assert memory.bytes == 8
+
+
+def test_oversized_values_are_counted_as_skipped():
+    responses = ResponseCache(MemoryCache(max_bytes=16))
+    compute = counting(list(range(100)))
+    for _ in range(2):
+        asyncio.run(responses.aget_or_compute("big", 1, {}, 60, compute))
+    # Never stored, so both requests computed it
+    assert compute.calls == 2
+    assert responses.stats.sets == 0
+    assert responses.stats.skipped == 2
+    assert responses.info()["entries"] == 0
+
+
+def test_new_version_misses_and_old_entries_stay_unreachable():
+    responses = ResponseCache(MemoryCache())
+    compute = counting({"n": 1})
+
+    async def get(version, params):
+        return await responses.aget_or_compute("trends", version, params, 60, compute)
+
+    async def scenario():
+        assert await get("v1", {"range": "30d"}) == b'{"n":1}'
+        await get("v1", {"range": "30d"})
+        await get("v2", {"range": "30d"})
+        await get("v2", {"range": "12m"})
+    asyncio.run(scenario())
+    assert compute.calls == 3
+    assert (responses.stats.hits, responses.stats.misses, responses.stats.sets) == (1, 3, 3)
+
+
+def test_concurrent_misses_compute_once():
+    responses = ResponseCache(MemoryCache())
+    compute = counting({"grid": [1, 2, 3]}, delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(responses.aget_or_compute("risk-grid", 1, {"r": 0.01}, 60, compute) for _ in range(20)))
+    bodies = asyncio.run(scenario())
+    assert compute.calls == 1
+    assert set(bodies) == {b'{"grid":[1,2,3]}'}
+    assert responses.stats.coalesced == 19
+    assert responses.stats.misses == 1 and responses.stats.hits == 19
@@ -0,0 +1,96 @@
+import datetime
+import numpy as np
+import pytest
+
+from crime_store import ColumnarCrimeStore
+from data_utils import AREA_NAMES, CRIME_TYPES, PLACE_TYPES, SEVERITY_MAP, generate_mock_frame
+from filters import SHIFTS, CrimeFilter
+from queries import MemoryCrimeQueries
+
+NOW = "2024-06-30"
+
+
+def incidents(n, seed):
+    """Mock incidents with some missing categories and a crime type SEVERITY_MAP doesn't know."""
+    df = generate_mock_frame(n, seed=seed, now=NOW)
+    rng = np.random.default_rng(seed)
+    for name in ("crime_type", "place_type"):
+        df[name] = df[name].astype(object).where(rng.random(n) > 0.03, None)
+    df.loc[rng.random(n) < 0.03, "crime_type"] = "Fraud"
+    return df
+
+
+def random_criteria(rng):
+    """CrimeFilter arguments drawn independently: bounds around the data's year, values with no rows, severities above every score."""
+    last = datetime.date.fromisoformat(NOW)
+    criteria = {}
+    if rng.random() < 0.6:
+        criteria["start"] = last - datetime.timedelta(days=int(rng.integers(-5, 372)))
+        if rng.random() < 0.7: criteria["end"] = criteria["start"] + datetime.timedelta(days=int(rng.integers(0, 60)))
+    elif rng.random() < 0.5:
+        criteria["end"] = last - datetime.timedelta(days=int(rng.integers(0, 372)))
+    for name, values in (("crime_type", CRIME_TYPES + ["Fraud", "Arson"]), ("area_name", AREA_NAMES + ["Nowhere"]),
+                         ("place_type", PLACE_TYPES)):
+        if rng.random() < 0.4: criteria[name] = [str(v) for v in rng.choice(values, int(rng.integers(1, 4)), replace=False)]
+    if rng.random() < 0.4: criteria["shift"] = SHIFTS[int(rng.integers(len(SHIFTS)))]
+    if rng.random() < 0.4: criteria["min_severity"] = int(rng.integers(0, 12))
+    return criteria
+
+
+def brute_force(frame, criteria):
+    """Row ids matching the criteria, by a plain boolean mask over the store's frame."""
+    mask = np.ones(len(frame), dtype=bool)
+    days = frame["crime_ts"].to_numpy().astype("datetime64[D]")
+    hour = frame["crime_ts"].dt.hour.to_numpy()
+    if "start" in criteria: mask &= days >= np.datetime64(criteria["start"])
+    if "end" in criteria: mask &= days <= np.datetime64(criteria["end"])
+    for name in ("crime_type", "area_name", "place_type"):
+        if name in criteria: mask &= frame[name].astype(object).isin(criteria[name]).to_numpy()
+    if "min_severity" in criteria:
+        mask &= frame["crime_type"].astype(object).map(SEVERITY_MAP).fillna(1).to_numpy() >= criteria["min_severity"]
+    if "shift" in criteria:
+        mask &= {"night": (hour >= 22) | (hour < 6), "evening": (hour >= 14) & (hour < 22),
+                 "morning": (hour >= 6) & (hour < 14)}[criteria["shift"]]
+    return np.flatnonzero(mask)
+
+
+@pytest.fixture(scope="module")
+def stores():
+    """(queries, store) before and after an append that arrives once the first index is built."""
+    store = ColumnarCrimeStore()
+    store.append(incidents(3000, seed=0))
+    queries = MemoryCrimeQueries(lambda: store)
+    before = queries.index()
+    for f in (CrimeFilter(crime_type=["Theft"]), CrimeFilter(shift="night"), CrimeFilter(start=datetime.date(2024, 1, 1))):
+        before.select(f)  # build every index kind
+    before_frame = store.frame()
+    store.append(incidents(1500, seed=1), dedup=True)
+    return (before, before_frame), (queries.index(), store.frame())
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_select_matches_brute_force(stores, seed):
+    criteria = random_criteria(np.random.default_rng(seed))
+    for index, frame in stores:
+        np.testing.assert_array_equal(index.select(CrimeFilter(**criteria)), brute_force(frame, criteria), err_msg=str(criteria))
+
+
+@pytest.mark.parametrize("criteria", [
+    {"start": datetime.date(2024, 6, 30), "end": datetime.date(2024, 6, 30)},  # one day: both bounds inclusive
+    {"end": datetime.date(2023, 7, 1)},                                        # the first day of data
+    {"start": datetime.date(2024, 7, 1)},                                      # after every incident
+    {"crime_type": ["Arson"]},                                                 # unknown category
+    {"crime_type": ["Fraud"], "min_severity": 2},                              # unknown types score 1
+    {"min_severity": 11},                                                      # above every score
+    {"area_name": ["Nowhere"], "shift": "night"},
+])
+def test_select_boundaries(stores, criteria):
+    for index, frame in stores:
+        np.testing.assert_array_equal(index.select(CrimeFilter(**criteria)), brute_force(frame, criteria))
+
+
+def test_append_gets_a_new_index(stores):
+    (before, before_frame), (after, after_frame) = stores
+    assert after is not before
+    assert len(after_frame) > len(before_frame)
+    assert len(after.select(CrimeFilter(shift="night"))) > len(before.select(CrimeFilter(shift="night")))
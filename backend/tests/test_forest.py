@@ -0,0 +1,69 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_utils import generate_mock_frame
+from density import DensityRaster
+from forest import CompiledForest
+from ml_engine import MLEngine, RISK_FEATURES, time_weights
+
+
+def features(density, n, seed):
+    """Random feature rows around the mock city, built the way the API builds them for scoring."""
+    rng = np.random.default_rng(seed)
+    lat = 17.3850 + rng.uniform(-0.2, 0.2, n)
+    lon = 78.4867 + rng.uniform(-0.2, 0.2, n)
+    hour = rng.integers(0, 24, n)
+    weekday = rng.integers(0, 7, n)
+    return np.column_stack([lat, lon, hour, weekday, density.lookup(lat, lon, hour), time_weights(hour)])
+
+
+def assert_parity(model, forest, X):
+    """The compiled forest must reproduce sklearn's predict_proba exactly, not just its labels."""
+    expected = model.predict_proba(pd.DataFrame(X, columns=RISK_FEATURES))
+    got = forest.predict_proba(X)
+    np.testing.assert_array_equal(got, expected)
+    np.testing.assert_array_equal(forest.classes_, model.classes_)
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    engine = MLEngine(registry_path=str(tmp_path_factory.mktemp("registry")))
+    df = engine.prepare_time_features(generate_mock_frame(3000, seed=0))
+    density = DensityRaster.from_frame(df)
+    model, _ = engine.fit_risk_model(df, density)
+    return engine, df, density, model, CompiledForest.from_sklearn(model)
+
+
+def test_parity_on_random_points(trained):
+    _, _, density, model, forest = trained
+    assert_parity(model, forest, features(density, 20000, seed=1))
+
+
+def test_parity_on_training_rows(trained):
+    engine, df, density, model, forest = trained
+    assert_parity(model, forest, engine.prepare_features(df, density)[RISK_FEATURES].to_numpy())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parity_on_single_points(trained, seed):
+    _, _, density, model, forest = trained
+    assert_parity(model, forest, features(density, 1, seed=seed))
+
+
+def test_parity_after_memory_mapped_load(trained, tmp_path):
+    _, _, density, model, forest = trained
+    joblib.dump(forest, tmp_path / "forest.joblib")
+    assert_parity(model, joblib.load(tmp_path / "forest.joblib", mmap_mode="r"), features(density, 1000, seed=2))
+
+
+def test_served_scores_match_across_the_compiled_threshold(trained):
+    engine, _, density, model, _ = trained
+    engine.swap_risk_model(model, density)
+    lat, lon = np.full(300, 17.40), np.linspace(78.3, 78.65, 300)
+    _, labels, confidence = engine.predict_risk_batch(lat, lon, 22, 4)  # above compiled_max_rows: sklearn
+    for i in (0, 150, 299):
+        used, label, conf = engine.predict_risk_batch(lat[i:i + 1], lon[i:i + 1], 22, 4)
+        assert isinstance(used, CompiledForest)
+        assert label[0] == labels[i] and conf[0] == confidence[i]
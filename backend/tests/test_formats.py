@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import pytest
+
+import formats
+from formats import UnsupportedFormat, encode
+
+
+def test_codecs_are_not_imported_with_formats():
+    code = "import sys, formats; print(any(m in sys.modules for m in ('msgpack', 'brotli')))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(formats.__file__))
+    assert out.stdout.strip() == "False"
+
+
+def test_missing_codec_raises_unsupported_format(monkeypatch):
+    monkeypatch.setitem(formats._codecs, "msgpack", None)
+    with pytest.raises(UnsupportedFormat):
+        encode([{"a": 1}], "msgpack")
+
+
+def test_uninstalled_codec_is_not_offered(monkeypatch):
+    monkeypatch.setattr(formats, "_installed", lambda module: module != "pyarrow")
+    assert "arrow" not in formats.available_formats()
+    assert formats.negotiate("application/vnd.apache.arrow.stream", None) is None
+    assert formats.negotiate_encoding("br, gzip") == "br"
+
+
+@pytest.mark.parametrize("path", ["/api/heatmap", "/api/incidents/export"])
+def test_missing_codec_is_406(client, monkeypatch, path):
+    monkeypatch.setitem(formats._codecs, "msgpack", None)
+    response = client.get(path, params={"format": "msgpack"})
+    assert response.status_code == 406
+
+
+def test_msgpack_roundtrip(client):
+    import msgpack
+    response = client.get("/api/heatmap", params={"format": "msgpack"})
+    assert response.status_code == 200
+    assert set(msgpack.unpackb(response.content)) >= {"lat", "lon", "count"}
@@ -0,0 +1,24 @@
+import pytest
+
+from crime_store import ColumnarCrimeStore
+from data_utils import generate_mock_frame
+from hotspots import MIN_INCIDENTS, RADIUS_M, NeighbourIndex, cell_size
+from queries import MemoryCrimeQueries
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_defaults_find_hotspots_in_seed_sized_data(seed):
+    # The app seeds 1000 unseeded mock incidents, so the defaults must work for any draw
+    store = ColumnarCrimeStore()
+    store.append(generate_mock_frame(1000, seed=seed))
+    cells = MemoryCrimeQueries(lambda: store).hotspot_cells(cell_size(RADIUS_M))
+    hotspots = NeighbourIndex.build(RADIUS_M, cells).hotspots(cells, 10, MIN_INCIDENTS)
+    assert hotspots
+
+
+def test_seeded_app_has_density_hotspots(client):
+    response = client.get("/api/hotspots", params={"algorithm": "density"})
+    assert response.status_code == 200
+    hotspots = response.json()
+    assert 1 <= len(hotspots) <= 10
+    assert [h["score"] for h in hotspots] == sorted((h["score"] for h in hotspots), reverse=True)
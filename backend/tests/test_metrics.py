@@ -0,0 +1,32 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import MetricsMiddleware, stage
+
+
+def profiled_app(allow_profiling):
+    app = FastAPI()
+
+    @app.get("/work")
+    def work():
+        with stage("test.work"): return {"ok": True}
+
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes, allow_profiling=allow_profiling)
+    return app
+
+
+def test_profiling_is_off_by_default(client):
+    from database import Settings
+    assert Settings().ALLOW_PROFILING is False
+    assert "server-timing" not in client.get("/api/cache/stats", headers={"X-Profile": "1"}).headers
+
+
+def test_profiling_when_allowed():
+    with TestClient(profiled_app(True)) as client:
+        assert "test.work" in client.get("/work", headers={"X-Profile": "1"}).headers["server-timing"]
+        assert "server-timing" not in client.get("/work").headers
+
+
+def test_profile_header_is_ignored_when_not_allowed():
+    with TestClient(profiled_app(False)) as client:
+        assert "server-timing" not in client.get("/work", headers={"X-Profile": "1"}).headers
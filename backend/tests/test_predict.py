@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+GRID = {"min_lat": 17.3, "min_lon": 78.4, "max_lat": 17.4, "max_lon": 78.5, "hour": 22, "weekday": 4}
+EMPTY = {"count": 0, "risk_level": [], "confidence": [], "risk_score": []}
+
+
+def test_empty_json_batch(client):
+    response = client.post("/api/predict/batch", json={"lat": [], "lon": [], "hour": [], "weekday": []})
+    assert response.status_code == 200
+    assert response.json() == EMPTY
+
+
+def test_empty_binary_batch(client):
+    response = client.post("/api/predict/batch", content=b"", headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.json() == EMPTY
+
+
+def test_binary_batch_matches_json(client):
+    lat, lon = [17.38, 17.42], [78.47, 78.50]
+    body = np.column_stack([lat, lon, [22, 3], [4, 0]]).astype("<f8").tobytes()
+    binary = client.post("/api/predict/batch", content=body, headers={"content-type": "application/octet-stream"})
+    json_ = client.post("/api/predict/batch", json={"lat": lat, "lon": lon, "hour": [22, 3], "weekday": [4, 0]})
+    assert binary.status_code == json_.status_code == 200
+    assert binary.json() == json_.json()
+    assert binary.json()["count"] == 2
+
+
+@pytest.mark.parametrize("record", [
+    [float("nan"), 78.47, 22, 4],
+    [17.38, float("inf"), 22, 4],
+    [17.38, 78.47, 24, 4],
+    [17.38, 78.47, 22, 7],
+    [17.38, 78.47, float("nan"), 4],
+])
+def test_binary_batch_rejects_invalid_points(client, record):
+    body = np.array(record, dtype="<f8").tobytes()
+    response = client.post("/api/predict/batch", content=body, headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("params", [
+    {"resolution": "nan"},
+    {"resolution": "inf"},
+    {"max_lat": "inf"},
+    {"min_lon": "-inf"},
+    {"min_lat": "nan"},
+    {"hour": 24},
+    {"weekday": -1},
+])
+def test_grid_rejects_invalid_params(client, params):
+    response = client.get("/api/predict/grid", params={**GRID, **params})
+    assert response.status_code == 400
+
+
+def test_grid(client):
+    response = client.get("/api/predict/grid", params={**GRID, "resolution": 0.05})
+    assert response.status_code == 200
+    assert response.json()["shape"] == [2, 2]
+
+
+@pytest.mark.parametrize("params", [{"hour": 24}, {"hour": -1}, {"weekday": 7}, {"lat": "nan"}])
+def test_single_point_rejects_invalid_params(client, params):
+    response = client.get("/api/predict", params={"lat": 17.38, "lon": 78.47, "hour": 22, "weekday": 4, **params})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("bbox, resolution, shape", [
+    ((17.30, 78.30, 17.35, 78.35), 0.01, [5, 5]),
+    ((17.30, 78.30, 17.36, 78.33), 0.01, [6, 3]),
+    ((17.30, 78.30, 17.31, 78.30 + 0.1 + 0.2), 0.1, [1, 3]),
+    ((17.30, 78.30, 17.345, 78.35), 0.01, [5, 5]),
+])
+def test_grid_shape_and_centres(client, bbox, resolution, shape):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    params = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon,
+              "hour": 22, "weekday": 4, "resolution": resolution}
+    grid = client.get("/api/predict/grid", params=params).json()
+    assert grid["shape"] == shape == [len(grid["lats"]), len(grid["lons"])]
+    assert all(min_lat < lat < max_lat for lat in grid["lats"])
+    assert all(min_lon < lon < max_lon for lon in grid["lons"])
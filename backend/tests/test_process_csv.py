@@ -0,0 +1,82 @@
+"""
+Parity of the vectorized process_csv / time_weights with the row-wise implementations they replaced
+(kept here as the reference). benchmarks/bench_process_csv.py times the two against each other.
+"""
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from data_utils import generate_mock_data, process_csv
+from ml_engine import time_weights
+
+
+def legacy_process_csv(df):
+    required_cols = ["latitude", "longitude", "crime_date", "crime_time", "crime_type"]
+    df = df.drop_duplicates()
+    df = df.dropna(subset=required_cols)
+    df['crime_date'] = pd.to_datetime(df['crime_date'], errors='coerce')
+
+    def safe_time_parse(t):
+        if pd.isna(t): return None
+        if isinstance(t, str):
+            try: return pd.to_datetime(t).time()
+            except:
+                try: return pd.to_datetime(t, format='%H:%M:%S').time()
+                except: return None
+        return t
+
+    df['crime_time'] = df['crime_time'].apply(safe_time_parse)
+    df = df.dropna(subset=['crime_date', 'crime_time'])
+    df['hour'] = df['crime_time'].apply(lambda x: x.hour)
+    df['weekday'] = df['crime_date'].dt.weekday
+    df['month'] = df['crime_date'].dt.month
+
+    def get_shift(hour):
+        if 6 <= hour < 14: return "Morning"
+        elif 14 <= hour < 22: return "Evening"
+        else: return "Night"
+
+    df['shift'] = df['hour'].apply(get_shift)
+    severity_map = {
+        "Homicide": 10, "Robbery": 8, "Assault": 7, "Kidnapping": 9,
+        "Burglary": 5, "Vehicle Theft": 5, "Drug Offense": 4,
+        "Theft": 3, "Vandalism": 2
+    }
+    df['severity_score'] = df['crime_type'].map(lambda x: severity_map.get(x, 1))
+    return df
+
+
+def legacy_time_weight(hour):
+    return hour.apply(lambda x: 0.8 if 22 <= x or x < 6 else 0.5 if 14 <= x < 22 else 0.2)
+
+
+def make_raw(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(generate_mock_data(min(n, 5000)))
+    df = df.sample(n, replace=True, random_state=seed).reset_index(drop=True)
+    df["crime_date"] = df["crime_date"].astype(str)
+    df["crime_time"] = df["crime_time"].astype(str)
+    # Sprinkle in the formats that hit the slower fallbacks
+    odd = rng.choice(n, size=max(n // 50, 1), replace=False)
+    df.loc[odd[0::3], "crime_time"] = "4:05 PM"
+    df.loc[odd[1::3], "crime_time"] = "not a time"
+    df.loc[odd[2::3], "crime_time"] = "07:30"
+    return df
+
+
+def test_process_csv_matches_legacy():
+    raw = make_raw(3000)
+    assert_frame_equal(process_csv(raw.copy()), legacy_process_csv(raw.copy()))
+
+
+def test_process_csv_matches_legacy_with_missing_values():
+    raw = make_raw(500, seed=1)
+    raw.loc[::7, "latitude"] = np.nan
+    raw.loc[::11, "crime_date"] = "not a date"
+    raw.loc[::13, "crime_time"] = None
+    assert_frame_equal(process_csv(raw.copy()), legacy_process_csv(raw.copy()))
+
+
+def test_time_weights_match_legacy():
+    hour = pd.Series(np.arange(24).repeat(3))
+    np.testing.assert_array_equal(time_weights(hour.to_numpy()), legacy_time_weight(hour).to_numpy())
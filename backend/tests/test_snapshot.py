@@ -0,0 +1,59 @@
+import time
+import pytest
+
+from data_utils import generate_mock_frame
+from snapshot import Snapshot
+
+
+@pytest.fixture
+def store(client, tmp_path, monkeypatch):
+    """A standalone in-memory DataStore over a scratch snapshot, recording publish_data calls."""
+    import main
+    snapshot = Snapshot(str(tmp_path))
+    publish_data = snapshot.publish_data
+    snapshot.published = []
+    def record(version, *args, **kwargs):
+        snapshot.published.append(version)
+        return publish_data(version, *args, **kwargs)
+    monkeypatch.setattr(snapshot, "publish_data", record)
+    return main.DataStore(snapshot)
+
+
+def test_ingest_leaves_publishing_to_publish(store):
+    df = generate_mock_frame(50, seed=1)
+    store.add_crimes(df.iloc[:20])
+    store.publish()
+    base = store.version
+    store.add_crimes(df.iloc[20:35], clear=False)
+    store.add_crimes(df.iloc[35:], clear=False)
+    assert store.snapshot.published == [base]
+
+    store.publish()
+    entry = store.snapshot.read_manifest()["data"]
+    assert store.snapshot.published == [base, store.version]
+    # One entry covers both appends, so the trainer can still update from just the new rows
+    assert entry["appended"] == [base, store.version, 20]
+    memory, _ = store.snapshot.load_data(entry)
+    assert len(memory) == 50
+
+
+def test_nothing_inserted_nothing_published(store):
+    df = generate_mock_frame(50, seed=1)
+    store.add_crimes(df)
+    store.publish()
+    assert store.add_crimes(df, clear=False) == 0
+    store.publish()
+    assert len(store.snapshot.published) == 1
+
+
+def test_upload_is_published_by_its_training_job(client):
+    import main
+    csv = generate_mock_frame(20, seed=7).to_csv(index=False).encode("utf-8")
+    response = client.post("/api/upload", params={"mode": "append"}, files={"file": ("new.csv", csv, "text/csv")})
+    assert response.status_code == 200 and response.json()["rows_inserted"] == 20
+    job_id = response.json()["job_id"]
+    for _ in range(600):
+        if client.get(f"/api/jobs/{job_id}").json()["status"] not in ("queued", "running"): break
+        time.sleep(0.1)
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "succeeded"
+    assert main.snapshot.read_manifest()["data"]["version"] == main.store.version
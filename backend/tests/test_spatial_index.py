@@ -0,0 +1,39 @@
+import time
+import pytest
+
+from spatial_index import MAX_TILES, MAX_ZOOM, TileIndex, tile_count, tiles_for_bbox
+
+BBOXES = [
+    (17.38, 78.47, 17.38, 78.47),   # a single point
+    (17.3, 78.4, 17.5, 78.6),       # a city
+    (8.0, 68.0, 37.0, 97.0),        # a country
+    (-85.0, -180.0, 85.0, 180.0),   # the world
+    (-1e-9, -1e-9, 1e-9, 1e-9),     # straddling the origin
+]
+
+
+def finest_fitting_zoom(bbox):
+    zoom = 0
+    while zoom < MAX_ZOOM and len(tiles_for_bbox(*bbox, zoom + 1)) <= MAX_TILES:
+        zoom += 1
+    return zoom
+
+
+@pytest.mark.parametrize("bbox", BBOXES)
+def test_fit_zoom_is_finest_zoom_within_tile_budget(bbox):
+    zoom = TileIndex(0).fit_zoom(*bbox)
+    assert zoom == finest_fitting_zoom(bbox)
+    assert tile_count(*bbox, zoom) == len(tiles_for_bbox(*bbox, zoom)) <= MAX_TILES
+
+
+def test_fit_zoom_caps_requested_zoom():
+    assert TileIndex(0).fit_zoom(17.3, 78.4, 17.5, 78.6, zoom=3) == 3
+    assert TileIndex(0).fit_zoom(-85.0, -180.0, 85.0, 180.0, zoom=MAX_ZOOM) == finest_fitting_zoom((-85.0, -180.0, 85.0, 180.0))
+
+
+def test_wide_bbox_heatmap_is_fast(client):
+    start = time.perf_counter()
+    response = client.get("/api/heatmap", params={"min_lat": -85, "min_lon": -180, "max_lat": 85, "max_lon": 180})
+    assert response.status_code == 200
+    assert response.json()
+    assert time.perf_counter() - start < 2
@@ -54,7 +54,7 @@ const AnalyticsView = () => {
     // Area distribution from heatmap data
     const areaCounts = {};
     heatmap.forEach(p => {
-        if (p.type) areaCounts[p.type] = (areaCounts[p.type] || 0) + 1;
+        if (p.type) areaCounts[p.type] = (areaCounts[p.type] || 0) + (p.count || 1);
     });
     const areaLabels = Object.keys(areaCounts).slice(0, 8);
     const areaValues = areaLabels.map(k => areaCounts[k]);
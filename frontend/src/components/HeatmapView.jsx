@@ -50,7 +50,9 @@ const HeatmapView = () => {
     useEffect(() => {
         const fetchHeatmap = async () => {
             try {
-                const res = await axios.get('/api/heatmap');
+                // Server returns pre-aggregated bins; the crime type filter is applied there
+                const params = crimeType !== 'All Crime Types' ? { crime_type: crimeType } : {};
+                const res = await axios.get('/api/heatmap', { params });
                 setAllPoints(res.data);
                 setFilteredPoints(res.data);
             } catch (err) {
@@ -60,18 +62,14 @@ const HeatmapView = () => {
             }
         };
         fetchHeatmap();
-    }, []);
+    }, [crimeType]);
 
     useEffect(() => {
-        let filtered = allPoints;
-        if (crimeType !== 'All Crime Types') {
-            filtered = filtered.filter(p => p.type === crimeType);
-        }
         // In a real app, we'd filter by time too, but mock data doesn't have per-point time in heatmap api yet
         // For now, let's simulate density change based on time for visual effect
         const timeFactor = 1 - Math.abs(timeRange - 12) / 24;
-        setFilteredPoints(filtered.map(p => ({ ...p, intensity: (p.intensity || 0.8) * timeFactor })));
-    }, [crimeType, timeRange, allPoints]);
+        setFilteredPoints(allPoints.map(p => ({ ...p, intensity: (p.intensity || 0.8) * timeFactor })));
+    }, [timeRange, allPoints]);
 
     return (
         <div className="h-full flex flex-col gap-6">